@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""Benchmark /api/analytics on a synthetic 30 day x 20 sensor garden.
+
+Uses the fixtures.py garden (sensors drying between waterings every 2-4 days),
+times the analytics for raw (short) and rollup (long) windows, and checks the
+detected waterings against the planted ones.
+
+Usage:
+    python benchmarks/analytics_bench.py --days 30 --devices 4 --sensors 5
+"""
+
+import argparse
+import os
+import shutil
+import time
+
+import numpy as np
+
+from fixtures import HOUR_MS, build_fixture, import_server
+
+
+def time_analytics(server, db, hours, repeat):
+    """Best-of-`repeat` load and analysis times (ms) for all sensors over `hours`"""
+    best_load, best_analyze = float('inf'), float('inf')
+    results = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        source, series = db.get_analytics_series(hours=hours)
+        loaded = time.perf_counter()
+        results = [(item, server.analyze_humidity_series(item['ts'], item['humidity'], 30.0,
+                                                         (item['last_ts'], item['last_humidity'])))
+                   for item in series]
+        done = time.perf_counter()
+        best_load = min(best_load, (loaded - start) * 1000)
+        best_analyze = min(best_analyze, (done - loaded) * 1000)
+    return source, best_load, best_analyze, results
+
+
+def match_waterings(results, planted, since_ms, tolerance_ms):
+    """Count planted waterings inside the window that were detected within tolerance"""
+    found = expected = false_positives = 0
+    for item, analysis in results:
+        truth = planted[(item['device_id'], item['sensor_id'])]
+        truth = truth[truth > since_ms]
+        detected = np.array([event['ts'] for event in analysis['watering_events']], dtype=np.int64)
+        expected += len(truth)
+        for watered in truth:
+            if len(detected) and np.min(np.abs(detected - watered)) <= tolerance_ms:
+                found += 1
+        for event in detected:
+            if not len(truth) or np.min(np.abs(truth - event)) > tolerance_ms:
+                false_positives += 1
+    return found, expected, false_positives
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--devices', type=int, default=4)
+    parser.add_argument('--sensors', type=int, default=5, help='sensors per device')
+    parser.add_argument('--interval', type=int, default=10, help='seconds between readings per sensor')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    server = import_server()
+    workdir = os.getcwd()
+
+    print(f"Synthesizing {args.days} days x {args.devices * args.sensors} sensors every {args.interval}s ...")
+    db = server.HumidityDatabase(os.path.join(workdir, 'analytics.db'))
+    start = time.perf_counter()
+    rows, planted = build_fixture(server, db, args.days, args.devices, args.sensors, args.interval)
+    print(f"Rows: {rows}   fixture with hourly rollups: {time.perf_counter() - start:.1f}s")
+
+    print(f"\n{'window':>8}{'source':>8}{'points':>10}{'load ms':>10}{'analyze ms':>12}"
+          f"{'total ms':>10}{'waterings':>12}{'false +':>9}")
+    for hours in (24, 48, 168, args.days * 24):
+        source, load_ms, analyze_ms, results = time_analytics(server, db, hours, args.repeat)
+        points = sum(analysis['points'] for _, analysis in results)
+        since_ms = server.get_epoch_ms() - hours * HOUR_MS
+        tolerance_ms = HOUR_MS if source == 'raw' else 2 * HOUR_MS
+        found, expected, false_positives = match_waterings(results, planted, since_ms, tolerance_ms)
+        print(f"{str(hours) + 'h':>8}{source:>8}{points:>10}{load_ms:>10.1f}{analyze_ms:>12.1f}"
+              f"{load_ms + analyze_ms:>10.1f}{f'{found}/{expected}':>12}{false_positives:>9}")
+
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
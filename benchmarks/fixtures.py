@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""Synthesize a realistic humidity.db for benchmarks.
+
+Every sensor dries exponentially between waterings every 2-4 days, with sensor
+noise, one reading every SERVER_INTERVAL. Rows are written straight into the
+monthly partitions and the hourly rollups are rebuilt from them, which is far
+faster than going through the ingest path. The same seed always produces the
+same readings relative to the end time.
+
+Usage:
+    python benchmarks/fixtures.py humidity.db --days 30 --devices 4 --sensors 5
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HOUR_MS = 3600 * 1000
+
+
+def import_server(workdir=None):
+    """Import server.py from a scratch directory
+
+    server.py creates its log file, upload folder and default database in the cwd
+    on import, so benchmarks move there first.
+    """
+    os.chdir(workdir or tempfile.mkdtemp(prefix='humidity_bench_'))
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    import server
+    return server
+
+
+def device_ids(devices):
+    return [f"ESP32_AA:BB:CC:DD:EE:{i:02X}" for i in range(devices)]
+
+
+def sensor_ids(sensors):
+    return [f"Garden_{i + 1}" for i in range(sensors)]
+
+
+def synthesize_sensor(rng, start_ms, end_ms, interval_ms):
+    """Return (ts, humidity, watering times) for one sensor drying between waterings"""
+    ts = np.arange(start_ms, end_ms, interval_ms, dtype=np.int64)
+    waterings = []
+    t = start_ms + int(rng.uniform(2, 48) * HOUR_MS)
+    while t < end_ms:
+        waterings.append(t)
+        t += int(rng.uniform(48, 96) * HOUR_MS)
+    waterings = np.array(waterings, dtype=np.int64)
+
+    # Hours since the most recent watering (or since the start of the fixture)
+    last = np.searchsorted(waterings, ts, side='right') - 1
+    since = np.where(last >= 0, ts - waterings[np.maximum(last, 0)], ts - start_ms + 24 * HOUR_MS) / HOUR_MS
+    rate = rng.uniform(0.01, 0.03)
+    humidity = 15 + 55 * np.exp(-rate * since)
+    # Water soaks in over ~10 minutes rather than instantly
+    humidity -= np.where(since < 1 / 6, 55 * (1 - since * 6) * np.exp(-rate * since), 0)
+    humidity += rng.normal(0, 0.5, len(ts))
+    return ts, np.clip(humidity, 0, 100), waterings
+
+
+def build_fixture(server, db, days=30, devices=4, sensors=5, interval=10, end_ms=None, seed=42):
+    """Fill `db` with `days` of readings ending at end_ms (default now)
+
+    Returns (row count, {(device_id, sensor_id): planted watering times}).
+    """
+    end_ms = end_ms or server.get_epoch_ms()
+    start_ms = end_ms - days * 86400 * 1000
+    rng = np.random.default_rng(seed)
+    planted = {}
+    rows = 0
+    with db.get_connection() as conn:
+        for device_id in device_ids(devices):
+            for pin_index, sensor_id in enumerate(sensor_ids(sensors)):
+                sensor_key = db.get_sensor_key(conn, device_id, sensor_id, 32 + pin_index)
+                ts, humidity, waterings = synthesize_sensor(rng, start_ms, end_ms, interval * 1000)
+                planted[(device_id, sensor_id)] = waterings
+                raw = (3250 - humidity * 22.5).astype(np.int64)
+                months = {server.partition_for_ts(int(value)) for value in ts[::360]}
+                months.add(server.partition_for_ts(int(ts[-1])))
+                for partition in sorted(months):
+                    db._create_partition(conn, partition)
+                    low, high = server.partition_bounds(partition)
+                    mask = (ts >= low) & (ts < high)
+                    conn.executemany(f'''
+                        INSERT OR IGNORE INTO {partition}
+                        (sensor_key, ts, raw_value, humidity_percent, esp32_timestamp)
+                        VALUES (?, ?, ?, ?, NULL)
+                    ''', zip([sensor_key] * int(mask.sum()), ts[mask].tolist(), raw[mask].tolist(),
+                             humidity[mask].tolist()))
+                rows += len(ts)
+        db._rebuild_readings_view(conn)
+        conn.execute('DELETE FROM readings_hourly')
+        db._backfill_rollups(conn)
+        conn.commit()
+    # Make the in-memory state match what a restarted server would load
+    db.warm_recent_cache()
+    return rows, planted
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('output', help='database file to create')
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--devices', type=int, default=4)
+    parser.add_argument('--sensors', type=int, default=5, help='sensors per device')
+    parser.add_argument('--interval', type=int, default=10, help='seconds between readings per sensor')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    if os.path.exists(output):
+        parser.error(f"{output} already exists")
+    server = import_server()
+    db = server.HumidityDatabase(output)
+    start = time.perf_counter()
+    rows, _ = build_fixture(server, db, args.days, args.devices, args.sensors, args.interval, seed=args.seed)
+    print(f"Wrote {rows} readings for {args.devices * args.sensors} sensors to {output} "
+          f"in {time.perf_counter() - start:.1f}s ({os.path.getsize(output) / 2**20:.1f} MiB)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""Micro-benchmark resize_image on representative phone photos.
+
+Inputs are synthesized once per run: 12MP and 48MP camera JPEGs, a HEIC photo
+as iOS converts it on upload (a portrait 12MP JPEG stored sideways with an EXIF
+orientation and an embedded ICC profile), a photo already within the 1920x1080
+bounds and a PNG screenshot. Every case runs in a forked process so its peak
+memory (VmHWM above the resident size before the call) is not hidden by memory
+Pillow kept from an earlier case.
+
+Usage:
+    python benchmarks/image_bench.py --repeat 5 --formats jpeg progressive webp
+"""
+
+import argparse
+import ctypes
+import io
+import multiprocessing
+import re
+import statistics
+import time
+
+import numpy as np
+from PIL import Image, ImageCms
+
+from fixtures import import_server
+
+FORMATS = {
+    'jpeg': {'output_format': 'JPEG', 'progressive': False},
+    'progressive': {'output_format': 'JPEG', 'progressive': True},
+    'webp': {'output_format': 'WEBP'},
+}
+
+
+def synthesize_photo(width, height, seed):
+    """Photo-like RGB image: smooth shapes and gradients with sensor noise"""
+    rng = np.random.default_rng(seed)
+    coarse = rng.integers(0, 256, (height // 64 + 1, width // 64 + 1, 3), dtype=np.uint8)
+    img = Image.fromarray(coarse).resize((width, height), Image.Resampling.BICUBIC)
+    pixels = np.asarray(img, dtype=np.int16) + rng.normal(0, 6, (height, width, 1)).astype(np.int16)
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+
+
+def encode(img, fmt='JPEG', orientation=None, icc=False, **params):
+    output = io.BytesIO()
+    if orientation:
+        exif = Image.Exif()
+        exif[0x0112] = orientation
+        params['exif'] = exif.tobytes()
+    if icc:
+        params['icc_profile'] = ImageCms.ImageCmsProfile(ImageCms.createProfile('sRGB')).tobytes()
+    img.save(output, format=fmt, **params)
+    return output.getvalue()
+
+
+def build_inputs():
+    """{name: (bytes, description)} of the benchmark inputs"""
+    inputs = {}
+    photo = synthesize_photo(4032, 3024, 1)
+    inputs['12mp'] = (encode(photo, quality=92), '4032x3024 JPEG q92')
+    inputs['heic-converted'] = (encode(photo, orientation=6, icc=True, quality=90, subsampling=0),
+                                '4032x3024 JPEG shown as portrait (EXIF orientation 6), ICC, 4:4:4')
+    inputs['48mp'] = (encode(synthesize_photo(8064, 6048, 2), quality=92), '8064x6048 JPEG q92')
+    inputs['in-bounds'] = (encode(synthesize_photo(1440, 1080, 3), quality=85), '1440x1080 JPEG q85')
+    screenshot = synthesize_photo(2400, 1800, 4).quantize(64).convert('RGB')
+    inputs['png'] = (encode(screenshot, 'PNG'), '2400x1800 PNG screenshot')
+    return inputs
+
+
+def memory_kib(field):
+    with open('/proc/self/status') as f:
+        return int(re.search(rf'{field}:\s+(\d+)', f.read()).group(1))
+
+
+def measure(server, data, params, repeat, results):
+    """Run in a child process: median time (ms), peak memory (MiB) and the output of resize_image"""
+    # Release the heap inherited from building the inputs, which is already resident, and
+    # fix the mmap threshold so large image buffers are mapped and unmapped per call;
+    # otherwise recycled buffers never show up in VmRSS / VmHWM
+    libc = ctypes.CDLL(None)
+    libc.malloc_trim(0)
+    libc.mallopt(-3, 128 * 1024)  # M_MMAP_THRESHOLD
+    times = []
+    peak = 0
+    output = data
+    for _ in range(repeat):
+        # Reset the high-water mark so VmHWM reports this call's peak
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        before = memory_kib('VmRSS')
+        start = time.perf_counter()
+        output = server.resize_image(data, **params)
+        times.append((time.perf_counter() - start) * 1000)
+        peak = max(peak, memory_kib('VmHWM') - before)
+    size = Image.open(io.BytesIO(output)).size
+    results.put((statistics.median(times), peak / 1024, len(output), size, output is data))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--cases', nargs='+', help='inputs to run (default: all)')
+    parser.add_argument('--formats', nargs='+', choices=list(FORMATS), default=list(FORMATS))
+    args = parser.parse_args()
+
+    server = import_server()
+    server.logger.disabled = True
+    inputs = build_inputs()
+    context = multiprocessing.get_context('fork')
+
+    print(f"{'input':<16}{'in KB':>8}{'output':>13}{'ms':>9}{'peak MiB':>10}{'out KB':>8}{'size':>11}")
+    for name, (data, description) in inputs.items():
+        if args.cases and name not in args.cases:
+            continue
+        for fmt in args.formats:
+            results = context.Queue()
+            child = context.Process(target=measure, args=(server, data, FORMATS[fmt], args.repeat, results))
+            child.start()
+            elapsed, peak, out_size, size, unchanged = results.get()
+            child.join()
+            output = 'unchanged' if unchanged else fmt
+            print(f"{name:<16}{len(data) // 1024:>8}{output:>13}{elapsed:>9.1f}{peak:>10.1f}"
+                  f"{out_size // 1024:>8}{f'{size[0]}x{size[1]}':>11}")
+    print()
+    for name, (data, description) in inputs.items():
+        print(f"{name:<16}{description}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""Load test: virtual ESP32 devices posting readings while dashboard clients poll.
+
+Builds (or copies) a fixture database, starts server.py in a subprocess on it, then
+runs N devices x M sensors posting to /humidity on the SERVER_INTERVAL cadence and
+K dashboard clients repeating the dashboard refresh cycle. Reports throughput and
+p50/p95/p99 latency per endpoint, plus SQLite write-lock contention measured by a
+probe that repeatedly tries BEGIN IMMEDIATE without waiting.
+
+Results can be saved as a JSON baseline and later runs compared against it:
+    python benchmarks/load_test.py --save benchmarks/baseline.json
+    python benchmarks/load_test.py --compare benchmarks/baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import requests
+
+from fixtures import REPO_ROOT, build_fixture, device_ids, import_server, sensor_ids
+
+SERVER_BOOTSTRAP = ("import sys; sys.path.insert(0, {root!r}); import server; "
+                    "server.CONFIG['read_replica'] = {read_replica!r}; "
+                    "server.sites.default = server.HumidityDatabase(server.CONFIG['database']); "
+                    "server.app.run(host='127.0.0.1', port={port}, debug=False, threaded=True)")
+# Options that must match for two runs to be comparable
+COMPARABLE_OPTIONS = ('days', 'history_interval', 'devices', 'sensors', 'interval', 'clients', 'poll_interval', 'hours',
+                      'duration', 'ingest')
+
+
+class Recorder:
+    """Thread-safe per-endpoint latency and error collection"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+        self.readings = 0
+
+    def call(self, session, label, method, url, readings=0, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = session.request(method, url, timeout=30, **kwargs)
+            ok = response.status_code < 400
+        except requests.RequestException:
+            ok = False
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.latencies.setdefault(label, []).append(elapsed_ms)
+            if ok:
+                self.readings += readings
+            else:
+                self.errors[label] = self.errors.get(label, 0) + 1
+
+
+def run_device(base_url, device_id, sensors, args, stop, recorder, rng):
+    """Post every sensor's reading once per interval, like the ESP32 firmware"""
+    session = requests.Session()
+    humidity = {sensor_id: rng.uniform(30, 60) for sensor_id in sensors}
+    seq = 0
+    next_due = time.monotonic() + rng.uniform(0, args.interval)
+    while not stop.wait(max(0.0, next_due - time.monotonic())):
+        next_due += args.interval
+        readings = []
+        for pin_index, sensor_id in enumerate(sensors):
+            humidity[sensor_id] = min(100.0, max(0.0, humidity[sensor_id] + rng.gauss(-0.01, 0.3)))
+            seq += 1
+            readings.append({
+                'sensor_id': sensor_id,
+                'sensor_pin': 32 + pin_index,
+                'raw_value': int(3250 - humidity[sensor_id] * 22.5),
+                'humidity_percent': round(humidity[sensor_id], 2),
+                'timestamp': int(time.monotonic() * 1000),
+                'seq': seq,
+            })
+        if args.ingest == 'batch':
+            recorder.call(session, 'POST /humidity/batch', 'POST', f'{base_url}/humidity/batch',
+                          readings=len(readings), json={'device_id': device_id, 'readings': readings})
+        else:
+            for reading in readings:
+                recorder.call(session, 'POST /humidity', 'POST', f'{base_url}/humidity', readings=1,
+                              json=dict(reading, device_id=device_id))
+
+
+def run_dashboard(base_url, args, stop, recorder, rng):
+    """Repeat the dashboard's auto-refresh cycle (sensor configs, stats, chart, table, memories)"""
+    session = requests.Session()
+    history_params = {'hours': args.hours}
+    if args.hours * 360 > 800:
+        history_params['sample_size'] = 720
+    cycle = [
+        ('GET /api/sensor-config', '/api/sensor-config', None),
+        ('GET /humidity/stats', '/humidity/stats', {'hours': args.hours}),
+        ('GET /humidity/history', '/humidity/history', history_params),
+        ('GET /humidity/latest', '/humidity/latest', {'limit': 10}),
+        ('GET /api/memories', '/api/memories', None),
+    ]
+    next_due = time.monotonic() + rng.uniform(0, args.poll_interval)
+    while not stop.wait(max(0.0, next_due - time.monotonic())):
+        next_due += args.poll_interval
+        for label, path, params in cycle:
+            if stop.is_set():
+                return
+            recorder.call(session, label, 'GET', f'{base_url}{path}', params=params)
+
+
+def run_lock_probe(db_path, stop, result):
+    """Sample how often the database write lock is held by trying BEGIN IMMEDIATE without waiting"""
+    conn = sqlite3.connect(db_path, timeout=0, isolation_level=None)
+    attempts = busy = 0
+    while not stop.wait(0.02):
+        attempts += 1
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('ROLLBACK')
+        except sqlite3.OperationalError:
+            busy += 1
+    conn.close()
+    result.update(attempts=attempts, busy=busy)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_server(base_url, process, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('server exited during startup')
+        try:
+            if requests.get(f'{base_url}/health', timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError('server did not become healthy')
+
+
+def server_rss_mib(pid):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def summarize(recorder, duration, probe, locked_errors, rss_mib):
+    endpoints = {}
+    for label in sorted(recorder.latencies):
+        latencies = np.array(recorder.latencies[label])
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        endpoints[label] = {
+            'requests': len(latencies),
+            'per_sec': round(len(latencies) / duration, 2),
+            'p50_ms': round(float(p50), 2),
+            'p95_ms': round(float(p95), 2),
+            'p99_ms': round(float(p99), 2),
+            'max_ms': round(float(latencies.max()), 2),
+            'errors': recorder.errors.get(label, 0),
+        }
+    return {
+        'endpoints': endpoints,
+        'readings_per_sec': round(recorder.readings / duration, 2),
+        'write_lock_busy_pct': round(100 * probe.get('busy', 0) / max(probe.get('attempts', 0), 1), 2),
+        'locked_errors': locked_errors,
+        'server_rss_mib': None if rss_mib is None else round(rss_mib, 1),
+    }
+
+
+def print_results(results, baseline=None):
+    def delta(current, previous):
+        if not previous:
+            return ''
+        return f"{(current / previous - 1) * 100:+.0f}%"
+
+    base_endpoints = baseline['endpoints'] if baseline else {}
+    print(f"\n{'endpoint':26}{'reqs':>7}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+          f"{'errors':>8}" + ('   p50 / p95 / p99 vs baseline' if baseline else ''))
+    for label, stats in results['endpoints'].items():
+        line = (f"{label:26}{stats['requests']:>7}{stats['per_sec']:>8.2f}{stats['p50_ms']:>9.1f}"
+                f"{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}{stats['max_ms']:>9.1f}{stats['errors']:>8}")
+        previous = base_endpoints.get(label)
+        if previous:
+            line += '   ' + ' / '.join(delta(stats[key], previous[key]) for key in ('p50_ms', 'p95_ms', 'p99_ms'))
+        print(line)
+
+    print(f"\nIngest throughput: {results['readings_per_sec']} readings/s"
+          + (f"  ({delta(results['readings_per_sec'], baseline['readings_per_sec'])})" if baseline else ''))
+    print(f"Write lock busy: {results['write_lock_busy_pct']}% of probes"
+          + (f"  (baseline {baseline['write_lock_busy_pct']}%)" if baseline else ''))
+    print(f"'database is locked' errors in server log: {results['locked_errors']}")
+    if results['server_rss_mib'] is not None:
+        print(f"Server RSS at end: {results['server_rss_mib']} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--fixture', help='existing database to copy instead of synthesizing one')
+    parser.add_argument('--days', type=int, default=30, help='days of history to synthesize')
+    parser.add_argument('--history-interval', type=int, default=10, help='seconds between synthesized readings')
+    parser.add_argument('--devices', type=int, default=4)
+    parser.add_argument('--sensors', type=int, default=5, help='sensors per device')
+    parser.add_argument('--interval', type=float, default=10, help='device SERVER_INTERVAL in seconds')
+    parser.add_argument('--ingest', choices=['single', 'batch'], default='single',
+                        help='one POST /humidity per reading, or one POST /humidity/batch per device interval')
+    parser.add_argument('--clients', type=int, default=3, help='dashboard clients polling')
+    parser.add_argument('--poll-interval', type=float, default=30, help='seconds between dashboard refreshes')
+    parser.add_argument('--hours', type=int, default=24, help='dashboard time range')
+    parser.add_argument('--duration', type=float, default=300, help='seconds of load')
+    parser.add_argument('--read-replica', choices=['off', 'wal', 'snapshot'], default='off',
+                        help="server CONFIG['read_replica'] for dashboard reads")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='baseline JSON file to compare against')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        mismatched = [option for option in COMPARABLE_OPTIONS
+                      if baseline['config'].get(option) != getattr(args, option)]
+        if mismatched:
+            print(f"Warning: options differ from the baseline: {', '.join(mismatched)}")
+    save_path = os.path.abspath(args.save) if args.save else None
+    fixture_path = os.path.abspath(args.fixture) if args.fixture else None
+
+    server = import_server()
+    workdir = os.getcwd()
+    db_path = os.path.join(workdir, 'humidity.db')
+    # Importing server created an empty humidity.db in the scratch directory; replace it
+    os.remove(db_path)
+    if fixture_path:
+        shutil.copy(fixture_path, db_path)
+    else:
+        print(f"Synthesizing {args.days} days x {args.devices * args.sensors} sensors ...")
+        start = time.perf_counter()
+        rows, _ = build_fixture(server, server.HumidityDatabase(db_path), args.days, args.devices, args.sensors,
+                                args.history_interval)
+        print(f"{rows} readings in {time.perf_counter() - start:.1f}s")
+
+    port = free_port()
+    base_url = f'http://127.0.0.1:{port}'
+    with open(os.path.join(workdir, 'server_output.log'), 'w') as server_output:
+        bootstrap = SERVER_BOOTSTRAP.format(root=REPO_ROOT, port=port,
+                                            read_replica=None if args.read_replica == 'off' else args.read_replica)
+        process = subprocess.Popen([sys.executable, '-c', bootstrap], cwd=workdir,
+                                   stdout=server_output, stderr=subprocess.STDOUT)
+        try:
+            wait_for_server(base_url, process)
+            print(f"Running {args.devices} devices x {args.sensors} sensors every {args.interval}s "
+                  f"({args.ingest}) and {args.clients} dashboards every {args.poll_interval}s "
+                  f"for {args.duration:.0f}s ...")
+
+            recorder = Recorder()
+            probe = {}
+            stop = threading.Event()
+            rng = random.Random(args.seed)
+            threads = [threading.Thread(target=run_device, args=(base_url, device_id, sensor_ids(args.sensors),
+                                                                 args, stop, recorder, random.Random(rng.random())))
+                       for device_id in device_ids(args.devices)]
+            threads += [threading.Thread(target=run_dashboard, args=(base_url, args, stop, recorder,
+                                                                     random.Random(rng.random())))
+                        for _ in range(args.clients)]
+            threads.append(threading.Thread(target=run_lock_probe, args=(db_path, stop, probe)))
+            for thread in threads:
+                thread.start()
+            time.sleep(args.duration)
+            stop.set()
+            for thread in threads:
+                thread.join()
+            rss_mib = server_rss_mib(process.pid)
+        finally:
+            process.terminate()
+            process.wait()
+
+    with open(os.path.join(workdir, 'humidity_server.log'), errors='replace') as f:
+        locked_errors = sum('database is locked' in line for line in f)
+
+    results = summarize(recorder, args.duration, probe, locked_errors, rss_mib)
+    results['config'] = {option: getattr(args, option) for option in COMPARABLE_OPTIONS + ('read_replica',)}
+    results['environment'] = {
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+    results['recorded_at'] = datetime.now().isoformat(timespec='seconds')
+    print_results(results, baseline)
+
+    if save_path:
+        with open(save_path, 'w') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+        print(f"\nSaved results to {save_path}")
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
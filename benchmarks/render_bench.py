@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""Measure dashboard rendering in a headless Chromium: frame times and JS heap.
+
+Starts server.py on a fixture database (30 days x 4 devices x 5 sensors by default),
+opens the dashboard and, for each time range, loads the chart and then runs the
+auto-refresh cycle a number of times. A requestAnimationFrame loop records frame
+intervals and a PerformanceObserver long tasks (>50ms on the main thread) while that
+happens; the JS heap is read after a forced GC at the end of each range.
+
+--baseline-rev serves web_ui/static/js/dashboard.js from another git revision so
+the same fixture can be compared before and after a change, and --save records both:
+    python benchmarks/render_bench.py --baseline-rev HEAD~1 --save render_results.json
+
+Needs Playwright with Chromium (pip install playwright && playwright install chromium,
+or --browser for an installed Chromium) and either network access for the Chart.js
+CDN scripts the dashboard loads or local copies of them in --scripts.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from fixtures import REPO_ROOT, build_fixture, import_server
+from load_test import SERVER_BOOTSTRAP, free_port, wait_for_server
+
+RANGES = {'1h': 1, '24h': 24, '7d': 168, '30d': 720}
+# CDN scripts of dashboard.html, by the file name --scripts serves them from
+CDN_SCRIPTS = {'chart.umd.js': '**/npm/chart.js',
+               'chartjs-adapter-date-fns.bundle.min.js': '**/chartjs-adapter-date-fns.bundle.min.js'}
+
+# Frame intervals and long tasks, collected from before the page's own scripts run
+INSTRUMENTATION = """
+window.__render = { frames: [], longTasks: [] };
+(function frame(last) {
+    requestAnimationFrame(now => {
+        if (last !== undefined) window.__render.frames.push(now - last);
+        frame(now);
+    });
+})();
+new PerformanceObserver(list => {
+    list.getEntries().forEach(entry => window.__render.longTasks.push(entry.duration));
+}).observe({ entryTypes: ['longtask'] });
+"""
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0.0
+
+
+def measure_range(page, hours, refreshes, pause):
+    """Frame and heap statistics for loading one time range and refreshing it"""
+    page.evaluate("() => { window.__render.frames = []; window.__render.longTasks = []; }")
+    page.select_option('#timeRange', str(hours))
+    page.wait_for_load_state('networkidle')
+    for _ in range(refreshes):
+        page.evaluate("() => dashboard.loadData(true)")
+        page.wait_for_timeout(pause * 1000)
+    page.evaluate("() => window.gc && window.gc()")
+    result = page.evaluate("""() => ({
+        frames: window.__render.frames,
+        longTasks: window.__render.longTasks,
+        heap: performance.memory ? performance.memory.usedJSHeapSize : null
+    })""")
+    frames = result['frames']
+    return {
+        'frames': len(frames),
+        'p50': statistics.median(frames) if frames else 0.0,
+        'p95': percentile(frames, 0.95),
+        'max': max(frames, default=0.0),
+        'janky': sum(frame > 50 for frame in frames),
+        'long_task_ms': sum(result['longTasks']),
+        'heap_mib': result['heap'] / 2**20 if result['heap'] else None,
+    }
+
+
+def run_variant(browser, base_url, dashboard_js, args):
+    # The service worker would answer dashboard.js and API reads from its cache, around the routes below
+    context = browser.new_context(viewport={'width': 1440, 'height': 900}, service_workers='block')
+    context.add_init_script(INSTRUMENTATION)
+    if dashboard_js is not None:
+        context.route('**/static/js/dashboard.js',
+                      lambda route: route.fulfill(body=dashboard_js, content_type='application/javascript'))
+    if args.scripts:
+        for filename, pattern in CDN_SCRIPTS.items():
+            context.route(pattern, lambda route, path=os.path.join(args.scripts, filename):
+                          route.fulfill(path=path, content_type='application/javascript'))
+    page = context.new_page()
+    page.goto(f'{base_url}/dashboard')
+    page.wait_for_load_state('load')
+    if not page.evaluate("() => typeof Chart !== 'undefined'"):
+        sys.exit('Chart.js did not load: the CDN is unreachable; pass --scripts with local copies of '
+                 + ', '.join(CDN_SCRIPTS))
+    page.wait_for_function("() => typeof dashboard !== 'undefined' && dashboard && dashboard.chart")
+    page.wait_for_load_state('networkidle')
+    # Auto-refresh would interleave with the measured cycles
+    page.evaluate("() => dashboard.stopAutoRefresh()")
+    results = {name: measure_range(page, hours, args.refreshes, args.pause)
+               for name, hours in RANGES.items() if name in args.ranges}
+    context.close()
+    return results
+
+
+def print_results(label, results):
+    print(f"\n{label}")
+    print(f"{'range':<8}{'frames':>8}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}{'>50ms':>7}{'long tasks ms':>15}{'heap MiB':>10}")
+    for name, r in results.items():
+        heap = f"{r['heap_mib']:.1f}" if r['heap_mib'] is not None else '--'
+        print(f"{name:<8}{r['frames']:>8}{r['p50']:>9.1f}{r['p95']:>9.1f}{r['max']:>9.1f}{r['janky']:>7}"
+              f"{r['long_task_ms']:>15.0f}{heap:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--fixture', help='existing database to copy instead of synthesizing one')
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--devices', type=int, default=4)
+    parser.add_argument('--sensors', type=int, default=5, help='sensors per device')
+    parser.add_argument('--history-interval', type=int, default=10, help='seconds between synthesized readings')
+    parser.add_argument('--ranges', nargs='+', choices=list(RANGES), default=list(RANGES))
+    parser.add_argument('--refreshes', type=int, default=10, help='refresh cycles per time range')
+    parser.add_argument('--pause', type=float, default=1.0, help='seconds between refresh cycles')
+    parser.add_argument('--baseline-rev', help='also measure dashboard.js as of this git revision')
+    parser.add_argument('--browser', help='Chromium executable to use instead of Playwright\'s own')
+    parser.add_argument('--scripts', help=f"directory with {' and '.join(CDN_SCRIPTS)} to serve instead of the CDN")
+    parser.add_argument('--save', help='write the results to this JSON file')
+    args = parser.parse_args()
+
+    try:
+        from playwright.sync_api import sync_playwright
+    except ImportError:
+        sys.exit('render_bench needs Playwright: pip install playwright && playwright install chromium')
+
+    baseline_js = None
+    if args.baseline_rev:
+        baseline_js = subprocess.run(['git', 'show', f'{args.baseline_rev}:web_ui/static/js/dashboard.js'],
+                                     cwd=REPO_ROOT, check=True, capture_output=True, text=True).stdout
+    fixture_path = os.path.abspath(args.fixture) if args.fixture else None
+    save_path = os.path.abspath(args.save) if args.save else None
+    if args.scripts:
+        args.scripts = os.path.abspath(args.scripts)
+
+    server = import_server()
+    workdir = os.getcwd()
+    db_path = os.path.join(workdir, 'humidity.db')
+    os.remove(db_path)
+    if fixture_path:
+        shutil.copy(fixture_path, db_path)
+    else:
+        print(f"Synthesizing {args.days} days x {args.devices * args.sensors} sensors ...")
+        build_fixture(server, server.HumidityDatabase(db_path), args.days, args.devices, args.sensors,
+                      args.history_interval)
+
+    port = free_port()
+    base_url = f'http://127.0.0.1:{port}'
+    with open(os.path.join(workdir, 'server_output.log'), 'w') as server_output:
+        bootstrap = SERVER_BOOTSTRAP.format(root=REPO_ROOT, port=port, read_replica=None)
+        process = subprocess.Popen([sys.executable, '-c', bootstrap], cwd=workdir,
+                                   stdout=server_output, stderr=subprocess.STDOUT)
+        try:
+            wait_for_server(base_url, process)
+            variants = {}
+            with sync_playwright() as playwright:
+                browser = playwright.chromium.launch(
+                    executable_path=args.browser, args=['--enable-precise-memory-info', '--js-flags=--expose-gc'])
+                start = time.perf_counter()
+                variants['current'] = run_variant(browser, base_url, None, args)
+                print_results('current', variants['current'])
+                if baseline_js is not None:
+                    variants[args.baseline_rev] = run_variant(browser, base_url, baseline_js, args)
+                    print_results(args.baseline_rev, variants[args.baseline_rev])
+                print(f"\nMeasured in {time.perf_counter() - start:.0f}s")
+                browser_version = browser.version
+                browser.close()
+        finally:
+            process.terminate()
+            process.wait()
+
+    if save_path:
+        results = {
+            'variants': variants,
+            'config': {option: getattr(args, option)
+                       for option in ('days', 'devices', 'sensors', 'history_interval', 'refreshes', 'pause')},
+            'environment': {
+                'browser': browser_version,
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpus': os.cpu_count(),
+            },
+            'recorded_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        with open(save_path, 'w') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+        print(f"\nSaved results to {save_path}")
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
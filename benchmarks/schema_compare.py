@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""Compare the legacy TEXT-keyed humidity_readings schema with the compact schema.
+
+Builds a legacy database with synthetic readings, migrates a copy of it through
+HumidityDatabase (monthly partitions keyed by sensor_key/epoch-ms), and reports
+database size, insert rate, range-query speed and retention cost for both layouts.
+
+Usage:
+    python benchmarks/schema_compare.py --days 30 --devices 2 --sensors 3
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LEGACY_DDL = '''
+    CREATE TABLE humidity_readings
+    (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        device_id TEXT NOT NULL,
+        sensor_id TEXT,
+        sensor_pin INTEGER,
+        raw_value INTEGER NOT NULL,
+        humidity_percent REAL NOT NULL,
+        esp32_timestamp INTEGER,
+        server_timestamp TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+LEGACY_INDEXES = [
+    'CREATE INDEX idx_device_timestamp ON humidity_readings(device_id, created_at)',
+    'CREATE INDEX idx_sensor_timestamp ON humidity_readings(sensor_id, created_at)',
+    'CREATE INDEX idx_device_sensor_timestamp ON humidity_readings(device_id, sensor_id, created_at)',
+]
+ISRAEL_OFFSET = timezone(timedelta(hours=3))
+
+
+def synthesize_rows(days, devices, sensors, interval):
+    """Yield legacy rows ending now, one per sensor every `interval` seconds"""
+    end = datetime.now(timezone.utc).replace(microsecond=0)
+    start = end - timedelta(days=days)
+    device_ids = [f"ESP32_AA:BB:CC:DD:EE:{i:02X}" for i in range(devices)]
+    sensor_ids = [f"Garden_{i + 1}" for i in range(sensors)]
+    rng = random.Random(42)
+    t = start
+    step = 0
+    while t < end:
+        for device_id in device_ids:
+            for pin_index, sensor_id in enumerate(sensor_ids):
+                humidity = 40 + 20 * rng.random()
+                yield (device_id, sensor_id, 32 + pin_index, int(3250 - humidity * 22.5), humidity,
+                       step * interval * 1000,
+                       t.astimezone(ISRAEL_OFFSET).isoformat(),
+                       t.strftime('%Y-%m-%d %H:%M:%S'))
+        t += timedelta(seconds=interval)
+        step += 1
+
+
+def build_legacy(path, rows):
+    conn = sqlite3.connect(path)
+    conn.execute(LEGACY_DDL)
+    for ddl in LEGACY_INDEXES:
+        conn.execute(ddl)
+    conn.executemany('''
+        INSERT INTO humidity_readings
+        (device_id, sensor_id, sensor_pin, raw_value, humidity_percent, esp32_timestamp, server_timestamp, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+    conn.commit()
+    conn.execute('VACUUM')
+    conn.close()
+
+
+def time_inserts(insert_one, count):
+    """Insert `count` rows, committing each one like the ingest endpoint does"""
+    start = time.perf_counter()
+    for i in range(count):
+        insert_one(i)
+    return count / (time.perf_counter() - start)
+
+
+def time_query(conn, sql, params, repeat):
+    best = float('inf')
+    rows = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = len(conn.execute(sql, params).fetchall())
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--devices', type=int, default=2)
+    parser.add_argument('--sensors', type=int, default=3)
+    parser.add_argument('--interval', type=int, default=10, help='seconds between readings per sensor')
+    parser.add_argument('--inserts', type=int, default=2000, help='single-row commits for the insert-rate test')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='schema_compare_')
+    # server.py creates its log file, upload folder and default database in the cwd on import
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_ROOT)
+    import server
+
+    legacy_path = os.path.join(workdir, 'legacy.db')
+    compact_path = os.path.join(workdir, 'compact.db')
+
+    print(f"Synthesizing {args.days} days x {args.devices} devices x {args.sensors} sensors "
+          f"every {args.interval}s ...")
+    build_legacy(legacy_path, synthesize_rows(args.days, args.devices, args.sensors, args.interval))
+    shutil.copy(legacy_path, compact_path)
+
+    start = time.perf_counter()
+    compact_db = server.HumidityDatabase(compact_path)
+    migrate_seconds = time.perf_counter() - start
+
+    legacy = sqlite3.connect(legacy_path)
+    compact = sqlite3.connect(compact_path)
+    compact.row_factory = sqlite3.Row
+    row_count = legacy.execute('SELECT COUNT(*) FROM humidity_readings').fetchone()[0]
+    legacy_size = os.path.getsize(legacy_path)
+    compact_size = os.path.getsize(compact_path)
+
+    device_id = 'ESP32_AA:BB:CC:DD:EE:00'
+    sensor_id = 'Garden_1'
+    sensor_key = compact.execute('SELECT sensor_key FROM sensors WHERE device_id = ? AND sensor_id = ?',
+                                 (device_id, sensor_id)).fetchone()[0]
+    now_ms = int(time.time() * 1000)
+
+    queries = []
+    for label, hours in (('1 sensor, 24h', 24), ('1 sensor, 7d', 168)):
+        legacy_ms, legacy_rows = time_query(legacy, '''
+            SELECT * FROM humidity_readings
+            WHERE device_id = ? AND sensor_id = ? AND created_at > datetime('now', ?)
+            ORDER BY created_at DESC
+        ''', (device_id, sensor_id, f'-{hours} hours'), args.repeat)
+        compact_ms, compact_rows = time_query(compact, '''
+            SELECT * FROM readings WHERE sensor_key = ? AND ts > ? ORDER BY ts DESC
+        ''', (sensor_key, now_ms - hours * 3600 * 1000), args.repeat)
+        queries.append((label, legacy_ms, compact_ms, legacy_rows, compact_rows))
+    legacy_ms, legacy_rows = time_query(legacy, '''
+        SELECT * FROM humidity_readings WHERE created_at > datetime('now', '-24 hours') ORDER BY created_at DESC
+    ''', (), args.repeat)
+    compact_ms, compact_rows = time_query(compact, '''
+        SELECT s.device_id, s.sensor_id, r.* FROM readings r JOIN sensors s ON s.sensor_key = r.sensor_key
+        WHERE r.ts > ? ORDER BY r.ts DESC
+    ''', (now_ms - 24 * 3600 * 1000,), args.repeat)
+    queries.append(('all sensors, 24h', legacy_ms, compact_ms, legacy_rows, compact_rows))
+
+    def legacy_insert(i):
+        legacy.execute('''
+            INSERT INTO humidity_readings
+            (device_id, sensor_id, sensor_pin, raw_value, humidity_percent, esp32_timestamp, server_timestamp)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (device_id, sensor_id, 32, 2000, 50.0, i, server.get_israel_timestamp()))
+        legacy.commit()
+
+    def compact_insert(i):
+        key = compact_db.get_sensor_key(compact, device_id, sensor_id, 32)
+        ts = server.get_epoch_ms() + i
+        compact.execute(f'''
+            INSERT OR IGNORE INTO {server.partition_for_ts(ts)}
+            (sensor_key, ts, raw_value, humidity_percent, esp32_timestamp)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (key, ts, 2000, 50.0, i))
+        compact.commit()
+
+    legacy_rate = time_inserts(legacy_insert, args.inserts)
+    compact_rate = time_inserts(compact_insert, args.inserts)
+
+    # Retention: expire everything before the current UTC month, i.e. exactly the older partitions
+    month_start = datetime.now(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    start = time.perf_counter()
+    legacy_deleted = legacy.execute('DELETE FROM humidity_readings WHERE created_at < ?',
+                                    (month_start.strftime('%Y-%m-%d %H:%M:%S'),)).rowcount
+    legacy.commit()
+    legacy_cleanup_ms = (time.perf_counter() - start) * 1000
+    # Cutoff one minute past the month boundary so clock truncation cannot keep the old partition
+    retention_days = ((datetime.now(timezone.utc) - month_start).total_seconds() - 60) / 86400
+    start = time.perf_counter()
+    dropped = compact_db.cleanup_old_data(retention_days)
+    compact_cleanup_ms = (time.perf_counter() - start) * 1000
+
+    print(f"\nRows: {row_count}   migration time: {migrate_seconds:.2f}s")
+    print(f"{'':28}{'legacy':>14}{'compact':>14}{'change':>10}")
+    print(f"{'DB size (MiB)':28}{legacy_size / 2**20:>14.1f}{compact_size / 2**20:>14.1f}"
+          f"{(compact_size / legacy_size - 1) * 100:>9.0f}%")
+    print(f"{'bytes / row':28}{legacy_size / row_count:>14.1f}{compact_size / row_count:>14.1f}")
+    print(f"{'insert rate (rows/s)':28}{legacy_rate:>14.0f}{compact_rate:>14.0f}"
+          f"{(compact_rate / legacy_rate - 1) * 100:>9.0f}%")
+    for label, legacy_ms, compact_ms, legacy_rows, compact_rows in queries:
+        print(f"{'query ' + label + ' (ms)':28}{legacy_ms:>14.1f}{compact_ms:>14.1f}"
+              f"{(compact_ms / legacy_ms - 1) * 100:>9.0f}%   ({legacy_rows}/{compact_rows} rows)")
+
+    print(f"{'retention cleanup (ms)':28}{legacy_cleanup_ms:>14.1f}{compact_cleanup_ms:>14.1f}"
+          f"{(compact_cleanup_ms / legacy_cleanup_ms - 1) * 100:>9.0f}%   "
+          f"({legacy_deleted} rows deleted / dropped {dropped})")
+
+    legacy.close()
+    compact.close()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
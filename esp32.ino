@@ -1,19 +1,24 @@
+#define ARDUINOJSON_USE_LONG_LONG 1  // 64-bit sequence numbers
 #include <WiFi.h>
 #include <HTTPClient.h>
 #include <ArduinoJson.h>
 #include <ArduinoOTA.h>
+#include <Preferences.h>
 #include "config.h"  // Include configuration file
 
 // ESP32 Multi-Sensor Humidity Monitor
 // Supports multiple humidity sensors configured in config.h
 // Each sensor is read independently and data is averaged before transmission
+// Averages are buffered in RAM and uploaded in sequence-numbered batches, so
+// readings survive Wi-Fi or server outages and retries are never stored twice
 
 // Use configuration values from config.h
 const char* ssid = WIFI_SSID;
 const char* password = WIFI_PASSWORD;
 const char* serverIP = SERVER_IP;
 const int serverPort = SERVER_PORT;
-const char* endpoint = SERVER_ENDPOINT;
+const char* batchEndpoint = SERVER_BATCH_ENDPOINT;
+const char* sequenceEndpoint = SERVER_SEQUENCE_ENDPOINT;
 
 // Multiple sensor configuration
 const int humidityPins[NUM_SENSORS] = HUMIDITY_PINS;
@@ -32,6 +37,28 @@ struct SensorData {
 
 SensorData sensors[NUM_SENSORS];
 
+// Readings waiting for the server to acknowledge them (oldest first ring buffer)
+struct PendingReading {
+  uint64_t seq;
+  uint32_t takenAt;  // millis() when the average was computed
+  uint8_t sensorIndex;
+  int16_t rawValue;
+  float humidityPercent;
+};
+
+PendingReading pending[PENDING_BUFFER_SIZE];
+int pendingHead = 0;
+int pendingCount = 0;
+// Set when an upload fails; the backlog is then retried on the next SERVER_INTERVAL
+// instead of on every loop() pass
+bool uploadFailed = false;
+
+// Sequence numbers are (bootId << 32 | counter); bootId is persisted in NVS and
+// bumped on every boot so numbers keep increasing across restarts
+Preferences preferences;
+uint32_t bootId = 0;
+uint32_t sequenceCounter = 0;
+
 void setup() {
   Serial.begin(115200);
   delay(1000);
@@ -47,6 +74,10 @@ void setup() {
   analogReadResolution(12);  // Set ADC resolution to 12 bits
   analogSetAttenuation(ADC_11db);  // Set attenuation for 3.3V range
 
+  preferences.begin("humidity", false);
+  bootId = preferences.getUInt("boot_id", 0) + 1;
+  preferences.putUInt("boot_id", bootId);
+
   Serial.println("Connecting to Wi-Fi...");
   WiFi.begin(ssid, password);
 
@@ -66,6 +97,8 @@ void setup() {
   Serial.print("IP address: ");
   Serial.println(WiFi.localIP());
 
+  syncSequenceWithServer();
+
   // Initialize OTA
   ArduinoOTA.setHostname("ESP32_HumiditySensor");
   ArduinoOTA.setPassword("admin");  // Set OTA password for security
@@ -155,61 +188,126 @@ void loop() {
         Serial.print(sensors[i].readingCount);
         Serial.println(" readings)");
         
-        sendHumidityData(i, sensors[i].lastRawValue, avgHumidity);
+        queueReading(i, sensors[i].lastRawValue, avgHumidity);
         
         // Reset averaging for this sensor
         sensors[i].humiditySum = 0;
         sensors[i].readingCount = 0;
       }
       
+      uploadFailed = false;
+      flushPendingReadings();
       lastServerSend = currentTime;
     }
   }
+
+  // Work through a backlog a few batches per pass, so OTA and sensor reads keep running
+  if (pendingCount > 0 && !uploadFailed) {
+    flushPendingReadings();
+  }
+}
+
+String deviceId() {
+  return "ESP32_" + WiFi.macAddress();
+}
+
+// If NVS was erased the stored boot id restarts at 1; resume above the server's high-water mark
+void syncSequenceWithServer() {
+  HTTPClient http;
+  String url = "http://" + String(serverIP) + ":" + String(serverPort) + sequenceEndpoint + deviceId();
+  http.begin(url);
+
+  if (http.GET() == 200) {
+    StaticJsonDocument<200> doc;
+    if (!deserializeJson(doc, http.getString()) && !doc["high_water"].isNull()) {
+      uint32_t serverBootId = (uint32_t)(doc["high_water"].as<uint64_t>() >> 32);
+      if (serverBootId >= bootId) {
+        bootId = serverBootId + 1;
+        preferences.putUInt("boot_id", bootId);
+      }
+    }
+  }
+  http.end();
+
+  Serial.print("Sequence boot id: ");
+  Serial.println(bootId);
 }
 
-void sendHumidityData(int sensorIndex, int rawValue, float humidityPercent) {
-  if (WiFi.status() == WL_CONNECTED) {
+void queueReading(int sensorIndex, int rawValue, float humidityPercent) {
+  if (pendingCount == PENDING_BUFFER_SIZE) {
+    // Buffer full: drop the oldest reading to make room
+    pendingHead = (pendingHead + 1) % PENDING_BUFFER_SIZE;
+    pendingCount--;
+    Serial.println("Pending buffer full, dropped oldest reading");
+  }
+
+  PendingReading &reading = pending[(pendingHead + pendingCount) % PENDING_BUFFER_SIZE];
+  reading.seq = ((uint64_t)bootId << 32) | ++sequenceCounter;
+  reading.takenAt = millis();
+  reading.sensorIndex = sensorIndex;
+  reading.rawValue = rawValue;
+  reading.humidityPercent = humidityPercent;
+  pendingCount++;
+}
+
+// Upload up to MAX_BATCHES_PER_PASS batches of buffered readings, oldest first; stops
+// at the first failure and retries on the next cycle (the server ignores sequence
+// numbers it already has)
+void flushPendingReadings() {
+  for (int sent = 0; sent < MAX_BATCHES_PER_PASS && pendingCount > 0; sent++) {
+    if (WiFi.status() != WL_CONNECTED) {
+      Serial.print("WiFi not connected, buffering ");
+      Serial.print(pendingCount);
+      Serial.println(" readings");
+      uploadFailed = true;
+      return;
+    }
+
+    int batchCount = min(pendingCount, UPLOAD_BATCH_SIZE);
+    DynamicJsonDocument doc(512 + batchCount * 192);
+    doc["device_id"] = deviceId();
+    JsonArray readings = doc.createNestedArray("readings");
+
+    uint32_t now = millis();
+    for (int n = 0; n < batchCount; n++) {
+      PendingReading &reading = pending[(pendingHead + n) % PENDING_BUFFER_SIZE];
+      JsonObject item = readings.createNestedObject();
+      item["seq"] = reading.seq;
+      item["sensor_id"] = sensorNames[reading.sensorIndex];
+      item["sensor_pin"] = humidityPins[reading.sensorIndex];
+      item["raw_value"] = reading.rawValue;
+      item["humidity_percent"] = reading.humidityPercent;
+      item["timestamp"] = reading.takenAt;
+      item["age_ms"] = now - reading.takenAt;  // unsigned math handles millis() rollover
+    }
+
+    String jsonString;
+    serializeJson(doc, jsonString);
+
     HTTPClient http;
-    
-    // Create URL
-    String url = "http://" + String(serverIP) + ":" + String(serverPort) + endpoint;
+    String url = "http://" + String(serverIP) + ":" + String(serverPort) + batchEndpoint;
     http.begin(url);
     http.addHeader("Content-Type", "application/json");
-    
-    // Create JSON payload
-    StaticJsonDocument<300> doc;
-    doc["device_id"] = "ESP32_" + WiFi.macAddress();
-    doc["sensor_id"] = sensorNames[sensorIndex];
-    doc["sensor_pin"] = humidityPins[sensorIndex];
-    doc["raw_value"] = rawValue;
-    doc["humidity_percent"] = humidityPercent;
-    doc["timestamp"] = millis();
-    
-    String jsonString;
-    serializeJson(doc, jsonString);
-    
-    // Send POST request
     int httpResponseCode = http.POST(jsonString);
-    
-    if (httpResponseCode > 0) {
-      Serial.print("HTTP Response for ");
-      Serial.print(sensorNames[sensorIndex]);
-      Serial.print(": ");
-      Serial.println(httpResponseCode);
-      if (httpResponseCode == 200) {
-        Serial.print("Data sent successfully for ");
-        Serial.println(sensorNames[sensorIndex]);
-      }
-    } else {
-      Serial.print("Error sending data for ");
-      Serial.print(sensorNames[sensorIndex]);
-      Serial.print(": ");
-      Serial.println(httpResponseCode);
-    }
-    
     http.end();
-  } else {
-    Serial.println("WiFi not connected, cannot send data");
+
+    if (httpResponseCode != 200) {
+      Serial.print("Error sending batch: ");
+      Serial.print(httpResponseCode);
+      Serial.print(", keeping ");
+      Serial.print(pendingCount);
+      Serial.println(" readings for retry");
+      uploadFailed = true;
+      return;
+    }
+
+    pendingHead = (pendingHead + batchCount) % PENDING_BUFFER_SIZE;
+    pendingCount -= batchCount;
+    Serial.print("Uploaded ");
+    Serial.print(batchCount);
+    Serial.print(" readings, ");
+    Serial.print(pendingCount);
+    Serial.println(" still pending");
   }
 }
 
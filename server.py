@@ -1,20 +1,45 @@
 #!/usr/bin/env python3
 
+import argparse
+import copy
+import csv
+import functools
+import hashlib
+import heapq
+import inspect
 import json
 import logging
 from logging.handlers import RotatingFileHandler
+import math
+import multiprocessing
+import queue
+import random
+import re
+import signal
 import sqlite3
 import threading
 import time
 import uuid
-from datetime import datetime
-from flask import Flask, request, jsonify, render_template, send_from_directory, send_file
+import zipfile
+from collections import Counter, OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from itertools import chain, islice
+from flask import (Flask, Response, g, has_request_context, request, jsonify, render_template, send_from_directory,
+                   send_file, stream_with_context, url_for)
 from contextlib import contextmanager
+from werkzeug.exceptions import RequestEntityTooLarge
 from werkzeug.utils import secure_filename
 import os
-import pytz
+import pathlib
 import requests
-from PIL import Image, ImageOps
+import struct
+import sys
+from array import array
+import numpy as np
+from PIL import ExifTags, Image, ImageOps
 import io
 
 # Configuration
@@ -24,13 +49,309 @@ CONFIG = {
     'database': 'humidity.db',
     'log_file': 'humidity_server.log',
     'log_level': logging.INFO,
-    'cleanup_days': 30,  # Keep sensor data for 30 days (memories are kept forever)
+    'cleanup_days': 30,  # Keep sensor data for at least 30 days, dropped in whole months (memories are kept forever)
     'timezone': 'Asia/Jerusalem',  # Israel timezone
     'upload_folder': 'uploads/photos',  # Photo storage directory
     'max_file_size': 10 * 1024 * 1024,  # 10MB max file size
-    'allowed_extensions': {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+    'max_import_size': 500 * 1024 * 1024,  # Whole request limit for /api/memories/import; each photo is still max_file_size
+    'max_readings_import_size': 500 * 1024 * 1024,  # Request limit for /humidity/import (a month of 6 sensors is ~80MB)
+    'import_workers': None,  # Processes resizing imported photos (None = one per CPU)
+    'allowed_extensions': {'png', 'jpg', 'jpeg', 'gif', 'webp'},
+    'photo_format': 'JPEG',  # Format of stored photos: 'JPEG' or 'WEBP'
+    'photo_progressive': True,  # Store JPEGs progressive, so large photos show early on slow connections
+    'recent_buffer_points': 720,  # Newest readings kept in memory per sensor (2 hours at 10s)
+    'rollup_retention_days': 400,  # Hourly rollups outlive raw partitions for long-range analytics
+    'analytics_raw_max_hours': 48,  # Longer analytics windows are computed from hourly rollups
+    'alert_ewma_minutes': 10,  # Smoothing time constant for threshold alerts
+    'alert_slope_hours': 2,  # Smoothing time constant for the drying-rate estimate
+    'alert_rearm_margin': 5.0,  # Alerts re-arm once humidity recovers this far above the threshold
+    'alert_warning_hours': 12,  # Warn when the threshold is forecast to be crossed within this time
+    'alert_max_age_minutes': 30,  # Older (replayed or imported) readings update state but never alert
+    'expected_interval_seconds': 10,  # Device SERVER_INTERVAL; gaps are measured against it
+    'health_window_minutes': 60,  # Window of the raw-value statistics used to spot broken sensors
+    'health_check_seconds': 60,  # How often the health monitor looks for silent sensors and transitions
+    'health_offline_minutes': 5,  # A sensor with no readings for this long is reported offline
+    'health_gap_factor': 3,  # A reading more than this many intervals after the previous one is a gap
+    'health_raw_range': (0, 4095),  # ADC limits; readings pinned at either end mean a wiring fault
+    'query_profiling': False,  # Time every SQL statement (opt-in; also --profile-queries or /api/admin/queries)
+    'slow_query_ms': 200,  # Profiled statements slower than this are logged with their query plan
+    # Dashboard reads: None shares the primary connection; 'wal' switches the database to WAL and reads
+    # through read-only connections; 'snapshot' reads a backup copy refreshed in the background
+    'read_replica': None,
+    'replica_refresh_seconds': 30,  # How often the snapshot is re-copied while it is being read
+    'replica_max_staleness_seconds': 120,  # Older snapshots are not used; reads fall back to the primary
+    # Maintenance jobs: cron schedule (minute hour day month weekday, local time) and random start delay in seconds
+    'schedules': {
+        'cleanup': ('30 3 * * *', 900),
+        'trim_rollups': ('45 3 * * *', 900),
+        'optimize': ('15 4 * * *', 900),
+        'wal_checkpoint': ('*/10 * * * *', 60),
+        'photo_sweep': ('0 5 * * 0', 900),
+    },
+    'job_duty_cycle': 0.25,  # Jobs pause between slices of work so they use at most this share of the time
+    'photo_sweep_grace_minutes': 60,  # Unreferenced photos younger than this may belong to an upload in progress
+    'telegram_chat_id': -1002340388184,  # Chat the bot relays alerts to
+    'telegram_sender': 'Listener: garden',  # Sender name alerts appear under
+    'webhook_url': 'http://127.0.0.1:5000/webhook',  # Telegram bot webhook that delivers the alerts
+    # Further gardens served under /sites/<name>/, each with its own database and photos:
+    # {name: {database, upload_folder, cleanup_days, rollup_retention_days}}, every value optional
+    # (<sites_folder>/<name>/humidity.db, <sites_folder>/<name>/photos and the global retention)
+    'sites': {},
+    'sites_folder': 'sites',
+    'max_open_sites': 8,  # Site databases kept open besides the default one; the least recently used idle one is closed
+    'site_idle_seconds': 1800,  # Sites without requests for this long are closed (keep above health_offline_minutes)
 }
 
+# The values above are defaults. Each setting can be overridden, in increasing precedence, by a
+# JSON config file (--config, GARDEN_CONFIG or ./garden_config.json), a GARDEN_<SETTING>
+# environment variable and --set SETTING=VALUE on the command line. SIGHUP re-reads the file
+# and environment and applies the changes that do not need a restart.
+DEFAULT_CONFIG = copy.deepcopy(CONFIG)
+CONFIG_ENV_PREFIX = 'GARDEN_'
+CONFIG_FILE_ENV = 'GARDEN_CONFIG'
+DEFAULT_CONFIG_FILE = 'garden_config.json'
+# Only read at startup; a reload that changes them logs a warning and keeps the running value
+RESTART_REQUIRED_SETTINGS = ('host', 'port', 'database', 'log_file', 'timezone', 'upload_folder', 'read_replica',
+                             'import_workers')
+
+
+class ConfigError(ValueError):
+    """Invalid configuration file or setting"""
+
+
+def parse_config_value(text):
+    """Value of an environment variable or --set: JSON if it parses (numbers, true, null, lists), else the text"""
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def _positive_int(value, allow_none=False):
+    if value is None and allow_none:
+        return None
+    if isinstance(value, bool) or not isinstance(value, int) or value <= 0:
+        raise ValueError('expected a positive integer')
+    return value
+
+
+def _choice(*choices, normalize=None):
+    def validate(value):
+        normalized = normalize(value) if normalize and isinstance(value, str) else value
+        if normalized not in choices:
+            raise ValueError(f"expected one of {', '.join(str(choice) for choice in choices)}")
+        return normalized
+    return validate
+
+
+def _log_level(value):
+    if isinstance(value, str) and isinstance(logging.getLevelName(value.upper()), int):
+        return logging.getLevelName(value.upper())
+    if isinstance(value, int) and not isinstance(value, bool) and value >= 0:
+        return value
+    raise ValueError('expected a level name such as INFO or DEBUG')
+
+
+def _port(value):
+    if not _positive_int(value) <= 65535:
+        raise ValueError('expected a port number')
+    return value
+
+
+def _timezone(value):
+    try:
+        ZoneInfo(value)
+    except (ZoneInfoNotFoundError, TypeError, ValueError):
+        raise ValueError(f'unknown timezone {value!r}')
+    return value
+
+
+def _duty_cycle(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 < value <= 1:
+        raise ValueError('expected a number in (0, 1]')
+    return float(value)
+
+
+def _extensions(value):
+    if not isinstance(value, (list, tuple, set)) or not all(isinstance(ext, str) for ext in value):
+        raise ValueError('expected a list of file extensions')
+    return {ext.lower().lstrip('.') for ext in value}
+
+
+def _raw_range(value):
+    if (not isinstance(value, (list, tuple)) or len(value) != 2
+            or not all(isinstance(v, int) and not isinstance(v, bool) for v in value) or value[0] >= value[1]):
+        raise ValueError('expected [low, high] integers')
+    return tuple(value)
+
+
+def _schedules(value):
+    """Per-job overrides of the default schedules; cron expressions are parsed when applied"""
+    if not isinstance(value, dict):
+        raise ValueError('expected {job: [cron, jitter_seconds]}')
+    schedules = dict(DEFAULT_CONFIG['schedules'])
+    for name, schedule in value.items():
+        if name not in schedules:
+            raise ValueError(f'unknown job {name!r}')
+        if (not isinstance(schedule, (list, tuple)) or len(schedule) != 2 or not isinstance(schedule[0], str)
+                or len(schedule[0].split()) != 5 or isinstance(schedule[1], bool)
+                or not isinstance(schedule[1], (int, float)) or schedule[1] < 0):
+            raise ValueError(f'{name}: expected [five-field cron expression, jitter seconds]')
+        schedules[name] = tuple(schedule)
+    return schedules
+
+
+def _chat_id(value):
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError('expected a numeric chat id or @channel name')
+    return value
+
+
+def _url(value):
+    if not isinstance(value, str) or not value.startswith(('http://', 'https://')):
+        raise ValueError('expected an http(s) URL')
+    return value
+
+
+# The site served without a /sites/<name>/ prefix, from the top-level database and upload folder
+DEFAULT_SITE = 'default'
+SITE_NAME_PATTERN = re.compile(r'^[a-z0-9][a-z0-9_-]{0,63}$')
+# Settings a site can override; the rest are shared by all sites
+SITE_SETTINGS = ('database', 'upload_folder', 'cleanup_days', 'rollup_retention_days')
+
+
+def _sites(value):
+    """{name: {setting: value}}, or a list of names that use the defaults"""
+    if isinstance(value, list) and all(isinstance(name, str) for name in value):
+        value = {name: {} for name in value}
+    if not isinstance(value, dict):
+        raise ValueError('expected {site: {setting: value}}')
+    sites = {}
+    for name, settings in value.items():
+        if not SITE_NAME_PATTERN.match(name) or name == DEFAULT_SITE:
+            raise ValueError(f'invalid site name {name!r}: use lowercase letters, digits, - and _')
+        if not isinstance(settings, dict):
+            raise ValueError(f'{name}: expected an object of settings')
+        for key, setting in settings.items():
+            if key not in SITE_SETTINGS:
+                raise ValueError(f"{name}: unknown site setting {key!r} (use {', '.join(SITE_SETTINGS)})")
+            try:
+                validate_setting(key, setting)
+            except ValueError as e:
+                raise ValueError(f'{name}.{key}: {e}')
+        sites[name] = dict(settings)
+    return sites
+
+
+# Settings with rules beyond "same type as the default"
+SETTING_VALIDATORS = {
+    'port': _port,
+    'log_level': _log_level,
+    'timezone': _timezone,
+    'import_workers': lambda value: _positive_int(value, allow_none=True),
+    'allowed_extensions': _extensions,
+    'photo_format': _choice('JPEG', 'WEBP', normalize=str.upper),
+    'health_raw_range': _raw_range,
+    'read_replica': _choice(None, 'wal', 'snapshot'),
+    'schedules': _schedules,
+    'job_duty_cycle': _duty_cycle,
+    'telegram_chat_id': _chat_id,
+    'webhook_url': _url,
+    'sites': _sites,
+}
+
+
+def validate_setting(key, value):
+    """Check a setting against its rules, or the type of its default; returns the normalized value"""
+    if key in SETTING_VALIDATORS:
+        return SETTING_VALIDATORS[key](value)
+    default = DEFAULT_CONFIG[key]
+    if isinstance(default, bool):
+        if not isinstance(value, bool):
+            raise ValueError('expected true or false')
+    elif isinstance(default, int):
+        _positive_int(value)
+    elif isinstance(default, float):
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+            raise ValueError('expected a non-negative number')
+        value = float(value)
+    elif not isinstance(value, str) or not value:
+        raise ValueError('expected a non-empty string')
+    return value
+
+
+def load_config(path=None, overrides=None, environ=None):
+    """Effective configuration: defaults, then the config file, GARDEN_* environment and overrides
+
+    GARDEN_* variables that name no setting are ignored with a warning, so a stray
+    variable in the shell cannot keep the server from starting.
+    """
+    environ = os.environ if environ is None else environ
+    path = path or environ.get(CONFIG_FILE_ENV) or (DEFAULT_CONFIG_FILE if os.path.exists(DEFAULT_CONFIG_FILE) else None)
+    layers = []
+    if path:
+        try:
+            with open(path, encoding='utf-8') as f:
+                values = json.load(f)
+        except (OSError, ValueError) as e:
+            raise ConfigError(f"Cannot read config file {path}: {e}")
+        if not isinstance(values, dict):
+            raise ConfigError(f"Config file {path} must contain a JSON object")
+        layers.append((path, values))
+    environment = {}
+    for name, value in environ.items():
+        if not name.startswith(CONFIG_ENV_PREFIX) or name == CONFIG_FILE_ENV:
+            continue
+        key = name[len(CONFIG_ENV_PREFIX):].lower()
+        if key in DEFAULT_CONFIG:
+            environment[key] = parse_config_value(value)
+        else:
+            # Logging is not set up yet at startup; Python then prints warnings to stderr
+            logging.getLogger(__name__).warning(f"Ignoring environment variable {name}: no setting {key!r}")
+    layers.append(('environment', environment))
+    layers.append(('--set', overrides or {}))
+
+    config = copy.deepcopy(DEFAULT_CONFIG)
+    for source, values in layers:
+        for key, value in values.items():
+            if key not in DEFAULT_CONFIG:
+                raise ConfigError(f"Unknown setting {key!r} in {source}")
+            try:
+                config[key] = validate_setting(key, value)
+            except ValueError as e:
+                raise ConfigError(f"Invalid {key} in {source}: {e}")
+    return config
+
+
+def add_config_arguments(parser):
+    parser.add_argument('--config', help=f'JSON config file (default: ${CONFIG_FILE_ENV} or ./{DEFAULT_CONFIG_FILE})')
+    parser.add_argument('--set', action='append', default=[], metavar='SETTING=VALUE',
+                        help='Override a setting (repeatable); takes precedence over the file and environment')
+
+
+def parse_config_args(argv):
+    """Config file path and --set overrides from the command line"""
+    parser = argparse.ArgumentParser(add_help=False)
+    add_config_arguments(parser)
+    known, _ = parser.parse_known_args(argv)
+    overrides = {}
+    for item in known.set:
+        key, separator, value = item.partition('=')
+        if not separator:
+            raise ConfigError(f"--set expects SETTING=VALUE, got {item!r}")
+        overrides[key.strip()] = parse_config_value(value)
+    return known.config, overrides
+
+
+# Command-line config is only read when running as the server; reloads re-apply it on top
+config_path, config_overrides = None, {}
+try:
+    if __name__ == '__main__':
+        config_path, config_overrides = parse_config_args(sys.argv[1:])
+    CONFIG.update(load_config(config_path, config_overrides))
+except ConfigError as e:
+    sys.exit(f"Configuration error: {e}")
+
 
 # Setup logging with rotation
 log_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -117,54 +438,82 @@ def allowed_file(filename):
            filename.rsplit('.', 1)[1].lower() in CONFIG['allowed_extensions']
 
 
-def resize_image(image_data, max_width=1920, max_height=1080, quality=85, rotation=None):
+def resize_image(image_data, max_width=1920, max_height=1080, quality=85, rotation=None,
+                 output_format=None, progressive=None):
     """Resize, rotate and optimize image while maintaining aspect ratio
     
+    JPEGs are downscaled while decoding (draft mode) and other images with
+    Image.reduce before the final LANCZOS pass, and orientation is applied to the
+    already-resized image. Images already within bounds, upright, in the output
+    format and without EXIF or XMP metadata are returned unchanged; re-encoding
+    strips the metadata (camera GPS position included) from all others.
+
     Args:
         image_data: Raw image bytes
         max_width: Maximum width in pixels
         max_height: Maximum height in pixels
-        quality: JPEG quality (1-100)
+        quality: JPEG/WebP quality (1-100)
         rotation: Manual rotation in degrees (0, 90, 180, 270) or None for auto-rotation only
+        output_format: 'JPEG' or 'WEBP' (default CONFIG['photo_format'])
+        progressive: Write a progressive JPEG (default CONFIG['photo_progressive'])
     """
+    output_format = (output_format or CONFIG['photo_format']).upper()
+    progressive = CONFIG['photo_progressive'] if progressive is None else progressive
     try:
         logger.info(f"Starting image processing - Input size: {len(image_data)} bytes")
         
-        # Open image from bytes
+        # Open image from bytes; pixels are not decoded yet
         img = Image.open(io.BytesIO(image_data))
+        orientation = img.getexif().get(ExifTags.Base.Orientation, 1)
         
-        # Apply automatic EXIF orientation correction first
-        img = ImageOps.exif_transpose(img)
-        
-        # Apply manual rotation if specified
-        if rotation is not None:
-            if rotation in [90, 180, 270]:
-                img = img.rotate(-rotation, expand=True)  # Negative because PIL rotates counter-clockwise
-            elif rotation != 0:
-                logger.warning(f"Invalid rotation value {rotation}, skipping manual rotation")
+        if rotation not in (None, 0, 90, 180, 270):
+            logger.warning(f"Invalid rotation value {rotation}, skipping manual rotation")
+            rotation = None
         
-        # Convert to RGB if necessary (handles RGBA, P mode images)
-        if img.mode in ('RGBA', 'P'):
-            img = img.convert('RGB')
-        
-        # Calculate new size maintaining aspect ratio
+        # Fit the bounds as the image will be displayed: EXIF orientations 5-8 and
+        # quarter turns swap width and height
         original_width, original_height = img.size
+        if (orientation in (5, 6, 7, 8)) != (rotation in (90, 270)):
+            max_width, max_height = max_height, max_width
+        
+        has_metadata = bool(img.getexif()) or 'xmp' in img.info
+        if (original_width <= max_width and original_height <= max_height and not has_metadata
+                and not rotation and img.format == output_format):
+            logger.info(f"Image already within bounds, upright and without metadata "
+                        f"({original_width}x{original_height}), keeping original")
+            return image_data
         
         # Only resize if image is larger than max dimensions
         if original_width > max_width or original_height > max_height:
             ratio = min(max_width / original_width, max_height / original_height)
-            new_width = int(original_width * ratio)
-            new_height = int(original_height * ratio)
+            new_size = (int(original_width * ratio), int(original_height * ratio))
             
-            logger.info(f"Resizing image from {original_width}x{original_height} to {new_width}x{new_height}")
+            logger.info(f"Resizing image from {original_width}x{original_height} to {new_size[0]}x{new_size[1]}")
             
-            # Use LANCZOS for high quality resizing
-            img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+            # Let libjpeg decode at 1/2, 1/4 or 1/8 scale, never below the target size
+            if img.format == 'JPEG':
+                img.draft('RGB', new_size)
+            # Shrink by an integer factor first, then LANCZOS over the last 3x
+            img = img.resize(new_size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+        
+        # Apply EXIF orientation, then manual rotation if specified
+        img = ImageOps.exif_transpose(img)
+        if rotation:
+            img = img.rotate(-rotation, expand=True)  # Negative because PIL rotates counter-clockwise
+        
+        # Convert to RGB if necessary (handles RGBA, P, CMYK and other modes)
+        if img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
         
-        # Save optimized image to bytes
+        # Save optimized image to bytes, keeping the colour profile
         output = io.BytesIO()
-        img.save(output, format='JPEG', quality=quality, optimize=True)
-        output.seek(0)
+        icc_profile = img.info.get('icc_profile')
+        if output_format == 'WEBP':
+            img.save(output, format='WEBP', quality=quality, icc_profile=icc_profile)
+        else:
+            # Progressive JPEGs always get optimized Huffman tables
+            img.save(output, format='JPEG', quality=quality, optimize=not progressive,
+                     progressive=progressive, icc_profile=icc_profile)
         
         result_data = output.getvalue()
         logger.info(f"Image processing completed - Output size: {len(result_data)} bytes (reduction: {((len(image_data) - len(result_data)) / len(image_data) * 100):.1f}%)")
@@ -176,16 +525,206 @@ def resize_image(image_data, max_width=1920, max_height=1080, quality=85, rotati
         return image_data  # Return original if processing fails
 
 
-def generate_photo_filename(original_filename):
-    """Generate unique filename for uploaded photo"""
-    ext = original_filename.rsplit('.', 1)[1].lower() if '.' in original_filename else 'jpg'
-    unique_id = str(uuid.uuid4())
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    return f"{timestamp}_{unique_id}.{ext}"
+def photo_extension(original_filename, photo_data, processed_data, output_format=None):
+    """Extension for a stored photo: that of the output format once processed, else the uploaded file's own"""
+    if processed_data is not photo_data:
+        return 'webp' if (output_format or CONFIG['photo_format']).upper() == 'WEBP' else 'jpg'
+    return original_filename.rsplit('.', 1)[1].lower() if '.' in original_filename else 'jpg'
 
 
-# Timezone configuration
-ISRAEL_TZ = pytz.timezone(CONFIG['timezone'])
+def init_import_worker():
+    """Keep photo import workers from writing (and rotating) the server log at INFO level"""
+    logger.setLevel(logging.WARNING)
+
+
+def process_import_photo(photo_data, filename, rotation, output_format, progressive):
+    """Resize one imported photo in a worker process; returns (processed bytes, extension)
+
+    The photo settings are passed in: workers keep the CONFIG they were started with.
+    """
+    processed = resize_image(photo_data, rotation=rotation, output_format=output_format, progressive=progressive)
+    return processed, photo_extension(filename, photo_data, processed, output_format)
+
+
+# Worker processes resizing imported photos, shared by all imports
+import_pool = None
+import_pool_lock = threading.Lock()
+
+
+def start_import_pool():
+    """Start the photo import workers; the server calls this before it starts any thread
+
+    Workers are forked so they need not re-import this module (and open its database
+    and log), and forking while the process has a single thread means no worker
+    inherits a lock some other thread was holding.
+    """
+    global import_pool
+    with import_pool_lock:
+        if import_pool is None:
+            context = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else None
+            import_pool = ProcessPoolExecutor(max_workers=CONFIG['import_workers'] or os.cpu_count() or 1,
+                                              mp_context=context, initializer=init_import_worker)
+            # A fork pool starts all its workers for the first task
+            import_pool.submit(int).result()
+        return import_pool
+
+
+def replace_import_pool(broken):
+    """Start new import workers after one of them died
+
+    Only here is a worker forked from the running server; the workers only resize
+    images, and logging re-creates its locks in a forked child.
+    """
+    global import_pool
+    with import_pool_lock:
+        if import_pool is broken:
+            import_pool = None
+    broken.shutdown(wait=False)
+    logger.warning("Photo import workers died; starting new ones")
+    return start_import_pool()
+
+
+def detach_upload(upload):
+    """Return (filename, stream) for an uploaded file that stays open after the request
+
+    Flask closes uploaded files when the view returns, before a streamed response
+    is read, so the upload's temporary file is reopened through a duplicate
+    descriptor (small uploads held in memory are copied).
+    """
+    try:
+        stream = os.fdopen(os.dup(upload.stream.fileno()), 'rb')
+    except (AttributeError, io.UnsupportedOperation):
+        stream = io.BytesIO(upload.stream.getvalue())
+    stream.seek(0)
+    return upload.filename, stream
+
+
+def iter_import_photos(uploads):
+    """Yield (name, photo bytes, error) for uploaded photos and the photos inside uploaded zip archives
+
+    `uploads` are (filename, stream) pairs; each stream is closed once read.
+    """
+    try:
+        for filename, stream in uploads:
+            with stream:
+                if filename.lower().endswith('.zip'):
+                    try:
+                        archive = zipfile.ZipFile(stream)
+                    except zipfile.BadZipFile:
+                        yield filename, None, 'Not a valid zip archive'
+                        continue
+                    with archive:
+                        for info in sorted(archive.infolist(), key=lambda info: info.filename):
+                            name = os.path.basename(info.filename)
+                            if info.is_dir() or not name or name.startswith('.') or info.filename.startswith('__MACOSX/'):
+                                continue
+                            if not allowed_file(name):
+                                yield info.filename, None, 'Invalid file type'
+                            elif info.file_size > CONFIG['max_file_size']:
+                                yield info.filename, None, 'File too large'
+                            else:
+                                yield info.filename, archive.read(info), None
+                elif not allowed_file(filename):
+                    yield filename, None, 'Invalid file type'
+                else:
+                    data = stream.read(CONFIG['max_file_size'] + 1)
+                    if not data:
+                        yield filename, None, 'File is empty'
+                    elif len(data) > CONFIG['max_file_size']:
+                        yield filename, None, 'File too large'
+                    else:
+                        yield filename, data, None
+    finally:
+        for _, stream in uploads:
+            stream.close()
+
+
+def import_memories(database, photos, user_name, memory_text=None, rotation=None):
+    """Add one memory per photo, resizing them in the import pool; yields a progress record per photo
+
+    At most two photos per worker are read ahead, so an album is never held in memory
+    at once. Processed photos go into the photo store as they finish, kept pending so
+    nothing deletes them before all memory rows are inserted in one transaction at the
+    end; if the import fails or is abandoned, the photos it added are removed again.
+    The last record summarizes the import. Without memory_text each memory is
+    captioned with its photo's file name.
+    """
+    start_time = time.time()
+    pool = start_import_pool()
+    workers = CONFIG['import_workers'] or os.cpu_count() or 1
+    photo_settings = (CONFIG['photo_format'], CONFIG['photo_progressive'])
+    photos = enumerate(photos)
+    pending = {}
+    stored = {}
+    failed = 0
+    committed = False
+    try:
+        while True:
+            # Refill the pool, reporting photos rejected before processing
+            while len(pending) < workers * 2:
+                index, (name, photo_data, error) = next(photos, (None, (None, None, None)))
+                if index is None:
+                    break
+                if error:
+                    failed += 1
+                    yield {'index': index, 'name': name, 'status': 'error', 'error': error}
+                    continue
+                try:
+                    future = pool.submit(process_import_photo, photo_data, name, rotation, *photo_settings)
+                except BrokenProcessPool:
+                    pool = replace_import_pool(pool)
+                    future = pool.submit(process_import_photo, photo_data, name, rotation, *photo_settings)
+                pending[future] = (index, name)
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, name = pending.pop(future)
+                try:
+                    processed, ext = future.result()
+                    photo_filename, created = database.photos.store(processed, ext, pending=True)
+                except Exception as e:
+                    logger.error(f"Error importing photo {name}: {e}")
+                    failed += 1
+                    yield {'index': index, 'name': name, 'status': 'error', 'error': 'Failed to process photo'}
+                    continue
+                stored[index] = (name, photo_filename, created)
+                yield {'index': index, 'name': name, 'status': 'processed', 'photo_filename': photo_filename}
+
+        memories = []
+        for index in sorted(stored):
+            name, photo_filename, created = stored[index]
+            caption = memory_text or os.path.splitext(os.path.basename(name))[0]
+            memories.append((user_name, caption[:1000], photo_filename))
+        try:
+            memory_ids = database.add_memories(memories)
+            committed = True
+        except Exception as e:
+            logger.error(f"Error inserting imported memories: {e}")
+            yield {'status': 'error', 'error': 'Internal server error', 'imported': 0, 'failed': failed + len(memories)}
+            return
+    finally:
+        for future in pending:
+            future.cancel()
+        for name, photo_filename, created in stored.values():
+            database.photos.settle(photo_filename)
+            if created and not committed:
+                database.release_photo(photo_filename)
+
+    elapsed = time.time() - start_time
+    logger.info(f"Imported {len(memory_ids)} memories for {user_name} ({failed} failed) "
+                f"with {workers} workers in {elapsed:.1f}s")
+    yield {'status': 'success', 'imported': len(memory_ids), 'failed': failed,
+           'memory_ids': memory_ids, 'seconds': round(elapsed, 3)}
+
+
+# Timezone configuration. Everything is stored on the UTC epoch-ms clock; local time only
+# appears at the API edge and in local-day bucketing
+ISRAEL_TZ = ZoneInfo(CONFIG['timezone'])
+EPOCH = datetime(1970, 1, 1)
+# UTC offsets change at most every quarter hour (DST switches happen at local 02:00 and
+# offsets are multiples of 15 minutes), so they are cached per quarter hour
+OFFSET_CACHE_STEP_MS = 15 * 60 * 1000
 
 
 def get_israel_time():
@@ -198,9 +737,78 @@ def get_israel_timestamp():
     return get_israel_time().isoformat()
 
 
+def get_epoch_ms():
+    """Get current UTC time as integer epoch milliseconds (the storage clock)"""
+    return int(time.time() * 1000)
+
+
+@functools.lru_cache(maxsize=65536)
+def _quarter_utc_offset_ms(quarter):
+    moment = datetime.fromtimestamp(quarter * OFFSET_CACHE_STEP_MS / 1000, ISRAEL_TZ)
+    return int(moment.utcoffset().total_seconds() * 1000)
+
+
+def utc_offset_ms(ts_ms):
+    """UTC offset of Israel time at an epoch-ms instant, in ms"""
+    return _quarter_utc_offset_ms(int(ts_ms) // OFFSET_CACHE_STEP_MS)
+
+
+@functools.lru_cache(maxsize=64)
+def _offset_suffix(offset_ms):
+    sign = '-' if offset_ms < 0 else '+'
+    minutes = abs(offset_ms) // 60000
+    return f"{sign}{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def format_epoch_ms(ts_ms):
+    """Format an epoch-ms timestamp as an ISO string in Israel timezone"""
+    # Same output as datetime.fromtimestamp(ts_ms / 1000, ISRAEL_TZ).isoformat(), without a
+    # timezone lookup per call
+    offset = utc_offset_ms(ts_ms)
+    return (EPOCH + timedelta(milliseconds=ts_ms + offset)).isoformat() + _offset_suffix(offset)
+
+
+def local_day_starts(first_day, days):
+    """Epoch-ms starts of `days` consecutive Israel-time days from `first_day` (a date), plus the end
+
+    Days around DST switches are 23 or 25 hours long.
+    """
+    return [int(datetime.combine(first_day + timedelta(days=offset), datetime.min.time(), ISRAEL_TZ)
+                .timestamp() * 1000)
+            for offset in range(days + 1)]
+
+
+def local_hour_of_day(ts_ms):
+    """Israel-time hour of day (0-23) of an array of epoch-ms timestamps"""
+    ts_ms = np.asarray(ts_ms, dtype=np.int64)
+    quarters, inverse = np.unique(ts_ms // OFFSET_CACHE_STEP_MS, return_inverse=True)
+    offsets = np.array([_quarter_utc_offset_ms(int(quarter)) for quarter in quarters], dtype=np.int64)
+    return (ts_ms + offsets[inverse]) // HOUR_MS % 24
+
+
+# Readings are stored in one table per UTC month, e.g. readings_202610
+READINGS_COLUMNS = 'sensor_key, ts, raw_value, humidity_percent, esp32_timestamp'
+EMPTY_READINGS_SELECT = ('SELECT NULL AS sensor_key, NULL AS ts, NULL AS raw_value, '
+                         'NULL AS humidity_percent, NULL AS esp32_timestamp WHERE 0')
+HOUR_MS = 3600 * 1000
+
+
+def partition_for_ts(ts_ms):
+    """Get the name of the monthly readings partition holding an epoch-ms timestamp"""
+    return datetime.fromtimestamp(ts_ms / 1000, timezone.utc).strftime('readings_%Y%m')
+
+
+def partition_bounds(partition):
+    """Get the [start, end) epoch-ms range covered by a monthly readings partition"""
+    year, month = int(partition[-6:-2]), int(partition[-2:])
+    start = datetime(year, month, 1, tzinfo=timezone.utc)
+    end = datetime(year + month // 12, month % 12 + 1, 1, tzinfo=timezone.utc)
+    return int(start.timestamp() * 1000), int(end.timestamp() * 1000)
+
+
 def send_message_to_bot(chat_id, sender, message):
     """Send message to Telegram bot"""
-    url = "http://127.0.0.1:5000/webhook"  # The webhook URL
+    url = CONFIG['webhook_url']
     message_data = {
         "message": {
             "chat": {"id": chat_id},
@@ -222,436 +830,2403 @@ def send_message_to_bot(chat_id, sender, message):
         return False
 
 
-class HumidityDatabase:
-    def __init__(self, db_path):
-        self.db_path = db_path
-        self.init_database()
+class AlertDispatcher:
+    """Background thread that delivers alert messages so ingest never waits on the network"""
 
-    def init_database(self):
-        """Initialize the database with required tables"""
-        # Only create directories if the path has a directory component
-        if os.path.dirname(self.db_path):
-            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+    def __init__(self, chat_id, sender, max_pending=1000):
+        self.chat_id = chat_id
+        self.sender = sender
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        self._lock = threading.Lock()
 
-        with self.get_connection() as conn:
-            # Check if we need to migrate existing table
-            cursor = conn.execute("PRAGMA table_info(humidity_readings)")
-            columns = [row[1] for row in cursor.fetchall()]
-            
-            # Create the updated table with sensor information
-            if 'sensor_id' not in columns:
-                # Create new table with sensor support
-                conn.execute('''
-                             CREATE TABLE IF NOT EXISTS humidity_readings_new
-                             (
-                                 id
-                                 INTEGER
-                                 PRIMARY
-                                 KEY
-                                 AUTOINCREMENT,
-                                 device_id
-                                 TEXT
-                                 NOT
-                                 NULL,
-                                 sensor_id
-                                 TEXT,
-                                 sensor_pin
-                                 INTEGER,
-                                 raw_value
-                                 INTEGER
-                                 NOT
-                                 NULL,
-                                 humidity_percent
-                                 REAL
-                                 NOT
-                                 NULL,
-                                 esp32_timestamp
-                                 INTEGER,
-                                 server_timestamp
-                                 TEXT
-                                 NOT
-                                 NULL,
-                                 created_at
-                                 TIMESTAMP
-                                 DEFAULT
-                                 CURRENT_TIMESTAMP
-                             )
-                             ''')
-                
-                # Migrate existing data if old table exists
-                cursor = conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='humidity_readings'")
-                if cursor.fetchone():
-                    conn.execute('''
-                        INSERT INTO humidity_readings_new 
-                        (device_id, raw_value, humidity_percent, esp32_timestamp, server_timestamp, created_at)
-                        SELECT device_id, raw_value, humidity_percent, esp32_timestamp, server_timestamp, created_at
-                        FROM humidity_readings
-                    ''')
-                    conn.execute('DROP TABLE humidity_readings')
-                
-                conn.execute('ALTER TABLE humidity_readings_new RENAME TO humidity_readings')
+    def dispatch(self, message):
+        """Queue a message for delivery, starting the worker thread on first use"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='alert-dispatcher', daemon=True)
+                self._thread.start()
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            logger.warning(f"Alert queue full, dropping alert: {message}")
+
+    def _run(self):
+        while True:
+            message = self._queue.get()
+            send_message_to_bot(self.chat_id, self.sender, message)
+
+
+class SiteAlertDispatcher:
+    """Prefixes a site's alerts with the site name before queueing them on the shared dispatcher"""
+
+    def __init__(self, dispatcher, site):
+        self.dispatcher = dispatcher
+        self.site = site
+
+    def dispatch(self, message):
+        self.dispatcher.dispatch(f"[{self.site}] {message}")
+
+
+class SensorAlertState:
+    """Constant-size streaming state of one sensor: smoothed humidity, trend and alert arming"""
+
+    def __init__(self, ts, humidity):
+        self.first_ts = ts
+        self.ts = ts
+        self.ewma = humidity
+        self.slope = 0.0  # percentage points per hour
+        self.armed = True
+        # Smoothed humidity when the last forecast warning was sent (None: no warning pending)
+        self.warned_level = None
+
+    def update(self, ts, humidity):
+        """Fold in a reading; returns False for readings not newer than the last one"""
+        if ts <= self.ts:
+            return False
+        dt_hours = (ts - self.ts) / HOUR_MS
+        previous = self.ewma
+        # Time-based smoothing factors keep irregular reading intervals consistent
+        alpha = 1 - math.exp(-dt_hours * 60 / CONFIG['alert_ewma_minutes'])
+        self.ewma += alpha * (humidity - self.ewma)
+        beta = 1 - math.exp(-dt_hours / CONFIG['alert_slope_hours'])
+        self.slope += beta * ((self.ewma - previous) / dt_hours - self.slope)
+        self.ts = ts
+        return True
+
+    def hours_until(self, threshold):
+        """Forecast hours until the smoothed humidity reaches threshold (None if not drying)"""
+        if self.ewma <= threshold:
+            return 0.0
+        if self.slope >= 0 or self.ts - self.first_ts < CONFIG['alert_slope_hours'] * HOUR_MS:
+            return None
+        return (self.ewma - threshold) / -self.slope
+
+
+class AlertEngine:
+    """Streaming threshold alerts with smoothing, drying forecasts and hysteresis
+
+    Observing a reading only touches in-memory state and a cached copy of the sensor
+    configuration, never the database. A sensor alerts once when its smoothed humidity
+    falls below the threshold and re-arms by itself after recovering above
+    threshold + CONFIG['alert_rearm_margin'].
+    """
+
+    def __init__(self, dispatcher):
+        self.dispatcher = dispatcher
+        self._states = {}
+        self._configs = {}
+        self._global_threshold = None
+        self._lock = threading.Lock()
+
+    def load_config(self, sensor_configs, global_threshold):
+        """Replace the cached thresholds, names and alert toggles"""
+        with self._lock:
+            self._configs = {(config['device_id'], config['sensor_id']): config for config in sensor_configs}
+            self._global_threshold = global_threshold
+
+    def _settings(self, key):
+        """(threshold, alerts_enabled, display_name) for a sensor from the cached config"""
+        config = self._configs.get(key, {})
+        threshold = config.get('humidity_threshold')
+        if threshold is None:
+            threshold = self._global_threshold
+        enabled = config.get('alerts_enabled')
+        return threshold, enabled is None or bool(enabled), config.get('display_name') or key[1]
+
+    def observe(self, reading, notify=True):
+        """Update a sensor's state with a stored reading and queue any resulting alerts"""
+        if not reading.get('sensor_id'):
+            return
+        key = (reading['device_id'], reading['sensor_id'])
+        humidity = reading['humidity_percent']
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                state = self._states[key] = SensorAlertState(reading['ts'], humidity)
+            elif not state.update(reading['ts'], humidity):
+                return
+            if not notify or reading['ts'] < get_epoch_ms() - CONFIG['alert_max_age_minutes'] * 60 * 1000:
+                return
+            message = self._evaluate(key, state, humidity)
+        if message:
+            self.dispatcher.dispatch(message)
+
+    def _evaluate(self, key, state, humidity):
+        """Advance a sensor's arming state; returns an alert message or None"""
+        threshold, enabled, display_name = self._settings(key)
+        if not threshold:
+            return None
+        margin = CONFIG['alert_rearm_margin']
+
+        if not state.armed:
+            if state.ewma >= threshold + margin:
+                state.armed = True
+                state.warned_level = None
+                logger.info(f"Alerts re-armed for {key[0]}:{key[1]} at {state.ewma:.1f}%")
+            return None
+
+        if state.ewma < threshold:
+            state.armed = False
+            logger.info(f"{key[0]}:{key[1]} dropped below {threshold}%" + ('' if enabled else ' (alerts muted)'))
+            if enabled:
+                return f"The {display_name} humidity is below {threshold}% (current: {humidity:.1f}%)"
+            return None
+
+        # A watering since the last warning allows the next forecast warning
+        if state.warned_level is not None and state.ewma >= state.warned_level + margin:
+            state.warned_level = None
+        hours = state.hours_until(threshold)
+        if state.warned_level is None and hours is not None and hours <= CONFIG['alert_warning_hours']:
+            state.warned_level = state.ewma
+            if enabled:
+                return (f"The {display_name} humidity will drop below {threshold}% in about {hours:.0f} hours "
+                        f"(current: {humidity:.1f}%, drying {-state.slope:.1f}% per hour)")
+        return None
+
+    def snapshot(self):
+        """Current per-sensor alert state for the API"""
+        with self._lock:
+            sensors = []
+            for key, state in sorted(self._states.items(), key=lambda item: (item[0][0], item[0][1] or '')):
+                threshold, enabled, display_name = self._settings(key)
+                hours = state.hours_until(threshold) if threshold else None
+                sensors.append({
+                    'device_id': key[0],
+                    'sensor_id': key[1],
+                    'display_name': display_name,
+                    'threshold': threshold,
+                    'alerts_enabled': enabled,
+                    'smoothed_humidity': round(state.ewma, 2),
+                    'slope_per_hour': round(state.slope, 3),
+                    'hours_until_threshold': None if hours is None else round(hours, 1),
+                    'armed': state.armed,
+                    'warning_sent': state.warned_level is not None,
+                    'updated': format_epoch_ms(state.ts),
+                })
+            return sensors
+
+
+class SensorHealthState:
+    """Incremental raw-value statistics and data gaps of one sensor"""
+
+    def __init__(self, ts, raw_value):
+        self.first_ts = ts
+        self.last_ts = ts
+        self.count = 1
+        self.raw_mean = float(raw_value)
+        self.raw_var = 0.0
+        self.pinned_fraction = float(self._pinned(raw_value))
+        # Start of the current run of identical raw values
+        self.run_value = raw_value
+        self.run_start_ts = ts
+        self.gap_count = 0
+        self.last_gap = None  # (start ts, end ts) of the most recent gap
+        self.status = 'ok'
+
+    @staticmethod
+    def _pinned(raw_value):
+        low, high = CONFIG['health_raw_range']
+        return raw_value <= low or raw_value >= high
+
+    def update(self, ts, raw_value):
+        """Fold in a reading; returns False for readings not newer than the last one"""
+        if ts <= self.last_ts:
+            return False
+        dt = ts - self.last_ts
+        if dt > CONFIG['health_gap_factor'] * CONFIG['expected_interval_seconds'] * 1000:
+            self.gap_count += 1
+            self.last_gap = (self.last_ts, ts)
+
+        # Exponentially weighted mean/variance with a time-based weight over the health window
+        alpha = 1 - math.exp(-dt / (CONFIG['health_window_minutes'] * 60 * 1000))
+        diff = raw_value - self.raw_mean
+        self.raw_mean += alpha * diff
+        self.raw_var = (1 - alpha) * (self.raw_var + alpha * diff * diff)
+        self.pinned_fraction += alpha * (self._pinned(raw_value) - self.pinned_fraction)
+
+        if raw_value != self.run_value:
+            self.run_value = raw_value
+            self.run_start_ts = ts
+        self.last_ts = ts
+        self.count += 1
+        return True
+
+    def issues(self, now_ts):
+        """List of (status, description) problems, most severe first"""
+        window_ms = CONFIG['health_window_minutes'] * 60 * 1000
+        found = []
+        silent_ms = now_ts - self.last_ts
+        if silent_ms > CONFIG['health_offline_minutes'] * 60 * 1000:
+            found.append(('offline', f"no readings for {silent_ms // 60000} minutes"))
+        if self.pinned_fraction > 0.5:
+            found.append(('faulty', f"raw value pinned at the ADC limit ({self.run_value})"))
+        elif self.last_ts - self.run_start_ts >= window_ms:
+            hours = (self.last_ts - self.run_start_ts) / HOUR_MS
+            found.append(('faulty', f"raw value stuck at {self.run_value} for {hours:.1f} hours"))
+        elif self.last_ts - self.first_ts >= window_ms and self.raw_var < 0.25:
+            found.append(('faulty', f"raw value nearly constant (std {math.sqrt(self.raw_var):.2f})"))
+        if self.last_gap is not None and now_ts - self.last_gap[1] < window_ms:
+            minutes = (self.last_gap[1] - self.last_gap[0]) / 60000
+            found.append(('degraded', f"{minutes:.0f} minute gap in readings"))
+        return found
+
+
+class SensorHealthMonitor:
+    """Per-sensor health from incremental statistics, without scanning the readings tables
+
+    Readings are folded in on ingest in O(1). check() runs periodically from a
+    background thread, detects silent sensors and reports status transitions
+    through the alert dispatcher.
+    """
+
+    SEVERITY = {'ok': 0, 'degraded': 1, 'faulty': 2, 'offline': 3}
+
+    def __init__(self, dispatcher):
+        self.dispatcher = dispatcher
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def observe(self, reading):
+        """Update a sensor's statistics with a stored reading"""
+        key = (reading['device_id'], reading.get('sensor_id'))
+        raw_value = int(reading['raw_value'])
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                self._states[key] = SensorHealthState(reading['ts'], raw_value)
             else:
-                # Table already has sensor columns, just ensure it exists
-                conn.execute('''
-                             CREATE TABLE IF NOT EXISTS humidity_readings
-                             (
-                                 id
-                                 INTEGER
-                                 PRIMARY
-                                 KEY
-                                 AUTOINCREMENT,
-                                 device_id
-                                 TEXT
-                                 NOT
-                                 NULL,
-                                 sensor_id
-                                 TEXT,
-                                 sensor_pin
-                                 INTEGER,
-                                 raw_value
-                                 INTEGER
-                                 NOT
-                                 NULL,
-                                 humidity_percent
-                                 REAL
-                                 NOT
-                                 NULL,
-                                 esp32_timestamp
-                                 INTEGER,
-                                 server_timestamp
-                                 TEXT
-                                 NOT
-                                 NULL,
-                                 created_at
-                                 TIMESTAMP
-                                 DEFAULT
-                                 CURRENT_TIMESTAMP
-                             )
-                             ''')
-            
-            # Create sensor configuration table for thresholds and alert states
-            conn.execute('''
-                         CREATE TABLE IF NOT EXISTS sensor_config
-                         (
-                             device_id TEXT NOT NULL,
-                             sensor_id TEXT NOT NULL,
-                             display_name TEXT,
-                             humidity_threshold REAL,
-                             alerts_enabled INTEGER DEFAULT 1,
-                             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                             updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                             PRIMARY KEY (device_id, sensor_id)
-                         )
-                         ''')
-            
-            # Create global settings table
-            conn.execute('''
-                         CREATE TABLE IF NOT EXISTS global_settings
-                         (
-                             key TEXT PRIMARY KEY,
-                             value TEXT,
-                             updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                         )
-                         ''')
-            
-            # Insert default global threshold if not exists
-            conn.execute('''
-                         INSERT OR IGNORE INTO global_settings (key, value)
-                         VALUES ('global_humidity_threshold', '30.0')
-                         ''')
-            
-            # Create memories table with photo support
-            conn.execute('''
-                         CREATE TABLE IF NOT EXISTS memories
-                         (
-                             id INTEGER PRIMARY KEY AUTOINCREMENT,
-                             user_name TEXT NOT NULL,
-                             memory_text TEXT NOT NULL,
-                             photo_filename TEXT,
-                             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                         )
-                         ''')
-            
-            # Check if we need to add photo_filename column to existing table
-            cursor = conn.execute("PRAGMA table_info(memories)")
-            columns = [row[1] for row in cursor.fetchall()]
-            if 'photo_filename' not in columns:
-                conn.execute('ALTER TABLE memories ADD COLUMN photo_filename TEXT')
-                logger.info("Added photo_filename column to memories table")
-            
-            # Create indexes
-            conn.execute('''
-                         CREATE INDEX IF NOT EXISTS idx_device_timestamp
-                             ON humidity_readings(device_id, created_at)
-                         ''')
-            conn.execute('''
-                         CREATE INDEX IF NOT EXISTS idx_sensor_timestamp
-                             ON humidity_readings(sensor_id, created_at)
-                         ''')
-            conn.execute('''
-                         CREATE INDEX IF NOT EXISTS idx_device_sensor_timestamp
-                             ON humidity_readings(device_id, sensor_id, created_at)
-                         ''')
-            conn.commit()
+                state.update(reading['ts'], raw_value)
 
-    @contextmanager
-    def get_connection(self):
-        """Context manager for database connections"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        try:
-            yield conn
-        finally:
-            conn.close()
+    def seed_last_seen(self, last_seen):
+        """Register sensors with no buffered readings from (device_id, sensor_id, last_ts, last_raw) rows"""
+        with self._lock:
+            for device_id, sensor_id, last_ts, last_raw in last_seen:
+                if (device_id, sensor_id) not in self._states:
+                    self._states[(device_id, sensor_id)] = SensorHealthState(last_ts, last_raw)
 
-    def insert_reading(self, device_id, raw_value, humidity_percent, esp32_timestamp, sensor_id=None, sensor_pin=None):
-        """Insert a new humidity reading with optional sensor information"""
-        server_timestamp = get_israel_timestamp()
+    def check(self, notify=True):
+        """Re-evaluate every sensor and dispatch a message for each status change"""
+        now_ts = get_epoch_ms()
+        messages = []
+        with self._lock:
+            for (device_id, sensor_id), state in self._states.items():
+                issues = state.issues(now_ts)
+                status = max((issue[0] for issue in issues), key=self.SEVERITY.get, default='ok')
+                if status == state.status:
+                    continue
+                name = f"{device_id}:{sensor_id}" if sensor_id else device_id
+                if status == 'ok':
+                    messages.append(f"Sensor {name} is healthy again")
+                else:
+                    messages.append(f"Sensor {name} is {status}: {'; '.join(issue[1] for issue in issues)}")
+                logger.info(f"Sensor health {name}: {state.status} -> {status}")
+                state.status = status
+        if notify:
+            for message in messages:
+                self.dispatcher.dispatch(message)
+        return messages
 
-        with self.get_connection() as conn:
-            conn.execute('''
-                         INSERT INTO humidity_readings
-                         (device_id, sensor_id, sensor_pin, raw_value, humidity_percent, esp32_timestamp, server_timestamp)
-                         VALUES (?, ?, ?, ?, ?, ?, ?)
-                         ''', (device_id, sensor_id, sensor_pin, raw_value, humidity_percent, esp32_timestamp, server_timestamp))
-            conn.commit()
-            
-        # Check for threshold alerts after inserting the reading
-        if sensor_id:
-            self.check_humidity_threshold(device_id, sensor_id, humidity_percent)
+    def snapshot(self):
+        """Current health of every sensor for the API"""
+        now_ts = get_epoch_ms()
+        with self._lock:
+            sensors = []
+            for (device_id, sensor_id), state in sorted(self._states.items(),
+                                                        key=lambda item: (item[0][0], item[0][1] or '')):
+                issues = state.issues(now_ts)
+                sensors.append({
+                    'device_id': device_id,
+                    'sensor_id': sensor_id,
+                    'status': max((issue[0] for issue in issues), key=self.SEVERITY.get, default='ok'),
+                    'issues': [issue[1] for issue in issues],
+                    'last_seen': format_epoch_ms(state.last_ts),
+                    'raw_mean': round(state.raw_mean, 1),
+                    'raw_std': round(math.sqrt(state.raw_var), 2),
+                    'pinned_fraction': round(state.pinned_fraction, 3),
+                    'gap_count': state.gap_count,
+                    'last_gap': None if state.last_gap is None else {
+                        'start': format_epoch_ms(state.last_gap[0]),
+                        'end': format_epoch_ms(state.last_gap[1]),
+                    },
+                })
+            return sensors
 
-    def check_humidity_threshold(self, device_id, sensor_id, humidity_percent):
-        """Check if humidity is below threshold and send alert if needed"""
+
+class SensorRingBuffer:
+    """Fixed-capacity, array-backed ring of one sensor's newest readings in time order"""
+
+    def __init__(self, capacity, device_id, sensor_id, sensor_pin=None):
+        self.capacity = capacity
+        self.device_id = device_id
+        self.sensor_id = sensor_id
+        self.sensor_pin = sensor_pin
+        self.ts = array('q', bytes(8 * capacity))
+        self.raw = array('q', bytes(8 * capacity))
+        self.humidity = array('d', bytes(8 * capacity))
+        self.esp32 = array('q', bytes(8 * capacity))  # -1 when the device sent no timestamp
+        self.start = 0
+        self.count = 0
+        # True while the ring holds every stored reading of the sensor (nothing evicted yet)
+        self.complete = True
+
+    def append(self, ts, raw_value, humidity_percent, esp32_timestamp):
+        """Append a reading; returns False (and stores nothing) if it is older than the newest one"""
+        # Converted before any slot is touched, so a bad value cannot leave a half-written slot
+        ts, raw_value, humidity_percent = int(ts), int(raw_value), float(humidity_percent)
+        esp32_timestamp = -1 if esp32_timestamp is None else int(esp32_timestamp)
+        if self.count and ts < self.newest_ts():
+            return False
+        if self.count == self.capacity:
+            index = self.start
+            self.start = (self.start + 1) % self.capacity
+            self.complete = False
+        else:
+            index = (self.start + self.count) % self.capacity
+            self.count += 1
+        self.ts[index] = ts
+        self.raw[index] = raw_value
+        self.humidity[index] = humidity_percent
+        self.esp32[index] = esp32_timestamp
+        return True
+
+    def oldest_ts(self):
+        return self.ts[self.start] if self.count else None
+
+    def newest_ts(self):
+        return self.ts[(self.start + self.count - 1) % self.capacity] if self.count else None
+
+    def covers(self, since_ts):
+        """Whether every stored reading newer than since_ts is in the ring"""
+        return self.complete or (self.count > 0 and self.ts[self.start] <= since_ts)
+
+    def iter_newest_first(self, since_ts=None):
+        """Yield (ts, index, buffer) from newest to oldest, stopping at since_ts"""
+        for offset in range(self.count - 1, -1, -1):
+            index = (self.start + offset) % self.capacity
+            if since_ts is not None and self.ts[index] <= since_ts:
+                return
+            yield self.ts[index], index, self
+
+    def reading(self, index):
+        """Build an API reading dict for the slot at `index`"""
+        ts = self.ts[index]
+        esp32_timestamp = self.esp32[index]
+        timestamp = format_epoch_ms(ts)
+        return {
+            'device_id': self.device_id,
+            'sensor_id': self.sensor_id,
+            'sensor_pin': self.sensor_pin,
+            'raw_value': self.raw[index],
+            'humidity_percent': self.humidity[index],
+            'esp32_timestamp': None if esp32_timestamp == -1 else esp32_timestamp,
+            'ts': ts,
+            'server_timestamp': timestamp,
+            'created_at': timestamp,
+        }
+
+
+def readings_cursor(readings, since_ts=None):
+    """Cursor for fetching readings newer than these: the newest ts, or since_ts without readings"""
+    return max((reading['ts'] for reading in readings), default=since_ts)
+
+
+class RecentReadingsCache:
+    """In-memory ring buffers of the newest readings per (device, sensor)
+
+    Filled on ingest and warmed from the database at startup. Queries return None
+    when the buffers cannot answer exactly, so callers fall back to SQLite.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._buffers = {}
+        self._lock = threading.Lock()
+        self.ready = False
+
+    def _matching(self, device_id=None, sensor_id=None):
+        return [buffer for (buffer_device, buffer_sensor), buffer in self._buffers.items()
+                if (device_id is None or buffer_device == device_id)
+                and (sensor_id is None or buffer_sensor == sensor_id)]
+
+    def add(self, reading):
+        """Append a freshly stored reading; returns False if it arrived out of order"""
+        key = (reading['device_id'], reading.get('sensor_id'))
+        with self._lock:
+            buffer = self._buffers.get(key)
+            if buffer is None:
+                buffer = self._buffers[key] = SensorRingBuffer(self.capacity, *key)
+            if reading.get('sensor_pin') is not None:
+                buffer.sensor_pin = reading['sensor_pin']
+            return buffer.append(reading['ts'], reading['raw_value'], reading['humidity_percent'],
+                                 reading.get('esp32_timestamp'))
+
+    def load(self, device_id, sensor_id, sensor_pin, rows, complete):
+        """Replace a sensor's ring with `rows` (oldest first), keeping any newer live readings"""
+        buffer = SensorRingBuffer(self.capacity, device_id, sensor_id, sensor_pin)
+        for ts, raw_value, humidity_percent, esp32_timestamp in rows:
+            buffer.append(ts, raw_value, humidity_percent, esp32_timestamp)
+        buffer.complete = complete and buffer.complete
+        with self._lock:
+            previous = self._buffers.get((device_id, sensor_id))
+            if previous is not None:
+                # Carry over readings ingested while the rows were being queried
+                newer = list(previous.iter_newest_first(buffer.newest_ts()))
+                for ts, index, _ in reversed(newer):
+                    esp32_timestamp = previous.esp32[index]
+                    buffer.append(ts, previous.raw[index], previous.humidity[index],
+                                  None if esp32_timestamp == -1 else esp32_timestamp)
+            self._buffers[(device_id, sensor_id)] = buffer
+
+    def resize(self, capacity):
+        """Change the per-sensor capacity, keeping each sensor's newest readings that still fit"""
+        with self._lock:
+            for key, previous in self._buffers.items():
+                buffer = SensorRingBuffer(capacity, previous.device_id, previous.sensor_id, previous.sensor_pin)
+                kept = list(islice(previous.iter_newest_first(), capacity))
+                for ts, index, _ in reversed(kept):
+                    esp32_timestamp = previous.esp32[index]
+                    buffer.append(ts, previous.raw[index], previous.humidity[index],
+                                  None if esp32_timestamp == -1 else esp32_timestamp)
+                buffer.complete = previous.complete and previous.count <= capacity
+                self._buffers[key] = buffer
+            self.capacity = capacity
+
+    def all_readings(self):
+        """Every buffered reading, oldest first within each sensor"""
+        with self._lock:
+            return [buffer.reading(index)
+                    for buffer in self._buffers.values()
+                    for ts, index, _ in reversed(list(buffer.iter_newest_first()))]
+
+    def latest(self, device_id=None, sensor_id=None, limit=100):
+        """Newest readings across matching sensors, or None if the buffers cannot answer exactly"""
+        with self._lock:
+            if not self.ready:
+                return None
+            buffers = self._matching(device_id, sensor_id)
+            merged = heapq.merge(*(buffer.iter_newest_first() for buffer in buffers),
+                                 key=lambda item: item[0], reverse=True)
+            rows = list(islice(merged, limit))
+            # Readings evicted from a full ring are older than its oldest slot
+            evicted_before = max((buffer.oldest_ts() for buffer in buffers if not buffer.complete), default=None)
+            if evicted_before is not None and (len(rows) < limit or rows[-1][0] < evicted_before):
+                return None
+            return [buffer.reading(index) for ts, index, buffer in rows]
+
+    def since(self, since_ts, device_id=None, sensor_id=None):
+        """Readings newer than since_ts (newest first), or None if not fully held in memory"""
+        with self._lock:
+            if not self.ready:
+                return None
+            buffers = self._matching(device_id, sensor_id)
+            if not all(buffer.covers(since_ts) for buffer in buffers):
+                return None
+            merged = heapq.merge(*(buffer.iter_newest_first(since_ts) for buffer in buffers),
+                                 key=lambda item: item[0], reverse=True)
+            return [buffer.reading(index) for ts, index, buffer in merged]
+
+
+def row_size(row):
+    """Approximate serialized size of a result row in bytes (8 per number)"""
+    return sum(len(value) if isinstance(value, (str, bytes)) else 8 for value in row if value is not None)
+
+
+class QueryProfiler:
+    """Opt-in per-statement timing of database queries with a slow-query log
+
+    While enabled, get_connection hands out ProfilingConnections whose cursors time
+    each statement across execute and all fetches and count the rows and bytes
+    returned. Statements are aggregated by their whitespace-normalized SQL. While
+    disabled, plain sqlite3 connections are used and nothing is measured.
+    """
+
+    SORT_KEYS = ('total_ms', 'max_ms', 'avg_ms', 'calls', 'rows', 'bytes')
+
+    def __init__(self, enabled=False, threshold_ms=200, max_statements=500):
+        self.enabled = enabled
+        self.threshold_ms = threshold_ms
+        self.max_statements = max_statements
+        self.since = get_epoch_ms()
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, conn, sql, params, elapsed_ms, rows, size):
+        """Add one finished statement; slow ones are logged with EXPLAIN QUERY PLAN (params None skips the plan)"""
+        statement = ' '.join(sql.split())
+        plan = None
+        if elapsed_ms >= self.threshold_ms:
+            plan = self._explain(conn, sql, params) if params is not None else []
+            logger.warning(f"Slow query ({elapsed_ms:.1f} ms, {rows} rows, {size} bytes): {statement[:500]}"
+                           + (f" | plan: {'; '.join(plan)}" if plan else ''))
+
+        with self._lock:
+            stats = self._stats.get(statement)
+            if stats is None:
+                if len(self._stats) >= self.max_statements:
+                    # Forget the statement with the least total time to bound memory
+                    del self._stats[min(self._stats, key=lambda key: self._stats[key]['total_ms'])]
+                stats = self._stats[statement] = {'statement': statement, 'calls': 0, 'slow_calls': 0,
+                                                  'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0, 'bytes': 0,
+                                                  'plan': None}
+            stats['calls'] += 1
+            stats['total_ms'] += elapsed_ms
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+            stats['rows'] += rows
+            stats['bytes'] += size
+            if plan is not None:
+                stats['slow_calls'] += 1
+                stats['plan'] = plan or stats['plan']
+
+    @staticmethod
+    def _explain(conn, sql, params):
         try:
-            with self.get_connection() as conn:
-                # Get sensor config
-                cursor = conn.execute('''
-                    SELECT humidity_threshold, alerts_enabled, display_name
-                    FROM sensor_config 
-                    WHERE device_id = ? AND sensor_id = ?
-                ''', (device_id, sensor_id))
-                
-                sensor_config = cursor.fetchone()
-                
-                # If no sensor-specific threshold, use global threshold
-                threshold = None
-                alerts_enabled = True
-                display_name = sensor_id
-                
-                if sensor_config:
-                    threshold = sensor_config['humidity_threshold']
-                    alerts_enabled = bool(sensor_config['alerts_enabled'])
-                    display_name = sensor_config['display_name'] or sensor_id
-                
-                # Get global threshold if no sensor-specific threshold
-                if threshold is None:
-                    cursor = conn.execute('''
-                        SELECT value FROM global_settings WHERE key = 'global_humidity_threshold'
-                    ''')
-                    global_threshold = cursor.fetchone()
-                    if global_threshold:
-                        threshold = float(global_threshold['value'])
-                
-                # Check if alert should be sent
-                if threshold and alerts_enabled and humidity_percent < threshold:
-                    # Send telegram notification
-                    message = f"The {display_name} humidity is below {threshold}% (current: {humidity_percent:.1f}%)"
-                    success = send_message_to_bot(-1002340388184, "Listener: garden", message)
-                    
-                    if success:
-                        # Disable alerts for this sensor until manually re-enabled
-                        self.set_sensor_alerts_enabled(device_id, sensor_id, False)
-                        logger.info(f"Alert sent for {device_id}:{sensor_id}, alerts disabled")
-                
+            # The base class execute uses a plain cursor, so the plan query itself is not profiled
+            rows = sqlite3.Connection.execute(conn, f'EXPLAIN QUERY PLAN {sql}', params).fetchall()
+            return [row[3] for row in rows]
+        except sqlite3.Error as e:
+            return [f'unavailable: {e}']
+
+    def top(self, limit=20, sort='total_ms'):
+        """The `limit` statements with the highest `sort` value"""
+        with self._lock:
+            queries = [dict(stats, avg_ms=stats['total_ms'] / stats['calls']) for stats in self._stats.values()]
+        queries.sort(key=lambda stats: stats[sort], reverse=True)
+        for stats in queries:
+            for key in ('total_ms', 'max_ms', 'avg_ms'):
+                stats[key] = round(stats[key], 2)
+        return queries[:limit]
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self.since = get_epoch_ms()
+
+
+class ProfilingCursor(sqlite3.Cursor):
+    """Cursor that times its current statement across execute and fetches, reporting it once finished"""
+
+    def __init__(self, connection):
+        super().__init__(connection)
+        self._sql = None
+
+    def _start(self, sql, params):
+        self._finish()
+        self._sql, self._params = sql, params
+        self._elapsed, self._rows, self._bytes = 0.0, 0, 0
+
+    def _finish(self):
+        """Report the current statement (on exhaustion, the next execute, or close)"""
+        if self._sql is not None:
+            sql, self._sql = self._sql, None
+            self.connection.profiler.record(self.connection, sql, self._params, self._elapsed * 1000,
+                                            self._rows, self._bytes)
+
+    def _fetched(self, rows, start, exhausted):
+        if self._sql is None:
+            return
+        self._elapsed += time.perf_counter() - start
+        self._rows += len(rows)
+        self._bytes += sum(map(row_size, rows))
+        if exhausted:
+            self._finish()
+
+    def execute(self, sql, parameters=()):
+        self._start(sql, parameters)
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._elapsed += time.perf_counter() - start
+
+    def executemany(self, sql, seq_of_parameters):
+        self._start(sql, None)
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._elapsed += time.perf_counter() - start
+            self._finish()
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._fetched([] if row is None else [row], start, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        start = time.perf_counter()
+        rows = super().fetchmany(size)
+        self._fetched(rows, start, len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(rows, start, True)
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched([], start, True)
+            raise
+        self._fetched([row], start, False)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+
+class ProfilingConnection(sqlite3.Connection):
+    """Connection whose statements (and commits) are reported to a QueryProfiler"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.profiler = None
+        self._cursors = []
+
+    def cursor(self, factory=ProfilingCursor):
+        cursor = super().cursor(factory)
+        self._cursors.append(cursor)
+        return cursor
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        start = time.perf_counter()
+        super().commit()
+        self.profiler.record(self, 'COMMIT', None, (time.perf_counter() - start) * 1000, 0, 0)
+
+    def close(self):
+        # Statements that were never fully fetched are reported now
+        for cursor in self._cursors:
+            if isinstance(cursor, ProfilingCursor):
+                cursor._finish()
+        self._cursors.clear()
+        super().close()
+
+
+class SnapshotReplica:
+    """Read-only copy of the database, refreshed in the background with the SQLite online backup API
+
+    The copy is only served while it is younger than the staleness bound, so a
+    failed or slow refresh degrades to reading the primary instead of old data.
+    Refreshes happen on demand, when a read finds the copy due.
+    """
+
+    def __init__(self, db_path, snapshot_path, refresh_seconds, max_staleness_seconds):
+        self.db_path = db_path
+        self.snapshot_path = snapshot_path
+        self.refresh_seconds = refresh_seconds
+        self.max_staleness_seconds = max_staleness_seconds
+        self._taken_at = None  # When the backup behind the current copy started
+        self._generation = 0
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def fresh_path(self):
+        """Path of the copy if it is within the staleness bound (else None), starting a refresh when due"""
+        with self._lock:
+            age = None if self._taken_at is None else time.time() - self._taken_at
+            if not self._refreshing and (age is None or age >= self.refresh_seconds):
+                self._refreshing = True
+                threading.Thread(target=self._refresh, name='snapshot-refresh', daemon=True).start()
+            if age is not None and age <= self.max_staleness_seconds:
+                return self.snapshot_path
+        return None
+
+    def invalidate(self):
+        """Stop serving the current copy (after a schema change) until a newer one is taken"""
+        with self._lock:
+            self._taken_at = None
+            self._generation += 1
+
+    def status(self):
+        with self._lock:
+            return {
+                'path': self.snapshot_path,
+                'age_seconds': None if self._taken_at is None else round(time.time() - self._taken_at, 1),
+                'refreshing': self._refreshing
+            }
+
+    def _refresh(self):
+        with self._lock:
+            generation = self._generation
+        temp_path = f'{self.snapshot_path}.tmp'
+        started = time.time()
+        try:
+            # Leftovers of a refresh interrupted by a restart
+            for leftover in (temp_path, f'{temp_path}-journal'):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+            source = sqlite3.connect(self.db_path)
+            target = sqlite3.connect(temp_path)
+            try:
+                # One step: a single consistent read, which does not block writers in WAL mode
+                source.backup(target)
+                # A standalone rollback-journal copy can be opened immutable, without any locking
+                target.execute('PRAGMA journal_mode=DELETE')
+            finally:
+                target.close()
+                source.close()
+            # Readers still holding the previous copy keep it open until they finish
+            os.replace(temp_path, self.snapshot_path)
+            with self._lock:
+                if generation == self._generation:
+                    self._taken_at = started
+            logger.info(f"Refreshed database snapshot in {time.time() - started:.1f}s")
         except Exception as e:
-            logger.error(f"Error checking humidity threshold: {e}")
+            logger.error(f"Error refreshing database snapshot: {e}")
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+
+class CronSchedule:
+    """Five-field cron expression (minute hour day-of-month month day-of-week) in Israel time
+
+    Fields accept *, numbers, ranges (a-b), lists (a,b) and steps (*/n, a-b/n); day
+    of week 0 and 7 are Sunday. As in cron, when both day fields are restricted a
+    day matching either one qualifies.
+    """
+
+    RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: {expression!r}")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            self._parse(field, low, high) for field, (low, high) in zip(fields, self.RANGES))
+        self.weekdays = {day % 7 for day in weekdays}
+        self.any_day = fields[2] == '*'
+        self.any_weekday = fields[4] == '*'
+
+    @staticmethod
+    def _parse(field, low, high):
+        values = set()
+        for part in field.split(','):
+            spec, _, step = part.partition('/')
+            try:
+                if spec == '*':
+                    start, end = low, high
+                elif '-' in spec:
+                    start, end = map(int, spec.split('-'))
+                else:
+                    start = int(spec)
+                    end = high if step else start
+                step = int(step) if step else 1
+            except ValueError:
+                raise ValueError(f"Invalid cron field {field!r}")
+            if not low <= start <= end <= high or step < 1:
+                raise ValueError(f"Invalid cron field {field!r}")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, moment):
+        in_month = moment.day in self.days
+        in_week = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return in_month and in_week
+        return in_month or in_week
+
+    def next_after(self, ts_ms):
+        """Epoch ms of the first matching minute after ts_ms"""
+        moment = datetime.fromtimestamp(ts_ms / 1000, ISRAEL_TZ).replace(tzinfo=None, second=0, microsecond=0)
+        moment += timedelta(minutes=1)
+        # Five years covers schedules that only match on February 29
+        limit = moment + timedelta(days=5 * 366)
+        while moment < limit:
+            if moment.month not in self.months:
+                moment = (moment.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(moment):
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+            elif moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                run_ts = int(moment.replace(tzinfo=ISRAEL_TZ).timestamp() * 1000)
+                # Local times repeated by the DST change back can map to an earlier instant
+                if run_ts > ts_ms:
+                    return run_ts
+                moment += timedelta(minutes=1)
+        raise ValueError(f"Cron expression never matches: {self.expression!r}")
+
+
+class JobScheduler:
+    """In-process scheduler for low-priority maintenance jobs
+
+    A job is a function; if it returns a generator, every `yield` ends a short slice
+    of work and the scheduler pauses between slices so the job takes at most
+    `duty_cycle` of the wall time, letting ingest writes through in between. Start
+    times, outcomes and a run lease are persisted in the scheduled_jobs table, so
+    a restart catches up on missed runs and two processes never run a job at once.
+    """
+
+    def __init__(self, database, duty_cycle=0.25, lease_seconds=3600):
+        self.db = database
+        self.duty_cycle = duty_cycle
+        self.lease_seconds = lease_seconds
+        self.jobs = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def add(self, name, func, cron, jitter_seconds=0):
+        self.jobs[name] = {
+            'func': func,
+            'schedule': CronSchedule(cron),
+            'jitter_ms': int(jitter_seconds * 1000),
+            'next_run': None,
+            'running': False,
+        }
+
+    def reschedule(self, name, schedule, jitter_seconds=0):
+        """Replace a job's CronSchedule and plan its next run from now"""
+        with self._lock:
+            job = self.jobs[name]
+            job['schedule'] = schedule
+            job['jitter_ms'] = int(jitter_seconds * 1000)
+            if job['next_run'] is not None:
+                job['next_run'] = self._plan(job, get_epoch_ms())
+        self._wake.set()
+
+    def _plan(self, job, after_ts):
+        """Next start after `after_ts` (now at the earliest, for missed runs) plus random jitter"""
+        next_run = max(job['schedule'].next_after(after_ts), get_epoch_ms())
+        return next_run + random.randint(0, job['jitter_ms'])
+
+    def start(self):
+        """Plan every job from its last persisted start and start the scheduler thread"""
+        runs = self.db.get_job_runs()
+        now_ts = get_epoch_ms()
+        with self._lock:
+            for name, job in self.jobs.items():
+                job['next_run'] = self._plan(job, runs.get(name, {}).get('last_started_ts') or now_ts)
+        self._thread = threading.Thread(target=self._run, name='job-scheduler', daemon=True)
+        self._thread.start()
+
+    def trigger(self, name):
+        """Run a job as soon as the scheduler is free; False if it is already running"""
+        with self._lock:
+            job = self.jobs[name]
+            if job['running']:
+                return False
+            job['next_run'] = get_epoch_ms()
+        self._wake.set()
+        return True
+
+    def _run(self):
+        while True:
+            with self._lock:
+                name, job = min(self.jobs.items(), key=lambda item: item[1]['next_run'])
+                wait_ms = job['next_run'] - get_epoch_ms()
+            if wait_ms > 0:
+                self._wake.wait(wait_ms / 1000)
+                self._wake.clear()
+                continue
+            self.run_job(name)
+
+    def run_job(self, name):
+        """Run one job now in the calling thread, recording its outcome"""
+        job = self.jobs[name]
+        now_ts = get_epoch_ms()
+        with self._lock:
+            job['next_run'] = self._plan(job, now_ts)
+            if job['running']:
+                return
+            job['running'] = True
+        try:
+            if not self.db.claim_job(name, now_ts, now_ts + self.lease_seconds * 1000):
+                logger.info(f"Skipping job {name}: it is running in another process")
+                return
+            start = time.perf_counter()
+            try:
+                status, result = 'ok', self._execute(job['func'])
+            except Exception as e:
+                status, result = 'error', str(e)
+                logger.error(f"Error in scheduled job {name}: {e}")
+            self.db.finish_job(name, status, result, get_epoch_ms())
+            logger.info(f"Job {name} finished ({status}) in {time.perf_counter() - start:.1f}s: {result}")
+        finally:
+            with self._lock:
+                job['running'] = False
+
+    def _execute(self, func):
+        result = func()
+        if not inspect.isgenerator(result):
+            return result
+        while True:
+            start = time.perf_counter()
+            try:
+                next(result)
+            except StopIteration as stop:
+                return stop.value
+            # Pause in proportion to the slice so the job stays within its duty cycle
+            time.sleep((time.perf_counter() - start) * (1 - self.duty_cycle) / self.duty_cycle)
+
+    def snapshot(self):
+        """Schedule, next run and last outcome of every job"""
+        runs = self.db.get_job_runs()
+        with self._lock:
+            jobs = [(name, job['schedule'].expression, job['next_run'], job['running'])
+                    for name, job in self.jobs.items()]
+        snapshot = []
+        for name, schedule, next_run, running in jobs:
+            run = runs.get(name, {})
+            snapshot.append({
+                'name': name,
+                'schedule': schedule,
+                'running': running,
+                'next_run': format_epoch_ms(next_run) if next_run else None,
+                'last_started': format_epoch_ms(run['last_started_ts']) if run.get('last_started_ts') else None,
+                'last_finished': format_epoch_ms(run['last_finished_ts']) if run.get('last_finished_ts') else None,
+                'last_status': run.get('last_status'),
+                'last_result': run.get('last_result'),
+            })
+        return snapshot
+
+
+class PhotoStore:
+    """Content-addressed photo files, named by the SHA-256 of the processed image
+
+    Files live in subdirectories named after the first two hex digits of the hash,
+    so no single directory grows large. Identical photos are stored once and shared
+    by every memory referring to them. Hold `lock` from storing a file until the
+    memory referencing it is committed, and while deleting unreferenced files; a
+    photo stored with pending=True is never deleted until it is settled, so a
+    caller can store it and commit its memory later without holding the lock.
+    Photos stored before content addressing keep their flat names in the root.
+    """
+
+    NAME_PATTERN = re.compile(r'^[0-9a-f]{64}\.[a-z0-9]+$')
+
+    def __init__(self, root):
+        # Absolute, because send_file resolves relative paths against the app, not the cwd
+        self.root = os.path.abspath(root)
+        self.lock = threading.RLock()
+        # filename -> stores of it whose memories are not committed yet
+        self.pending = Counter()
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, filename):
+        if self.NAME_PATTERN.match(filename):
+            return os.path.join(self.root, filename[:2], filename)
+        return os.path.join(self.root, filename)
+
+    def store(self, data, ext='jpg', pending=False):
+        """Write a photo unless an identical one is already stored; returns (filename, created)
+
+        With pending=True the photo is kept from deletion until settle() is called for it.
+        """
+        filename = f"{hashlib.sha256(data).hexdigest()}.{ext}"
+        path = self.path(filename)
+        with self.lock:
+            if pending:
+                self.pending[filename] += 1
+            if os.path.exists(path):
+                return filename, False
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write under a temporary name so a crash never leaves a truncated photo under its hash
+            temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            try:
+                with open(temp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(temp_path, path)
+            except BaseException:
+                if pending:
+                    self.settle(filename)
+                raise
+            return filename, True
+
+    def settle(self, filename):
+        """End one pending store of a photo, once its memory is committed or abandoned"""
+        with self.lock:
+            self.pending[filename] -= 1
+            if self.pending[filename] <= 0:
+                del self.pending[filename]
+
+    def remove(self, filename):
+        try:
+            os.remove(self.path(filename))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def iter_files(self):
+        """Yield (name, path, mtime) of every file in the store, legacy flat files included"""
+        with os.scandir(self.root) as entries:
+            for entry in entries:
+                if entry.is_dir() and len(entry.name) == 2:
+                    with os.scandir(entry.path) as shard:
+                        for item in shard:
+                            if item.is_file():
+                                yield item.name, item.path, item.stat().st_mtime
+                elif entry.is_file() and not entry.name.startswith('.'):
+                    yield entry.name, entry.path, entry.stat().st_mtime
+
+
+class HumidityDatabase:
+    def __init__(self, db_path, upload_folder=None, site=DEFAULT_SITE):
+        self.db_path = db_path
+        self.site = site
+        # (device_id, sensor_id) -> (sensor_key, sensor_pin) interning cache
+        self._sensor_keys = {}
+        self._sensor_keys_lock = threading.Lock()
+        # Sorted names of the existing monthly readings partitions
+        self._partitions = []
+        self._partitions_lock = threading.Lock()
+        # Held while partition tables are created or dropped, and by a batch insert from
+        # making sure its partitions exist until it commits
+        self._partition_tables_lock = threading.RLock()
+        # device_id -> highest ingest sequence number stored for that device
+        self._high_water = {}
+        # device_id -> lock serializing that device's sequenced inserts
+        self._sequence_locks = {}
+        self._sequence_locks_lock = threading.Lock()
+        self.recent = RecentReadingsCache(CONFIG['recent_buffer_points'])
+        dispatcher = alert_dispatcher if site == DEFAULT_SITE else SiteAlertDispatcher(alert_dispatcher, site)
+        self.alerts = AlertEngine(dispatcher)
+        self.health = SensorHealthMonitor(dispatcher)
+        self.profiler = QueryProfiler(CONFIG['query_profiling'], CONFIG['slow_query_ms'])
+        self._pinned = threading.local()
+        self.photos = PhotoStore(upload_folder or CONFIG['upload_folder'])
+        self.read_replica = CONFIG['read_replica']
+        self.replica = None
+        if self.read_replica == 'snapshot':
+            self.replica = SnapshotReplica(db_path, f'{os.path.splitext(db_path)[0]}_snapshot.db',
+                                           CONFIG['replica_refresh_seconds'],
+                                           CONFIG['replica_max_staleness_seconds'])
+        self.init_database()
+        self.warm_recent_cache()
+        self._reload_alert_config()
+        # Seed alert and health state from memory without re-sending alerts
+        for reading in self.recent.all_readings():
+            self.alerts.observe(reading, notify=False)
+            self.health.observe(reading)
+        self.health.seed_last_seen(self.get_last_seen_from_rollups())
+        self.health.check(notify=False)
+
+    def init_database(self):
+        """Initialize the database with required tables"""
+        # Only create directories if the path has a directory component
+        if os.path.dirname(self.db_path):
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+
+        migrated = False
+        with self.get_connection() as conn:
+            if self.read_replica in ('wal', 'snapshot'):
+                # Readers and the snapshot backup never block ingest writes in WAL mode
+                conn.execute('PRAGMA journal_mode=WAL')
+
+            # Sensor dimension table: device/sensor ID strings are stored once and
+            # readings reference them by integer key
+            conn.execute('''
+                         CREATE TABLE IF NOT EXISTS sensors
+                         (
+                             sensor_key INTEGER PRIMARY KEY,
+                             device_id TEXT NOT NULL,
+                             sensor_id TEXT,
+                             sensor_pin INTEGER
+                         )
+                         ''')
+            conn.execute('''
+                         CREATE UNIQUE INDEX IF NOT EXISTS idx_sensors_device_sensor
+                             ON sensors(device_id, IFNULL(sensor_id, ''))
+                         ''')
+
+            # Readings are partitioned into monthly tables; `readings` is a UNION ALL view over them
+            cursor = conn.execute('''
+                SELECT name FROM sqlite_master
+                WHERE type = 'table' AND name GLOB 'readings_[0-9][0-9][0-9][0-9][0-9][0-9]'
+                ORDER BY name
+            ''')
+            self._partitions = [row['name'] for row in cursor.fetchall()]
+
+            # Split a single unpartitioned readings table into monthly partitions
+            cursor = conn.execute("SELECT type FROM sqlite_master WHERE name = 'readings'")
+            row = cursor.fetchone()
+            if row and row['type'] == 'table':
+                moved = self._distribute_into_partitions(conn, 'readings')
+                conn.execute('DROP TABLE readings')
+                logger.info(f"Moved {moved} readings into monthly partitions")
+                migrated = True
+
+            # Migrate rows from the old TEXT-keyed humidity_readings table if present
+            cursor = conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='humidity_readings'")
+            if cursor.fetchone():
+                self._migrate_legacy_readings(conn)
+                migrated = True
+
+            self._rebuild_readings_view(conn)
+
+            # Hourly per-sensor rollups, maintained on insert and kept longer than raw readings
+            cursor = conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='readings_hourly'")
+            rollups_exist = cursor.fetchone() is not None
+            conn.execute('''
+                         CREATE TABLE IF NOT EXISTS readings_hourly
+                         (
+                             sensor_key INTEGER NOT NULL,
+                             hour_ts INTEGER NOT NULL,
+                             reading_count INTEGER NOT NULL,
+                             humidity_sum REAL NOT NULL,
+                             humidity_min REAL NOT NULL,
+                             humidity_max REAL NOT NULL,
+                             raw_sum INTEGER NOT NULL,
+                             last_ts INTEGER NOT NULL,
+                             last_humidity REAL NOT NULL,
+                             PRIMARY KEY (sensor_key, hour_ts)
+                         ) WITHOUT ROWID
+                         ''')
+            if not rollups_exist:
+                self._backfill_rollups(conn)
+
+            # Create sensor configuration table for thresholds and alert states
+            conn.execute('''
+                         CREATE TABLE IF NOT EXISTS sensor_config
+                         (
+                             device_id TEXT NOT NULL,
+                             sensor_id TEXT NOT NULL,
+                             display_name TEXT,
+                             humidity_threshold REAL,
+                             alerts_enabled INTEGER DEFAULT 1,
+                             updated_ts INTEGER,
+                             PRIMARY KEY (device_id, sensor_id)
+                         )
+                         ''')
+            self._add_epoch_column(conn, 'sensor_config', 'updated_ts', 'updated_at')
+            
+            # Create global settings table
+            conn.execute('''
+                         CREATE TABLE IF NOT EXISTS global_settings
+                         (
+                             key TEXT PRIMARY KEY,
+                             value TEXT,
+                             updated_ts INTEGER
+                         )
+                         ''')
+            self._add_epoch_column(conn, 'global_settings', 'updated_ts', 'updated_at')
+            
+            # Per-device high-water mark of ingest sequence numbers for idempotent replay
+            conn.execute('''
+                         CREATE TABLE IF NOT EXISTS device_sequences
+                         (
+                             device_id TEXT PRIMARY KEY,
+                             high_water INTEGER NOT NULL,
+                             updated_ts INTEGER
+                         )
+                         ''')
+            self._add_epoch_column(conn, 'device_sequences', 'updated_ts', 'updated_at')
+            cursor = conn.execute('SELECT device_id, high_water FROM device_sequences')
+            self._high_water = {row['device_id']: row['high_water'] for row in cursor.fetchall()}
+
+            # Last runs of the maintenance jobs; lease_until_ts is set while a job runs
+            conn.execute('''
+                         CREATE TABLE IF NOT EXISTS scheduled_jobs
+                         (
+                             name TEXT PRIMARY KEY,
+                             last_started_ts INTEGER,
+                             last_finished_ts INTEGER,
+                             last_status TEXT,
+                             last_result TEXT,
+                             lease_until_ts INTEGER
+                         )
+                         ''')
+
+            # Insert default global threshold if not exists
+            conn.execute('''
+                         INSERT OR IGNORE INTO global_settings (key, value, updated_ts)
+                         VALUES ('global_humidity_threshold', '30.0', ?)
+                         ''', (get_epoch_ms(),))
+            
+            # Create memories table with photo support
+            conn.execute('''
+                         CREATE TABLE IF NOT EXISTS memories
+                         (
+                             id INTEGER PRIMARY KEY AUTOINCREMENT,
+                             user_name TEXT NOT NULL,
+                             memory_text TEXT NOT NULL,
+                             photo_filename TEXT,
+                             created_ts INTEGER NOT NULL
+                         )
+                         ''')
+            
+            # Check if we need to add photo_filename column to existing table
+            cursor = conn.execute("PRAGMA table_info(memories)")
+            columns = [row[1] for row in cursor.fetchall()]
+            if 'photo_filename' not in columns:
+                conn.execute('ALTER TABLE memories ADD COLUMN photo_filename TEXT')
+                logger.info("Added photo_filename column to memories table")
+            self._add_epoch_column(conn, 'memories', 'created_ts', 'created_at')
+            # Photos are shared between memories; this index counts their references
+            conn.execute('''
+                         CREATE INDEX IF NOT EXISTS idx_memories_photo
+                             ON memories(photo_filename) WHERE photo_filename IS NOT NULL
+                         ''')
+            
+            conn.commit()
+
+        if migrated:
+            # Reclaim the space freed by dropping the legacy table
+            with self.get_connection() as conn:
+                conn.execute('VACUUM')
+
+    @staticmethod
+    def _add_epoch_column(conn, table, column, legacy_column):
+        """Add an epoch-ms column to a table created before it, filled from its CURRENT_TIMESTAMP text column"""
+        cursor = conn.execute(f"PRAGMA table_info({table})")
+        columns = [row[1] for row in cursor.fetchall()]
+        if column in columns:
+            return
+        conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} INTEGER')
+        if legacy_column in columns:
+            # CURRENT_TIMESTAMP text is UTC
+            conn.execute(f'''
+                UPDATE {table}
+                SET {column} = CAST(ROUND((julianday({legacy_column}) - 2440587.5) * 86400000) AS INTEGER)
+            ''')
+        logger.info(f"Added {column} column to {table} table")
+
+    def _migrate_legacy_readings(self, conn):
+        """Copy rows from the legacy humidity_readings table into sensors/readings and drop it"""
+        cursor = conn.execute("PRAGMA table_info(humidity_readings)")
+        columns = [row[1] for row in cursor.fetchall()]
+        # Very old tables predate multi-sensor support and have no sensor columns
+        sensor_id_expr = 'sensor_id' if 'sensor_id' in columns else 'NULL'
+        sensor_pin_expr = 'sensor_pin' if 'sensor_pin' in columns else 'NULL'
+
+        conn.execute('''
+            INSERT OR IGNORE INTO sensors (device_id, sensor_id, sensor_pin)
+            SELECT device_id, {sensor_id}, MAX({sensor_pin})
+            FROM humidity_readings
+            GROUP BY device_id, {sensor_id}
+        '''.format(sensor_id=sensor_id_expr, sensor_pin=sensor_pin_expr))
+
+        # server_timestamp carries sub-second precision and a UTC offset; created_at is the fallback
+        conn.execute('''
+            CREATE TEMP TABLE legacy_readings_import
+            (sensor_key INTEGER, ts INTEGER, raw_value INTEGER, humidity_percent REAL, esp32_timestamp INTEGER)
+        ''')
+        conn.execute('''
+            INSERT INTO legacy_readings_import (sensor_key, ts, raw_value, humidity_percent, esp32_timestamp)
+            SELECT s.sensor_key,
+                   CAST(ROUND((COALESCE(julianday(h.server_timestamp), julianday(h.created_at)) - 2440587.5)
+                              * 86400000) AS INTEGER),
+                   h.raw_value, h.humidity_percent, h.esp32_timestamp
+            FROM humidity_readings h
+            JOIN sensors s ON s.device_id = h.device_id
+                          AND IFNULL(s.sensor_id, '') = IFNULL({sensor_id}, '')
+        '''.format(sensor_id='h.sensor_id' if 'sensor_id' in columns else 'NULL'))
+        migrated_count = self._distribute_into_partitions(conn, 'legacy_readings_import')
+
+        conn.execute('DROP TABLE legacy_readings_import')
+        conn.execute('DROP TABLE humidity_readings')
+        logger.info(f"Migrated {migrated_count} readings from humidity_readings to compact readings table")
+
+    def _distribute_into_partitions(self, conn, source_table):
+        """Copy readings from `source_table` into their monthly partitions, returning the row count"""
+        cursor = conn.execute(f"SELECT DISTINCT strftime('%Y%m', ts / 1000, 'unixepoch') FROM {source_table}")
+        months = [row[0] for row in cursor.fetchall()]
+        copied = 0
+        for month in months:
+            partition = f'readings_{month}'
+            start_ts, end_ts = partition_bounds(partition)
+            self._create_partition(conn, partition)
+            cursor = conn.execute(f'''
+                INSERT OR IGNORE INTO {partition} ({READINGS_COLUMNS})
+                SELECT {READINGS_COLUMNS} FROM {source_table}
+                WHERE ts >= ? AND ts < ?
+            ''', (start_ts, end_ts))
+            copied += cursor.rowcount
+        return copied
+
+    def _backfill_rollups(self, conn):
+        """Build hourly rollups from every stored partition (run once when the table is created)"""
+        for partition in self._partitions_between():
+            # A bare column next to MAX(ts) takes its value from the row holding that maximum
+            conn.execute(f'''
+                INSERT OR REPLACE INTO readings_hourly
+                (sensor_key, hour_ts, reading_count, humidity_sum, humidity_min, humidity_max,
+                 raw_sum, last_ts, last_humidity)
+                SELECT sensor_key, ts - ts % {HOUR_MS}, COUNT(*), SUM(humidity_percent),
+                       MIN(humidity_percent), MAX(humidity_percent), SUM(raw_value),
+                       MAX(ts), humidity_percent
+                FROM {partition}
+                GROUP BY sensor_key, ts - ts % {HOUR_MS}
+            ''')
+            logger.info(f"Built hourly rollups for {partition}")
+
+    @staticmethod
+    def _update_rollups(conn, rows):
+        """Fold freshly inserted (sensor_key, reading) pairs into their hourly rollups"""
+        hours = {}
+        for sensor_key, reading in rows:
+            ts = reading['ts']
+            humidity = reading['humidity_percent']
+            key = (sensor_key, ts - ts % HOUR_MS)
+            bucket = hours.get(key)
+            if bucket is None:
+                hours[key] = [1, humidity, humidity, humidity, int(reading['raw_value']), ts, humidity]
+                continue
+            bucket[0] += 1
+            bucket[1] += humidity
+            bucket[2] = min(bucket[2], humidity)
+            bucket[3] = max(bucket[3], humidity)
+            bucket[4] += int(reading['raw_value'])
+            if ts >= bucket[5]:
+                bucket[5], bucket[6] = ts, humidity
+
+        conn.executemany('''
+            INSERT INTO readings_hourly
+            (sensor_key, hour_ts, reading_count, humidity_sum, humidity_min, humidity_max,
+             raw_sum, last_ts, last_humidity)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(sensor_key, hour_ts) DO UPDATE SET
+                reading_count = reading_count + excluded.reading_count,
+                humidity_sum = humidity_sum + excluded.humidity_sum,
+                humidity_min = MIN(humidity_min, excluded.humidity_min),
+                humidity_max = MAX(humidity_max, excluded.humidity_max),
+                raw_sum = raw_sum + excluded.raw_sum,
+                last_humidity = CASE WHEN excluded.last_ts >= last_ts
+                                     THEN excluded.last_humidity ELSE last_humidity END,
+                last_ts = MAX(last_ts, excluded.last_ts)
+        ''', [key + tuple(bucket) for key, bucket in hours.items()])
+
+    def _create_partition(self, conn, partition):
+        """Create a monthly readings partition clustered by (sensor_key, ts)"""
+        conn.execute(f'''
+                     CREATE TABLE IF NOT EXISTS {partition}
+                     (
+                         sensor_key INTEGER NOT NULL,
+                         ts INTEGER NOT NULL,
+                         raw_value INTEGER NOT NULL,
+                         humidity_percent REAL NOT NULL,
+                         esp32_timestamp INTEGER,
+                         PRIMARY KEY (sensor_key, ts)
+                     ) WITHOUT ROWID
+                     ''')
+        conn.execute(f'''
+                     CREATE INDEX IF NOT EXISTS idx_{partition}_ts
+                         ON {partition}(ts)
+                     ''')
+        with self._partitions_lock:
+            if partition not in self._partitions:
+                self._partitions = sorted(self._partitions + [partition])
+                if self.replica:
+                    self.replica.invalidate()
+
+    def _rebuild_readings_view(self, conn):
+        """Recreate the `readings` view as a UNION ALL over all partitions"""
+        with self._partitions_lock:
+            partitions = list(self._partitions)
+        if partitions:
+            body = ' UNION ALL '.join(f'SELECT {READINGS_COLUMNS} FROM {partition}' for partition in partitions)
+        else:
+            body = EMPTY_READINGS_SELECT
+        conn.execute('DROP VIEW IF EXISTS readings')
+        conn.execute(f'CREATE VIEW readings AS {body}')
+
+    def _ensure_partitions(self, timestamps):
+        """Create the partitions for epoch-ms timestamps that have none yet
+
+        Runs in a transaction of its own, before a batch's inserts start, so a batch
+        that crosses into a new month is still committed as a whole.
+        """
+        with self._partition_tables_lock:
+            missing = sorted({partition_for_ts(ts) for ts in timestamps} - set(self._partitions))
+            if not missing:
+                return
+            with self.get_connection() as conn:
+                for partition in missing:
+                    self._create_partition(conn, partition)
+                self._rebuild_readings_view(conn)
+                conn.commit()
+        for partition in missing:
+            logger.info(f"Created readings partition {partition}")
+
+    def _partitions_between(self, since_ts=None, until_ts=None):
+        """Get the partitions that may hold readings in the (since_ts, until_ts] window"""
+        with self._partitions_lock:
+            partitions = list(self._partitions)
+        selected = []
+        for partition in partitions:
+            start_ts, end_ts = partition_bounds(partition)
+            if since_ts is not None and end_ts <= since_ts:
+                continue
+            if until_ts is not None and start_ts > until_ts:
+                continue
+            selected.append(partition)
+        return selected
+
+    @staticmethod
+    def _readings_source(partitions, since_ts=None, until_ts=None, sensor_keys=None):
+        """Build a UNION ALL subquery over `partitions` with the filters pushed into each branch
+
+        Returns (sql, params). sensor_keys=None means all sensors.
+        """
+        if not partitions or sensor_keys == []:
+            return EMPTY_READINGS_SELECT, []
+
+        conditions = []
+        branch_params = []
+        if since_ts is not None:
+            conditions.append('ts > ?')
+            branch_params.append(since_ts)
+        if until_ts is not None:
+            conditions.append('ts <= ?')
+            branch_params.append(until_ts)
+        if sensor_keys is not None:
+            conditions.append(f"sensor_key IN ({', '.join('?' * len(sensor_keys))})")
+            branch_params.extend(sensor_keys)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+
+        branches = [f'SELECT {READINGS_COLUMNS} FROM {partition}{where}' for partition in partitions]
+        return ' UNION ALL '.join(branches), branch_params * len(partitions)
+
+    def _matching_sensor_keys(self, conn, device_id=None, sensor_id=None):
+        """Get sensor keys matching optional device/sensor filters (None means no filtering)"""
+        if device_id is None and sensor_id is None:
+            return None
+        cursor = conn.execute('''
+            SELECT sensor_key FROM sensors
+            WHERE (? IS NULL OR device_id = ?)
+            AND (? IS NULL OR sensor_id = ?)
+        ''', (device_id, device_id, sensor_id, sensor_id))
+        return [row['sensor_key'] for row in cursor.fetchall()]
+
+    def _connect(self, database, uri=False):
+        if self.profiler.enabled:
+            conn = sqlite3.connect(database, uri=uri, factory=ProfilingConnection)
+            conn.profiler = self.profiler
+        else:
+            conn = sqlite3.connect(database, uri=uri)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @contextmanager
+    def get_connection(self):
+        """Context manager for database connections"""
+        pinned = getattr(self._pinned, 'conn', None)
+        if pinned is not None:
+            yield pinned
+            return
+        conn = self._connect(self.db_path)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def get_read_connection(self):
+        """Context manager for read-only connections used by heavy dashboard queries
+
+        Depends on CONFIG['read_replica']: 'wal' opens the WAL-mode database read-only,
+        'snapshot' opens the background copy while it is within the staleness bound
+        (the primary otherwise), and None uses get_connection.
+        """
+        pinned = getattr(self._pinned, 'conn', None)
+        if pinned is not None:
+            yield pinned
+            return
+
+        if self.read_replica is None:
+            with self.get_connection() as conn:
+                yield conn
+            return
+
+        snapshot_path = self.replica.fresh_path() if self.replica else None
+        if snapshot_path:
+            conn = self._connect(f"{pathlib.Path(snapshot_path).resolve().as_uri()}?mode=ro&immutable=1", uri=True)
+        else:
+            conn = self._connect(f"{pathlib.Path(self.db_path).resolve().as_uri()}?mode=ro", uri=True)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def pinned_connection(self):
+        """Serve every get_connection / get_read_connection on this thread from one connection
+
+        In WAL modes it is a read-only connection to the live database holding one read
+        transaction, so everything read inside sees the same snapshot. With the rollback
+        journal it stays in autocommit, as a long read transaction would hold off uploads.
+        Only reads belong inside.
+        """
+        if self.read_replica is None:
+            conn = self._connect(self.db_path)
+        else:
+            conn = self._connect(f"{pathlib.Path(self.db_path).resolve().as_uri()}?mode=ro", uri=True)
+            conn.execute('BEGIN')
+        self._pinned.conn = conn
+        try:
+            yield conn
+        finally:
+            self._pinned.conn = None
+            conn.close()
+
+    def get_sensor_key(self, conn, device_id, sensor_id=None, sensor_pin=None):
+        """Return the integer key for a device/sensor pair, creating the sensors row if needed"""
+        cache_key = (device_id, sensor_id)
+        with self._sensor_keys_lock:
+            cached = self._sensor_keys.get(cache_key)
+        if cached is not None and (sensor_pin is None or cached[1] == sensor_pin):
+            return cached[0]
+
+        cursor = conn.execute('''
+            SELECT sensor_key, sensor_pin FROM sensors
+            WHERE device_id = ? AND IFNULL(sensor_id, '') = IFNULL(?, '')
+        ''', (device_id, sensor_id))
+        row = cursor.fetchone()
+        if row is None:
+            cursor = conn.execute('''
+                INSERT INTO sensors (device_id, sensor_id, sensor_pin) VALUES (?, ?, ?)
+            ''', (device_id, sensor_id, sensor_pin))
+            sensor_key = cursor.lastrowid
+        else:
+            sensor_key = row['sensor_key']
+            if sensor_pin is not None and row['sensor_pin'] != sensor_pin:
+                # Sensor was moved to another GPIO pin
+                conn.execute('UPDATE sensors SET sensor_pin = ? WHERE sensor_key = ?', (sensor_pin, sensor_key))
+            elif sensor_pin is None:
+                sensor_pin = row['sensor_pin']
+
+        with self._sensor_keys_lock:
+            self._sensor_keys[cache_key] = (sensor_key, sensor_pin)
+        return sensor_key
+
+    def insert_readings(self, readings, high_water=None):
+        """Insert a batch of readings in a single transaction, skipping duplicates
+
+        Each reading is a dict with device_id, sensor_id, sensor_pin, raw_value,
+        humidity_percent, esp32_timestamp and ts (epoch ms). A reading identical to
+        one already stored for its (device, sensor, ts) is a duplicate and ignored;
+        one that only shares the millisecond with another reading of the sensor,
+        and any reading with a `seq`, is moved to the nearest free millisecond.
+        `high_water` is an optional (device_id, seq) pair recorded in the same
+        transaction. Returns the readings that were actually inserted.
+        """
+        inserted = []
+        rollup_rows = []
+        try:
+            # A partition dropped between the check and the inserts would fail the batch
+            with self._partition_tables_lock, self.get_connection() as conn:
+                self._ensure_partitions(reading['ts'] for reading in readings)
+                for reading in readings:
+                    sensor_key = self.get_sensor_key(conn, reading['device_id'], reading.get('sensor_id'),
+                                                     reading.get('sensor_pin'))
+                    partition = partition_for_ts(reading['ts'])
+                    stored = self._insert_row(conn, partition, sensor_key, reading['ts'], reading)
+                    if not stored:
+                        # Two readings of a sensor in one millisecond are both kept
+                        ts = self._free_ts(conn, partition, sensor_key, reading)
+                        if ts is not None:
+                            stored = True
+                            reading['ts'] = ts
+                    if stored:
+                        inserted.append(reading)
+                        rollup_rows.append((sensor_key, reading))
+                if rollup_rows:
+                    self._update_rollups(conn, rollup_rows)
+                if high_water is not None:
+                    conn.execute('''
+                        INSERT INTO device_sequences (device_id, high_water, updated_ts)
+                        VALUES (?, ?, ?)
+                        ON CONFLICT(device_id) DO UPDATE SET
+                            high_water = MAX(high_water, excluded.high_water),
+                            updated_ts = excluded.updated_ts
+                    ''', (*high_water, get_epoch_ms()))
+                conn.commit()
+        except Exception:
+            # Sensors created or moved in the failed transaction were rolled back with it
+            with self._sensor_keys_lock:
+                for reading in readings:
+                    self._sensor_keys.pop((reading['device_id'], reading.get('sensor_id')), None)
+            raise
+
+        # Backfilled readings older than a ring's newest slot need that ring reloaded
+        out_of_order = {(reading['device_id'], reading.get('sensor_id'))
+                        for reading in inserted if not self.recent.add(reading)}
+        if out_of_order:
+            self.warm_recent_cache(out_of_order)
+        for reading in inserted:
+            self.alerts.observe(reading)
+            self.health.observe(reading)
+        return inserted
+
+    @staticmethod
+    def _insert_row(conn, partition, sensor_key, ts, reading):
+        """INSERT OR IGNORE one reading at ts; returns whether it was stored"""
+        cursor = conn.execute(f'''
+                     INSERT OR IGNORE INTO {partition}
+                     (sensor_key, ts, raw_value, humidity_percent, esp32_timestamp)
+                     VALUES (?, ?, ?, ?, ?)
+                     ''', (sensor_key, ts, reading['raw_value'], reading['humidity_percent'],
+                           reading.get('esp32_timestamp')))
+        return cursor.rowcount > 0
+
+    @staticmethod
+    def _is_stored(conn, partition, sensor_key, ts, reading):
+        """Whether the row at (sensor_key, ts) holds exactly this reading"""
+        cursor = conn.execute(f'''
+            SELECT 1 FROM {partition}
+            WHERE sensor_key = ? AND ts = ? AND raw_value = ? AND humidity_percent = ? AND esp32_timestamp IS ?
+        ''', (sensor_key, ts, reading['raw_value'], reading['humidity_percent'], reading.get('esp32_timestamp')))
+        return cursor.fetchone() is not None
+
+    def _free_ts(self, conn, partition, sensor_key, reading, max_shift_ms=1000):
+        """Store a reading whose ts is taken at the nearest free millisecond within the partition
+
+        Returns that ts, or None for a reading without `seq` that is already stored, at
+        its ts or where an earlier copy of it was moved to. A sequenced reading is new by
+        its seq, so it is always stored rather than dropped under a high-water mark that
+        would never let it be resent.
+        """
+        sequenced = 'seq' in reading
+        if not sequenced and self._is_stored(conn, partition, sensor_key, reading['ts'], reading):
+            return None
+        for shift in range(1, max_shift_ms + 1):
+            for ts in (reading['ts'] + shift, reading['ts'] - shift):
+                if partition_for_ts(ts) != partition:
+                    continue
+                if self._insert_row(conn, partition, sensor_key, ts, reading):
+                    return ts
+                if not sequenced and self._is_stored(conn, partition, sensor_key, ts, reading):
+                    return None
+        # Rolls the batch back; the device resends it and gets fresh timestamps
+        raise sqlite3.IntegrityError(f"No free timestamp within {max_shift_ms}ms of {reading['ts']} "
+                                     f"for {reading['device_id']} {reading.get('sensor_id')}")
+
+    def get_last_seen_from_rollups(self):
+        """(device_id, sensor_id, last_ts, mean raw value) of each sensor's newest hourly rollup"""
+        with self.get_connection() as conn:
+            cursor = conn.execute(f'''
+                SELECT s.device_id, s.sensor_id, h.last_ts, h.raw_sum / h.reading_count AS raw_mean
+                FROM sensors s
+                JOIN readings_hourly h ON h.sensor_key = s.sensor_key
+                WHERE h.hour_ts = (SELECT MAX(hour_ts) FROM readings_hourly WHERE sensor_key = s.sensor_key)
+            ''')
+            return [tuple(row) for row in cursor.fetchall()]
+
+    def warm_recent_cache(self, sensors=None):
+        """Load each sensor's newest readings into the in-memory ring buffers
+
+        `sensors` optionally limits the reload to a set of (device_id, sensor_id) pairs.
+        """
+        capacity = self.recent.capacity
+        with self.get_connection() as conn:
+            cursor = conn.execute('SELECT sensor_key, device_id, sensor_id, sensor_pin FROM sensors')
+            for sensor in cursor.fetchall():
+                if sensors is not None and (sensor['device_id'], sensor['sensor_id']) not in sensors:
+                    continue
+                rows = []
+                for partition in reversed(self._partitions_between()):
+                    rows.extend(conn.execute(f'''
+                        SELECT ts, raw_value, humidity_percent, esp32_timestamp FROM {partition}
+                        WHERE sensor_key = ?
+                        ORDER BY ts DESC LIMIT ?
+                    ''', (sensor['sensor_key'], capacity - len(rows))).fetchall())
+                    if len(rows) >= capacity:
+                        break
+                self.recent.load(sensor['device_id'], sensor['sensor_id'], sensor['sensor_pin'],
+                                 [tuple(row) for row in reversed(rows)], complete=len(rows) < capacity)
+        self.recent.ready = True
+
+    def insert_sequenced_readings(self, device_id, readings):
+        """Insert readings carrying a per-device `seq`, rejecting replays
+
+        Readings at or below the device's high-water mark were already stored and
+        are dropped using the in-memory mark, without touching the database. Only
+        uploads from the same device wait for each other.
+        Returns (inserted readings, duplicate count, new high-water mark).
+        """
+        with self._sequence_locks_lock:
+            sequence_lock = self._sequence_locks.setdefault(device_id, threading.Lock())
+        with sequence_lock:
+            high_water = self._high_water.get(device_id, -1)
+            fresh = {}
+            for reading in readings:
+                if reading['seq'] > high_water:
+                    fresh.setdefault(reading['seq'], reading)
+            ordered = [fresh[seq] for seq in sorted(fresh)]
+
+            inserted = []
+            if ordered:
+                high_water = ordered[-1]['seq']
+                inserted = self.insert_readings(ordered, high_water=(device_id, high_water))
+                self._high_water[device_id] = high_water
+            return inserted, len(readings) - len(ordered), high_water
+
+    def get_high_water(self, device_id):
+        """Get the highest ingest sequence number stored for a device (None if never sequenced)"""
+        return self._high_water.get(device_id)
+
+    def insert_reading(self, device_id, raw_value, humidity_percent, esp32_timestamp, sensor_id=None, sensor_pin=None):
+        """Insert a new humidity reading with optional sensor information"""
+        self.insert_readings([{
+            'device_id': device_id,
+            'sensor_id': sensor_id,
+            'sensor_pin': sensor_pin,
+            'raw_value': raw_value,
+            'humidity_percent': humidity_percent,
+            'esp32_timestamp': esp32_timestamp,
+            'ts': get_epoch_ms(),
+        }])
+
+    def _reload_alert_config(self):
+        """Refresh the alert engine's cached thresholds after a configuration change"""
+        self.alerts.load_config(self.get_all_sensor_configs(), self.get_global_threshold())
+
+    def get_sensor_config(self, device_id, sensor_id):
+        """Get configuration for a specific sensor"""
+        with self.get_connection() as conn:
+            cursor = conn.execute('''
+                SELECT * FROM sensor_config 
+                WHERE device_id = ? AND sensor_id = ?
+            ''', (device_id, sensor_id))
+            return dict(cursor.fetchone()) if cursor.fetchone() else None
+
+    def update_sensor_config(self, device_id, sensor_id, display_name=None, humidity_threshold=None, alerts_enabled=None):
+        """Update sensor configuration"""
+        with self.get_connection() as conn:
+            # Insert or update sensor config
+            if alerts_enabled is None:
+                # Preserve existing alerts_enabled value
+                conn.execute('''
+                    INSERT OR REPLACE INTO sensor_config 
+                    (device_id, sensor_id, display_name, humidity_threshold, alerts_enabled, updated_ts)
+                    VALUES (?, ?, ?, ?, 
+                            COALESCE((SELECT alerts_enabled FROM sensor_config WHERE device_id = ? AND sensor_id = ?), 1),
+                            ?)
+                ''', (device_id, sensor_id, display_name, humidity_threshold, device_id, sensor_id, get_epoch_ms()))
+            else:
+                # Use provided alerts_enabled value
+                conn.execute('''
+                    INSERT OR REPLACE INTO sensor_config 
+                    (device_id, sensor_id, display_name, humidity_threshold, alerts_enabled, updated_ts)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (device_id, sensor_id, display_name, humidity_threshold, int(alerts_enabled), get_epoch_ms()))
+            conn.commit()
+        self._reload_alert_config()
+
+    def set_sensor_alerts_enabled(self, device_id, sensor_id, enabled):
+        """Enable or disable alerts for a specific sensor"""
+        with self.get_connection() as conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO sensor_config 
+                (device_id, sensor_id, display_name, humidity_threshold, alerts_enabled, updated_ts)
+                VALUES (?, ?, 
+                        COALESCE((SELECT display_name FROM sensor_config WHERE device_id = ? AND sensor_id = ?), ?),
+                        COALESCE((SELECT humidity_threshold FROM sensor_config WHERE device_id = ? AND sensor_id = ?), NULL),
+                        ?, ?)
+            ''', (device_id, sensor_id, device_id, sensor_id, sensor_id, device_id, sensor_id, int(enabled),
+                  get_epoch_ms()))
+            conn.commit()
+        self._reload_alert_config()
+
+    def get_all_sensor_configs(self):
+        """Get all sensor configurations"""
+        with self.get_connection() as conn:
+            cursor = conn.execute('''
+                SELECT device_id, sensor_id, display_name, humidity_threshold, alerts_enabled
+                FROM sensor_config
+                ORDER BY device_id, sensor_id
+            ''')
+            return [dict(row) for row in cursor.fetchall()]
+
+    def get_global_threshold(self):
+        """Get global humidity threshold"""
+        with self.get_connection() as conn:
+            cursor = conn.execute('''
+                SELECT value FROM global_settings WHERE key = 'global_humidity_threshold'
+            ''')
+            result = cursor.fetchone()
+            return float(result['value']) if result else 30.0
+
+    def set_global_threshold(self, threshold):
+        """Set global humidity threshold"""
+        with self.get_connection() as conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO global_settings (key, value, updated_ts)
+                VALUES ('global_humidity_threshold', ?, ?)
+            ''', (str(threshold), get_epoch_ms()))
+            conn.commit()
+        self._reload_alert_config()
+
+    @staticmethod
+    def _reading_to_dict(row):
+        """Convert a readings/sensors row into the API reading format"""
+        reading = dict(row)
+        reading['server_timestamp'] = reading['created_at'] = format_epoch_ms(reading['ts'])
+        return reading
+
+    def get_latest_readings(self, device_id=None, sensor_id=None, limit=100, since_ts=None):
+        """Get latest readings, optionally filtered by device and/or sensor and newer than since_ts"""
+        readings = self.recent.latest(device_id, sensor_id, limit)
+        if readings is not None:
+            return readings if since_ts is None else [r for r in readings if r['ts'] > since_ts]
+
+        readings = []
+        with self.get_read_connection() as conn:
+            sensor_keys = self._matching_sensor_keys(conn, device_id, sensor_id)
+            # Walk partitions newest first and stop as soon as the limit is filled
+            for partition in reversed(self._partitions_between(since_ts)):
+                source, params = self._readings_source([partition], since_ts, sensor_keys=sensor_keys)
+                cursor = conn.execute(f'''
+                    SELECT s.device_id, s.sensor_id, s.sensor_pin, r.raw_value, r.humidity_percent,
+                           r.esp32_timestamp, r.ts
+                    FROM ({source}) r
+                    JOIN sensors s ON s.sensor_key = r.sensor_key
+                    ORDER BY r.ts DESC LIMIT ?
+                ''', params + [limit - len(readings)])
+                readings.extend(self._reading_to_dict(row) for row in cursor.fetchall())
+                if len(readings) >= limit:
+                    break
+        return readings
+
+    def get_readings_since(self, hours=24, device_id=None, sensor_id=None, after_ts=None):
+        """Get readings from the last N hours, only those newer than after_ts if given"""
+        since_ts = get_epoch_ms() - int(hours * 3600 * 1000)
+        if after_ts is not None:
+            since_ts = max(since_ts, after_ts)
+
+        # Short windows are usually held entirely in the in-memory ring buffers
+        readings = self.recent.since(since_ts, device_id, sensor_id)
+        if readings is not None:
+            return readings
+
+        with self.get_read_connection() as conn:
+            sensor_keys = self._matching_sensor_keys(conn, device_id, sensor_id)
+            source, params = self._readings_source(self._partitions_between(since_ts), since_ts,
+                                                   sensor_keys=sensor_keys)
+            cursor = conn.execute(f'''
+                SELECT s.device_id, s.sensor_id, s.sensor_pin, r.raw_value, r.humidity_percent,
+                       r.esp32_timestamp, r.ts
+                FROM ({source}) r
+                JOIN sensors s ON s.sensor_key = r.sensor_key
+                ORDER BY r.ts DESC
+            ''', params)
+            return [self._reading_to_dict(row) for row in cursor.fetchall()]
+
+    @staticmethod
+    def _sampling_interval_ms(conn, source, params, hours, sample_size):
+        """Time bucket width that spreads sample_size points over the window and its sensors"""
+        # First, get the number of unique sensors to understand data distribution
+        cursor = conn.execute(f'''
+            SELECT COUNT(DISTINCT sensor_key) as sensor_count FROM ({source})
+        ''', params)
+        sensor_count = cursor.fetchone()[0] or 1
+
+        # Calculate time buckets to ensure we cover the full time range
+        # We want to distribute sample_size points across the time range, with each sensor
+        # getting representation in each time bucket
+        time_buckets = max(sample_size // max(sensor_count, 1), 10)  # At least 10 time buckets
+        return max(1, int(hours * 3600) // time_buckets) * 1000
+
+    def get_sampled_readings_after(self, after_ts, hours=24, device_id=None, sensor_id=None, sample_size=360):
+        """Sampled readings newer than after_ts, to extend a get_sampled_readings_since chart
+
+        Returns (readings, cursor). Time buckets are aligned to the epoch and only
+        completed ones are returned, the newest reading of each sensor in each, so
+        passing the cursor back never returns a bucket twice.
+        """
+        if hours * 360 <= sample_size:
+            readings = self.get_readings_since(hours, device_id, sensor_id, after_ts=after_ts)
+            return readings, readings_cursor(readings, after_ts)
+
+        now_ts = get_epoch_ms()
+        window_ts = now_ts - int(hours * 3600 * 1000)
+        with self.get_read_connection() as conn:
+            sensor_keys = self._matching_sensor_keys(conn, device_id, sensor_id)
+            source, params = self._readings_source(self._partitions_between(window_ts), window_ts,
+                                                   sensor_keys=sensor_keys)
+            sampling_interval_ms = self._sampling_interval_ms(conn, source, params, hours, sample_size)
+
+            since_ts = max(after_ts, window_ts)
+            until_ts = now_ts // sampling_interval_ms * sampling_interval_ms - 1
+            if until_ts <= since_ts:
+                return [], after_ts
+            source, params = self._readings_source(self._partitions_between(since_ts, until_ts), since_ts, until_ts,
+                                                   sensor_keys=sensor_keys)
+            cursor = conn.execute(f'''
+                WITH time_buckets AS (
+                    SELECT s.device_id, s.sensor_id, s.sensor_pin, r.raw_value, r.humidity_percent,
+                           r.esp32_timestamp, r.ts,
+                           ROW_NUMBER() OVER (PARTITION BY r.ts / ?, r.sensor_key ORDER BY r.ts DESC) as rn_in_bucket
+                    FROM ({source}) r
+                    JOIN sensors s ON s.sensor_key = r.sensor_key
+                )
+                SELECT device_id, sensor_id, sensor_pin, raw_value, humidity_percent, esp32_timestamp, ts
+                FROM time_buckets
+                WHERE rn_in_bucket = 1
+                ORDER BY ts DESC
+            ''', [sampling_interval_ms] + params)
+            readings = [self._reading_to_dict(row) for row in cursor.fetchall()]
+        return readings, until_ts
+
+    def get_sampled_readings_since(self, hours=24, device_id=None, sensor_id=None, sample_size=360):
+        """Get sampled readings from the last N hours to limit data points for performance"""
+        # Calculate sampling interval based on expected data points
+        # Assuming 1 reading every 10 seconds: hours * 3600 / 10 = total readings
+        total_expected_readings = hours * 360  # 360 readings per hour
+        
+        if total_expected_readings <= sample_size:
+            # No need to sample, return all data
+            return self.get_readings_since(hours, device_id, sensor_id)
+        
+        now_ts = get_epoch_ms()
+        since_ts = now_ts - int(hours * 3600 * 1000)
+
+        with self.get_read_connection() as conn:
+            sensor_keys = self._matching_sensor_keys(conn, device_id, sensor_id)
+            source, source_params = self._readings_source(self._partitions_between(since_ts), since_ts,
+                                                          sensor_keys=sensor_keys)
+            sampling_interval_ms = self._sampling_interval_ms(conn, source, source_params, hours, sample_size)
+        
+            # Use time-based sampling to ensure all sensors are represented fairly across the full time range
+            cursor = conn.execute(f'''
+                WITH time_buckets AS (
+                    SELECT 
+                        s.device_id, s.sensor_id, s.sensor_pin, r.raw_value, r.humidity_percent,
+                        r.esp32_timestamp, r.ts,
+                        ROW_NUMBER() OVER (
+                            PARTITION BY (? - r.ts) / ?, r.sensor_key
+                            ORDER BY r.ts DESC
+                        ) as rn_in_bucket
+                    FROM ({source}) r
+                    JOIN sensors s ON s.sensor_key = r.sensor_key
+                )
+                SELECT device_id, sensor_id, sensor_pin, raw_value, humidity_percent, esp32_timestamp, ts
+                FROM time_buckets 
+                WHERE rn_in_bucket = 1  -- Take the most recent reading from each sensor in each time bucket
+                ORDER BY ts DESC
+                LIMIT ?
+            ''', [now_ts, sampling_interval_ms] + source_params + [
+                sample_size * 2  # Allow more readings to ensure we get good coverage
+            ])
+            readings = [self._reading_to_dict(row) for row in cursor.fetchall()]
+            
+        # If we have too many readings, do final sampling while preserving time distribution
+        if len(readings) > sample_size:
+            # Keep readings distributed across time - take every nth reading
+            step = len(readings) // sample_size
+            readings = readings[::max(1, step)][:sample_size]
+            
+        return readings
+
+    def _named_sensors(self, conn, device_id=None, sensor_id=None):
+        """Matching sensor keys (None for all) and the named sensors among them, ordered by device and sensor"""
+        sensor_keys = self._matching_sensor_keys(conn, device_id, sensor_id)
+        sensors = [dict(row) for row in conn.execute('''
+            SELECT sensor_key, device_id, sensor_id FROM sensors
+            WHERE sensor_id IS NOT NULL
+            ORDER BY device_id, sensor_id
+        ''').fetchall() if sensor_keys is None or row['sensor_key'] in sensor_keys]
+        return sensor_keys, sensors
+
+    @staticmethod
+    def _sensor_positions(sensors, keys):
+        """Map an array of sensor keys to positions in `sensors` (-1 for keys not listed)"""
+        listed = np.array([sensor['sensor_key'] for sensor in sensors], dtype=np.int64)
+        if not len(listed):
+            return np.full(len(keys), -1, dtype=np.int64)
+        order = np.argsort(listed)
+        slot = np.minimum(np.searchsorted(listed[order], keys), len(listed) - 1)
+        return np.where(listed[order][slot] == keys, order[slot], -1)
+
+    def iter_humidity_columns(self, since_ts, until_ts=None, device_id=None, sensor_id=None, batch_size=50000):
+        """Stream humidity readings in ascending time order as NumPy column batches
+
+        Returns (sensors, batches): sensors as in _named_sensors and a generator of
+        (sensor position, ts, humidity) array triples. Uses the same (ts, sensor_key)
+        keyset cursor as iter_readings, without the per-row sensor join.
+        """
+        with self.get_read_connection() as conn:
+            sensor_keys, sensors = self._named_sensors(conn, device_id, sensor_id)
+
+        def batches():
+            last = None
+            for partition in self._partitions_between(since_ts, until_ts):
+                while True:
+                    source, params = self._readings_source([partition], since_ts, until_ts, sensor_keys)
+                    keyset = ''
+                    if last is not None:
+                        keyset = 'WHERE (ts, sensor_key) > (?, ?)'
+                        params = params + list(last)
+                    with self.get_read_connection() as conn:
+                        cursor = conn.cursor()
+                        cursor.row_factory = None
+                        rows = cursor.execute(f'''
+                            SELECT sensor_key, ts, humidity_percent FROM ({source})
+                            {keyset}
+                            ORDER BY ts, sensor_key
+                            LIMIT ?
+                        ''', params + [batch_size]).fetchall()
+                    if not rows:
+                        break
+                    data = np.fromiter(chain.from_iterable(rows), dtype=np.float64,
+                                       count=3 * len(rows)).reshape(-1, 3)
+                    keys = data[:, 0].astype(np.int64)
+                    ts = data[:, 1].astype(np.int64)
+                    last = (int(ts[-1]), int(keys[-1]))
+                    yield self._sensor_positions(sensors, keys), ts, data[:, 2]
+                    if len(rows) < batch_size:
+                        break
+
+        return sensors, batches()
+
+    def iter_readings(self, since_ts=None, until_ts=None, device_id=None, sensor_id=None, batch_size=5000):
+        """Stream readings in ascending time order as lists of row tuples
+
+        Each row is (sensor_key, device_id, sensor_id, sensor_pin, ts, raw_value,
+        humidity_percent, esp32_timestamp). Batches are fetched with a (ts, sensor_key)
+        keyset cursor, so memory stays constant and no read lock is held between batches.
+        """
+        with self.get_read_connection() as conn:
+            sensor_keys = self._matching_sensor_keys(conn, device_id, sensor_id)
+        last_ts, last_key = None, None
+
+        for partition in self._partitions_between(since_ts, until_ts):
+            while True:
+                source, params = self._readings_source([partition], since_ts, until_ts, sensor_keys)
+                keyset = ''
+                if last_ts is not None:
+                    # Row-value comparison lets SQLite seek the (ts, sensor_key) index directly
+                    keyset = 'WHERE (r.ts, r.sensor_key) > (?, ?)'
+                    params = params + [last_ts, last_key]
+                with self.get_read_connection() as conn:
+                    cursor = conn.execute(f'''
+                        SELECT r.sensor_key, s.device_id, s.sensor_id, s.sensor_pin, r.ts,
+                               r.raw_value, r.humidity_percent, r.esp32_timestamp
+                        FROM ({source}) r
+                        JOIN sensors s ON s.sensor_key = r.sensor_key
+                        {keyset}
+                        ORDER BY r.ts, r.sensor_key
+                        LIMIT ?
+                    ''', params + [batch_size])
+                    rows = [tuple(row) for row in cursor.fetchall()]
+                if not rows:
+                    break
+                yield rows
+                last_key, last_ts = rows[-1][0], rows[-1][4]
+                if len(rows) < batch_size:
+                    break
+
+    def get_analytics_series(self, hours=72, device_id=None, sensor_id=None):
+        """Load each matching sensor's humidity over the last N hours as NumPy arrays
+
+        Windows up to CONFIG['analytics_raw_max_hours'] use raw readings; longer ones use
+        the hourly rollup means. Returns (source, series) where source is 'raw' or 'hourly'
+        and each series dict holds sensor_key, device_id, sensor_id, ts (int64 epoch ms),
+        humidity (float64), last_ts and last_humidity.
+        """
+        since_ts = get_epoch_ms() - int(hours * HOUR_MS)
+        source = 'raw' if hours <= CONFIG['analytics_raw_max_hours'] else 'hourly'
+        series = []
+        with self.get_read_connection() as conn:
+            sensor_keys = self._matching_sensor_keys(conn, device_id, sensor_id)
+            sensors = conn.execute('SELECT sensor_key, device_id, sensor_id FROM sensors ORDER BY sensor_key').fetchall()
+            partitions = self._partitions_between(since_ts)
+            cursor = conn.cursor()
+            cursor.row_factory = None  # plain tuples load straight into NumPy
+
+            for sensor in sensors:
+                if sensor_keys is not None and sensor['sensor_key'] not in sensor_keys:
+                    continue
+                # Per-sensor range scans follow the (sensor_key, ts) primary key, so rows arrive sorted
+                if source == 'raw':
+                    rows = []
+                    for partition in partitions:
+                        rows.extend(cursor.execute(f'''
+                            SELECT ts, humidity_percent FROM {partition}
+                            WHERE sensor_key = ? AND ts > ?
+                        ''', (sensor['sensor_key'], since_ts)).fetchall())
+                    last = rows[-1] if rows else None
+                else:
+                    # Each hour sits at its midpoint, or at its newest reading while the hour is still open
+                    rows = cursor.execute(f'''
+                        SELECT MIN(hour_ts + {HOUR_MS // 2}, last_ts), humidity_sum / reading_count
+                        FROM readings_hourly
+                        WHERE sensor_key = ? AND hour_ts > ?
+                    ''', (sensor['sensor_key'], since_ts - HOUR_MS)).fetchall()
+                    last = cursor.execute('''
+                        SELECT last_ts, last_humidity FROM readings_hourly
+                        WHERE sensor_key = ? ORDER BY hour_ts DESC LIMIT 1
+                    ''', (sensor['sensor_key'],)).fetchone()
+                if not rows:
+                    continue
+
+                values = np.fromiter(chain.from_iterable(rows), dtype=np.float64, count=2 * len(rows))
+                series.append({
+                    'sensor_key': sensor['sensor_key'],
+                    'device_id': sensor['device_id'],
+                    'sensor_id': sensor['sensor_id'],
+                    'ts': values[0::2].astype(np.int64),
+                    'humidity': values[1::2],
+                    'last_ts': last[0],
+                    'last_humidity': last[1],
+                })
+        return source, series
+
+    # Rollup field -> (column, aggregate used when hours are merged)
+    ROLLUP_FIELDS = {
+        'count': ('reading_count', 'SUM'),
+        'sum': ('humidity_sum', 'SUM'),
+        'min': ('humidity_min', 'MIN'),
+        'max': ('humidity_max', 'MAX'),
+    }
+
+    def get_hourly_rollups(self, since_ts, fields=('count', 'sum'), device_id=None, sensor_id=None,
+                           split_hours=None):
+        """Load hourly rollups from since_ts on as NumPy columns in a single query
+
+        `fields` picks rollup columns from ROLLUP_FIELDS. With `split_hours` (UTC
+        hours of day), the hours of each UTC day are merged into the segments between
+        those hours, so callers that only need coarser buckets aligned to them fetch far
+        fewer rows. Returns (sensors, columns): sensors is a list of dicts (sensor_key,
+        device_id, sensor_id) and columns holds parallel arrays `sensor` (index into
+        sensors), hour_ts (first hour of the row) and the requested fields.
+        """
+        with self.get_read_connection() as conn:
+            sensor_keys, sensors = self._named_sensors(conn, device_id, sensor_id)
+            key_filter = ''
+            if sensor_keys is not None:
+                key_filter = f" AND sensor_key IN ({', '.join('?' * len(sensor_keys))})"
+            if split_hours is None:
+                select = ', '.join(self.ROLLUP_FIELDS[field][0] for field in fields)
+                query = f'''
+                    SELECT sensor_key, hour_ts, {select}
+                    FROM readings_hourly
+                    WHERE hour_ts >= ?{key_filter}
+                '''
+            else:
+                select = ', '.join(f'{aggregate}({column})'
+                                   for column, aggregate in (self.ROLLUP_FIELDS[field] for field in fields))
+                segment = ' + '.join(f'(hour_ts % 86400000 >= {int(hour) * HOUR_MS})'
+                                     for hour in sorted(split_hours)) or '0'
+                query = f'''
+                    SELECT sensor_key, MIN(hour_ts), {select}
+                    FROM readings_hourly
+                    WHERE hour_ts >= ?{key_filter}
+                    GROUP BY sensor_key, hour_ts / 86400000, {segment}
+                '''
+            cursor = conn.cursor()
+            cursor.row_factory = None  # plain tuples load straight into NumPy
+            rows = cursor.execute(query, [since_ts] + (sensor_keys or [])).fetchall()
+
+        width = 2 + len(fields)
+        data = np.fromiter(chain.from_iterable(rows), dtype=np.float64, count=width * len(rows)).reshape(-1, width)
+        position = self._sensor_positions(sensors, data[:, 0].astype(np.int64))
+        keep = position >= 0
+        columns = {'sensor': position[keep], 'hour_ts': data[keep, 1].astype(np.int64)}
+        for position, field in enumerate(fields):
+            columns[field] = data[keep, 2 + position]
+        return sensors, columns
+
+    def get_devices(self):
+        """Get devices with reading counts and last-seen time"""
+        with self.get_read_connection() as conn:
+            source, params = self._readings_source(self._partitions_between())
+            cursor = conn.execute(f'''
+                SELECT s.device_id,
+                       COUNT(*) as reading_count,
+                       MAX(r.ts) as last_ts
+                FROM ({source}) r
+                JOIN sensors s ON s.sensor_key = r.sensor_key
+                GROUP BY s.device_id
+                ORDER BY last_ts DESC
+            ''', params)
+            devices = [dict(row) for row in cursor.fetchall()]
+        for device in devices:
+            device['last_seen'] = format_epoch_ms(device.pop('last_ts'))
+        return devices
+
+    def get_sensors(self, device_id=None):
+        """Get sensors with reading counts, last-seen time and average humidity"""
+        with self.get_read_connection() as conn:
+            sensor_keys = self._matching_sensor_keys(conn, device_id)
+            source, params = self._readings_source(self._partitions_between(), sensor_keys=sensor_keys)
+            cursor = conn.execute(f'''
+                SELECT s.device_id, s.sensor_id, s.sensor_pin,
+                       COUNT(*) as reading_count,
+                       MAX(r.ts) as last_ts,
+                       AVG(r.humidity_percent) as avg_humidity
+                FROM ({source}) r
+                JOIN sensors s ON s.sensor_key = r.sensor_key
+                WHERE s.sensor_id IS NOT NULL
+                GROUP BY s.sensor_key
+                ORDER BY s.device_id, s.sensor_id
+            ''', params)
+            sensors = [dict(row) for row in cursor.fetchall()]
+        for sensor in sensors:
+            sensor['last_seen'] = format_epoch_ms(sensor.pop('last_ts'))
+        return sensors
 
-    def get_sensor_config(self, device_id, sensor_id):
-        """Get configuration for a specific sensor"""
-        with self.get_connection() as conn:
-            cursor = conn.execute('''
-                SELECT * FROM sensor_config 
-                WHERE device_id = ? AND sensor_id = ?
-            ''', (device_id, sensor_id))
-            return dict(cursor.fetchone()) if cursor.fetchone() else None
+    def get_devices_and_sensors(self, device_id=None):
+        """Return (get_devices(), get_sensors(device_id)) from a single scan of the readings"""
+        with self.get_read_connection() as conn:
+            source, params = self._readings_source(self._partitions_between())
+            cursor = conn.execute(f'''
+                SELECT s.device_id, s.sensor_id, s.sensor_pin,
+                       COUNT(*) as reading_count,
+                       MAX(r.ts) as last_ts,
+                       AVG(r.humidity_percent) as avg_humidity
+                FROM ({source}) r
+                JOIN sensors s ON s.sensor_key = r.sensor_key
+                GROUP BY s.sensor_key
+                ORDER BY s.device_id, s.sensor_id
+            ''', params)
+            rows = [dict(row) for row in cursor.fetchall()]
 
-    def update_sensor_config(self, device_id, sensor_id, display_name=None, humidity_threshold=None, alerts_enabled=None):
-        """Update sensor configuration"""
-        with self.get_connection() as conn:
-            # Insert or update sensor config
-            if alerts_enabled is None:
-                # Preserve existing alerts_enabled value
-                conn.execute('''
-                    INSERT OR REPLACE INTO sensor_config 
-                    (device_id, sensor_id, display_name, humidity_threshold, alerts_enabled, updated_at)
-                    VALUES (?, ?, ?, ?, 
-                            COALESCE((SELECT alerts_enabled FROM sensor_config WHERE device_id = ? AND sensor_id = ?), 1),
-                            datetime('now'))
-                ''', (device_id, sensor_id, display_name, humidity_threshold, device_id, sensor_id))
-            else:
-                # Use provided alerts_enabled value
-                conn.execute('''
-                    INSERT OR REPLACE INTO sensor_config 
-                    (device_id, sensor_id, display_name, humidity_threshold, alerts_enabled, updated_at)
-                    VALUES (?, ?, ?, ?, ?, datetime('now'))
-                ''', (device_id, sensor_id, display_name, humidity_threshold, int(alerts_enabled)))
-            conn.commit()
+        devices = {}
+        for row in rows:
+            device = devices.setdefault(row['device_id'], {'device_id': row['device_id'], 'reading_count': 0,
+                                                           'last_ts': row['last_ts']})
+            device['reading_count'] += row['reading_count']
+            device['last_ts'] = max(device['last_ts'], row['last_ts'])
+        devices = sorted(devices.values(), key=lambda device: device['last_ts'], reverse=True)
+        sensors = [row for row in rows
+                   if row['sensor_id'] is not None and device_id in (None, row['device_id'])]
+        for item in chain(devices, sensors):
+            item['last_seen'] = format_epoch_ms(item.pop('last_ts'))
+        return devices, sensors
 
-    def set_sensor_alerts_enabled(self, device_id, sensor_id, enabled):
-        """Enable or disable alerts for a specific sensor"""
-        with self.get_connection() as conn:
-            conn.execute('''
-                INSERT OR REPLACE INTO sensor_config 
-                (device_id, sensor_id, display_name, humidity_threshold, alerts_enabled, updated_at)
-                VALUES (?, ?, 
-                        COALESCE((SELECT display_name FROM sensor_config WHERE device_id = ? AND sensor_id = ?), ?),
-                        COALESCE((SELECT humidity_threshold FROM sensor_config WHERE device_id = ? AND sensor_id = ?), NULL),
-                        ?, datetime('now'))
-            ''', (device_id, sensor_id, device_id, sensor_id, sensor_id, device_id, sensor_id, int(enabled)))
+    def expired_partitions(self, days=30):
+        """Monthly readings partitions that are entirely older than the retention window
+
+        Retention has month granularity: a partition is kept until its newest possible
+        reading is more than `days` old, and is then dropped whole instead of deleting
+        rows one by one.
+        """
+        cutoff_ts = get_epoch_ms() - days * 86400 * 1000
+        return [partition for partition in self._partitions_between()
+                if partition_bounds(partition)[1] <= cutoff_ts]
+
+    def drop_partitions(self, partitions):
+        """Drop readings partitions, removing them from the `readings` view first"""
+        with self._partition_tables_lock, self.get_connection() as conn:
+            with self._partitions_lock:
+                self._partitions = [p for p in self._partitions if p not in partitions]
+            # The view must stop referencing the partitions before they are dropped
+            self._rebuild_readings_view(conn)
+            for partition in partitions:
+                conn.execute(f'DROP TABLE IF EXISTS {partition}')
             conn.commit()
 
-    def get_all_sensor_configs(self):
-        """Get all sensor configurations"""
+    def trim_rollups(self, cutoff_ts, sensor_key=None):
+        """Delete hourly rollups older than cutoff_ts (of one sensor, or all), returning the row count"""
         with self.get_connection() as conn:
             cursor = conn.execute('''
-                SELECT device_id, sensor_id, display_name, humidity_threshold, alerts_enabled
-                FROM sensor_config
-                ORDER BY device_id, sensor_id
-            ''')
-            return [dict(row) for row in cursor.fetchall()]
+                DELETE FROM readings_hourly WHERE (? IS NULL OR sensor_key = ?) AND hour_ts < ?
+            ''', (sensor_key, sensor_key, cutoff_ts))
+            conn.commit()
+            return cursor.rowcount
 
-    def get_global_threshold(self):
-        """Get global humidity threshold"""
-        with self.get_connection() as conn:
-            cursor = conn.execute('''
-                SELECT value FROM global_settings WHERE key = 'global_humidity_threshold'
-            ''')
-            result = cursor.fetchone()
-            return float(result['value']) if result else 30.0
+    def cleanup_old_data(self, days=30):
+        """Drop expired readings partitions and hourly rollups in one go
 
-    def set_global_threshold(self, threshold):
-        """Set global humidity threshold"""
+        Memories are never touched. Hourly rollups older than
+        CONFIG['rollup_retention_days'] are deleted as well. Returns the names of the
+        dropped partitions. The scheduled maintenance jobs do the same work in slices.
+        """
+        self.trim_rollups(get_epoch_ms() - CONFIG['rollup_retention_days'] * 86400 * 1000)
+        expired = self.expired_partitions(days)
+        if expired:
+            self.drop_partitions(expired)
+        return expired
+
+    def get_sensor_keys(self):
         with self.get_connection() as conn:
-            conn.execute('''
-                INSERT OR REPLACE INTO global_settings (key, value, updated_at)
-                VALUES ('global_humidity_threshold', ?, datetime('now'))
-            ''', (str(threshold),))
-            conn.commit()
+            return [row['sensor_key'] for row in conn.execute('SELECT sensor_key FROM sensors').fetchall()]
 
-    def get_latest_readings(self, device_id=None, sensor_id=None, limit=100):
-        """Get latest readings, optionally filtered by device and/or sensor"""
-        query = '''
-                SELECT id, device_id, sensor_id, sensor_pin, raw_value, humidity_percent, esp32_timestamp, 
-                       server_timestamp, server_timestamp as created_at
-                FROM humidity_readings
-                WHERE (? IS NULL OR device_id = ?)
-                AND (? IS NULL OR sensor_id = ?)
-                ORDER BY created_at DESC LIMIT ?
-                '''
+    def maintenance_tables(self):
+        """Tables whose query planner statistics are refreshed by the optimize job
+
+        `sensors` is left out on purpose: with statistics on the tiny dimension table
+        the planner drives the all-partition aggregates from it through an automatic
+        index over the materialized readings, which is about 40% slower.
+        """
+        return ['readings_hourly', 'memories'] + self._partitions_between()
 
+    def analyze_table(self, table):
+        """Refresh planner statistics of one table from a bounded sample of its rows"""
         with self.get_connection() as conn:
-            cursor = conn.execute(query, (device_id, device_id, sensor_id, sensor_id, limit))
-            return [dict(row) for row in cursor.fetchall()]
+            conn.execute('PRAGMA analysis_limit=1000')
+            conn.execute(f'ANALYZE {table}')
+            conn.commit()
 
-    def get_readings_since(self, hours=24, device_id=None, sensor_id=None):
-        """Get readings from the last N hours"""
-        query = '''
-            SELECT id, device_id, sensor_id, sensor_pin, raw_value, humidity_percent, esp32_timestamp, 
-                   server_timestamp, server_timestamp as created_at
-            FROM humidity_readings 
-            WHERE (? IS NULL OR device_id = ?)
-            AND (? IS NULL OR sensor_id = ?)
-            AND created_at > datetime('now', '-{} hours')
-            ORDER BY created_at DESC
-        '''.format(hours)
+    def optimize(self):
+        with self.get_connection() as conn:
+            conn.execute('PRAGMA optimize')
 
+    def checkpoint_wal(self):
+        """Passively checkpoint the WAL; returns (busy, wal pages, checkpointed pages), or None outside WAL mode"""
         with self.get_connection() as conn:
-            cursor = conn.execute(query, (device_id, device_id, sensor_id, sensor_id))
-            return [dict(row) for row in cursor.fetchall()]
+            if conn.execute('PRAGMA journal_mode').fetchone()[0] != 'wal':
+                return None
+            return tuple(conn.execute('PRAGMA wal_checkpoint(PASSIVE)').fetchone())
 
-    def get_sampled_readings_since(self, hours=24, device_id=None, sensor_id=None, sample_size=360):
-        """Get sampled readings from the last N hours to limit data points for performance"""
-        # Calculate sampling interval based on expected data points
-        # Assuming 1 reading every 10 seconds: hours * 3600 / 10 = total readings
-        total_expected_readings = hours * 360  # 360 readings per hour
-        
-        if total_expected_readings <= sample_size:
-            # No need to sample, return all data
-            return self.get_readings_since(hours, device_id, sensor_id)
-        
-        # First, get the number of unique sensors to understand data distribution
-        sensor_count_query = '''
-            SELECT COUNT(DISTINCT sensor_id) as sensor_count
-            FROM humidity_readings 
-            WHERE (? IS NULL OR device_id = ?)
-            AND (? IS NULL OR sensor_id = ?)
-            AND created_at > datetime('now', '-{} hours')
-        '''.format(hours)
-        
+    def get_photo_filenames(self):
         with self.get_connection() as conn:
-            cursor = conn.execute(sensor_count_query, (device_id, device_id, sensor_id, sensor_id))
-            sensor_count = cursor.fetchone()[0] or 1
-        
-        # Calculate time buckets to ensure we cover the full time range
-        # We want to distribute sample_size points across the time range, with each sensor
-        # getting representation in each time bucket
-        time_buckets = max(sample_size // max(sensor_count, 1), 10)  # At least 10 time buckets
-        sampling_interval_seconds = max(1, (hours * 3600) // time_buckets)
-        
-        # Use time-based sampling to ensure all sensors are represented fairly across the full time range
-        query = '''
-            WITH time_buckets AS (
-                SELECT 
-                    id, device_id, sensor_id, sensor_pin, raw_value, humidity_percent,
-                    esp32_timestamp, server_timestamp, server_timestamp as created_at,
-                    CAST((julianday('now') - julianday(created_at)) * 24 * 3600 / ? AS INTEGER) as time_bucket,
-                    ROW_NUMBER() OVER (
-                        PARTITION BY 
-                            CAST((julianday('now') - julianday(created_at)) * 24 * 3600 / ? AS INTEGER),
-                            device_id, 
-                            sensor_id 
-                        ORDER BY created_at DESC
-                    ) as rn_in_bucket
-                FROM humidity_readings 
-                WHERE (? IS NULL OR device_id = ?)
-                AND (? IS NULL OR sensor_id = ?)
-                AND created_at > datetime('now', '-{} hours')
-            )
-            SELECT id, device_id, sensor_id, sensor_pin, raw_value, humidity_percent,
-                   esp32_timestamp, server_timestamp, created_at
-            FROM time_buckets 
-            WHERE rn_in_bucket = 1  -- Take the most recent reading from each sensor in each time bucket
-            ORDER BY created_at DESC
-            LIMIT ?
-        '''.format(hours)
+            cursor = conn.execute('SELECT DISTINCT photo_filename FROM memories WHERE photo_filename IS NOT NULL')
+            return {row['photo_filename'] for row in cursor.fetchall()}
+
+    @staticmethod
+    def _photo_references(conn, photo_filename):
+        cursor = conn.execute('SELECT COUNT(*) FROM memories WHERE photo_filename = ?', (photo_filename,))
+        return cursor.fetchone()[0]
+
+    def release_photo(self, photo_filename):
+        """Delete a stored photo if no memory refers to it any more; returns True if the file was removed"""
+        with self.photos.lock:
+            if self.photos.pending.get(photo_filename):
+                return False
+            with self.get_connection() as conn:
+                if self._photo_references(conn, photo_filename):
+                    return False
+            return self.photos.remove(photo_filename)
 
+    def get_job_runs(self):
+        """Persisted state of the scheduled jobs, keyed by name"""
         with self.get_connection() as conn:
-            cursor = conn.execute(query, (
-                sampling_interval_seconds, sampling_interval_seconds, 
-                device_id, device_id, sensor_id, sensor_id, 
-                sample_size * 2  # Allow more readings to ensure we get good coverage
-            ))
-            readings = [dict(row) for row in cursor.fetchall()]
-            
-            # If we have too many readings, do final sampling while preserving time distribution
-            if len(readings) > sample_size:
-                # Keep readings distributed across time - take every nth reading
-                step = len(readings) // sample_size
-                readings = readings[::max(1, step)][:sample_size]
-                
-            return readings
+            cursor = conn.execute('SELECT * FROM scheduled_jobs')
+            return {row['name']: dict(row) for row in cursor.fetchall()}
 
-    def cleanup_old_data(self, days=30):
-        """Remove old sensor data while preserving memories forever"""
+    def claim_job(self, name, now_ts, lease_until_ts):
+        """Record the start of a job and take its run lease; False if another process holds the lease"""
         with self.get_connection() as conn:
-            # Only clean up humidity readings, never touch memories
+            conn.execute('INSERT OR IGNORE INTO scheduled_jobs (name) VALUES (?)', (name,))
             cursor = conn.execute('''
-                DELETE FROM humidity_readings 
-                WHERE created_at < datetime('now', '-{} days')
-            '''.format(days))
-            deleted_count = cursor.rowcount
+                UPDATE scheduled_jobs SET last_started_ts = ?, lease_until_ts = ?
+                WHERE name = ? AND (lease_until_ts IS NULL OR lease_until_ts < ?)
+            ''', (now_ts, lease_until_ts, name, now_ts))
+            conn.commit()
+            return cursor.rowcount == 1
+
+    def finish_job(self, name, status, result, finished_ts):
+        """Record the outcome of a job and release its lease"""
+        with self.get_connection() as conn:
+            conn.execute('''
+                UPDATE scheduled_jobs
+                SET last_finished_ts = ?, last_status = ?, last_result = ?, lease_until_ts = NULL
+                WHERE name = ?
+            ''', (finished_ts, status, None if result is None else str(result), name))
             conn.commit()
-            return deleted_count
 
     def add_memory(self, user_name, memory_text, photo_filename=None):
         """Add a new memory entry with optional photo"""
@@ -660,48 +3235,65 @@ class HumidityDatabase:
         with self.get_connection() as conn:
             logger.info("Database connection established for memory insertion")
             cursor = conn.execute('''
-                INSERT INTO memories (user_name, memory_text, photo_filename)
-                VALUES (?, ?, ?)
-            ''', (user_name, memory_text, photo_filename))
+                INSERT INTO memories (user_name, memory_text, photo_filename, created_ts)
+                VALUES (?, ?, ?, ?)
+            ''', (user_name, memory_text, photo_filename, get_epoch_ms()))
             memory_id = cursor.lastrowid
             logger.info(f"Memory inserted with ID: {memory_id}, committing transaction")
             conn.commit()
             logger.info("Database transaction committed successfully")
             return memory_id
 
+    def add_memories(self, memories):
+        """Add (user_name, memory_text, photo_filename) memories in one transaction; returns their IDs"""
+        created_ts = get_epoch_ms()
+        with self.get_connection() as conn:
+            memory_ids = [conn.execute('''
+                INSERT INTO memories (user_name, memory_text, photo_filename, created_ts)
+                VALUES (?, ?, ?, ?)
+            ''', (*memory, created_ts)).lastrowid for memory in memories]
+            conn.commit()
+            return memory_ids
+
+    @staticmethod
+    def _memory_to_dict(row):
+        memory = dict(row)
+        memory['created_at'] = format_epoch_ms(memory.pop('created_ts'))
+        return memory
+
     def get_latest_memory(self):
         """Get the most recent memory"""
         with self.get_connection() as conn:
             cursor = conn.execute('''
-                SELECT id, user_name, memory_text, photo_filename, created_at
+                SELECT id, user_name, memory_text, photo_filename, created_ts
                 FROM memories
-                ORDER BY created_at DESC
+                ORDER BY created_ts DESC, id DESC
                 LIMIT 1
             ''')
             result = cursor.fetchone()
-            return dict(result) if result else None
+            return self._memory_to_dict(result) if result else None
 
     def get_memory_by_id(self, memory_id):
         """Get a specific memory by ID"""
         with self.get_connection() as conn:
             cursor = conn.execute('''
-                SELECT id, user_name, memory_text, photo_filename, created_at
+                SELECT id, user_name, memory_text, photo_filename, created_ts
                 FROM memories
                 WHERE id = ?
             ''', (memory_id,))
             result = cursor.fetchone()
-            return dict(result) if result else None
+            return self._memory_to_dict(result) if result else None
 
     def get_all_memories(self, limit=50):
         """Get all memories with optional limit"""
         with self.get_connection() as conn:
             cursor = conn.execute('''
-                SELECT id, user_name, memory_text, photo_filename, created_at
+                SELECT id, user_name, memory_text, photo_filename, created_ts
                 FROM memories
-                ORDER BY created_at DESC
+                ORDER BY created_ts DESC, id DESC
                 LIMIT ?
             ''', (limit,))
-            return [dict(row) for row in cursor.fetchall()]
+            return [self._memory_to_dict(row) for row in cursor.fetchall()]
 
     def get_memory_stats(self):
         """Get memory statistics"""
@@ -710,12 +3302,18 @@ class HumidityDatabase:
                 SELECT 
                     COUNT(*) as total_memories,
                     COUNT(DISTINCT user_name) as unique_users,
-                    MIN(created_at) as oldest_memory,
-                    MAX(created_at) as newest_memory
+                    MIN(created_ts) as oldest_memory,
+                    MAX(created_ts) as newest_memory
                 FROM memories
             ''')
             result = cursor.fetchone()
-            return dict(result) if result else {
+            if result:
+                stats = dict(result)
+                for key in ('oldest_memory', 'newest_memory'):
+                    if stats[key] is not None:
+                        stats[key] = format_epoch_ms(stats[key])
+                return stats
+            return {
                 'total_memories': 0,
                 'unique_users': 0,
                 'oldest_memory': None,
@@ -723,8 +3321,8 @@ class HumidityDatabase:
             }
 
     def delete_memory(self, memory_id):
-        """Delete a memory and its associated photo"""
-        with self.get_connection() as conn:
+        """Delete a memory, and its photo unless another memory shares it"""
+        with self.photos.lock, self.get_connection() as conn:
             # Get the photo filename before deleting
             cursor = conn.execute('''
                 SELECT photo_filename FROM memories WHERE id = ?
@@ -746,12 +3344,10 @@ class HumidityDatabase:
             
             conn.commit()
             
-            # Delete the photo file if it exists
+            # Delete the photo file once no memory refers to it
             if photo_filename:
                 try:
-                    photo_path = os.path.join(CONFIG['upload_folder'], photo_filename)
-                    if os.path.exists(photo_path):
-                        os.remove(photo_path)
+                    if self.release_photo(photo_filename):
                         logger.info(f"Deleted photo file: {photo_filename}")
                 except Exception as e:
                     logger.error(f"Error deleting photo file {photo_filename}: {e}")
@@ -760,8 +3356,246 @@ class HumidityDatabase:
             return True, "Memory deleted successfully"
 
 
-# Initialize database
-db = HumidityDatabase(CONFIG['database'])
+# Alerts are delivered from a background thread; the database owns the per-sensor alert state
+alert_dispatcher = AlertDispatcher(CONFIG['telegram_chat_id'], CONFIG['telegram_sender'])
+
+def site_settings(site):
+    """Storage and retention settings of a site, defaults filled in"""
+    if site == DEFAULT_SITE:
+        return {key: CONFIG[key] for key in SITE_SETTINGS}
+    folder = os.path.join(CONFIG['sites_folder'], site)
+    settings = {'database': os.path.join(folder, 'humidity.db'), 'upload_folder': os.path.join(folder, 'photos'),
+                'cleanup_days': CONFIG['cleanup_days'], 'rollup_retention_days': CONFIG['rollup_retention_days']}
+    settings.update(CONFIG['sites'].get(site, {}))
+    return settings
+
+
+class SiteRegistry:
+    """Databases of the configured sites, opened on first use and closed again once idle
+
+    Every site has its own SQLite file, photo folder and in-memory state (recent readings,
+    alert and health tracking), so one site's writes never wait on another's lock. The
+    default site stays open; of the others at most max_open_sites are kept, and opening
+    one more closes the least recently used site that no request is using. Sites idle
+    for site_idle_seconds are closed by the health monitor.
+    """
+
+    def __init__(self, default):
+        self.default = default
+        self._open = OrderedDict()  # site -> HumidityDatabase, least recently used first
+        self._in_use = {}  # site -> requests and jobs currently holding it
+        self._last_used = {}
+        self._opening = {}  # site -> lock, so concurrent first requests open a site once
+        self._lock = threading.Lock()
+
+    def acquire(self, site):
+        """Database of a site, opened if needed; pair with release()"""
+        if site == DEFAULT_SITE:
+            return self.default
+        with self._lock:
+            database = self._checkout(site)
+            opening = self._opening.setdefault(site, threading.Lock())
+        if database is not None:
+            return database
+        with opening:
+            with self._lock:
+                database = self._checkout(site)
+            if database is not None:
+                return database
+            # Opened outside the registry lock: requests for the other sites carry on meanwhile
+            settings = site_settings(site)
+            database = HumidityDatabase(settings['database'], settings['upload_folder'], site)
+            with self._lock:
+                self._open[site] = database
+                self._checkout(site)
+                evicted = self._evict(max_open=CONFIG['max_open_sites'])
+        logger.info(f"Opened site {site} ({settings['database']})")
+        self._log_closed(evicted, 'to make room')
+        return database
+
+    def _checkout(self, site):
+        database = self._open.get(site)
+        if database is not None:
+            self._open.move_to_end(site)
+            self._in_use[site] = self._in_use.get(site, 0) + 1
+            self._last_used[site] = time.monotonic()
+        return database
+
+    def release(self, site):
+        if site == DEFAULT_SITE:
+            return
+        with self._lock:
+            self._in_use[site] -= 1
+            self._last_used[site] = time.monotonic()
+
+    @contextmanager
+    def using(self, site):
+        database = self.acquire(site)
+        try:
+            yield database
+        finally:
+            self.release(site)
+
+    def _evict(self, max_open=None, idle_seconds=None, sites=()):
+        """Drop unused sites: beyond max_open (least recently used first), idle too long, or listed"""
+        now = time.monotonic()
+        evicted = []
+        for site in list(self._open):
+            if self._in_use.get(site):
+                continue
+            if ((max_open is not None and len(self._open) > max_open) or site in sites
+                    or (idle_seconds is not None and now - self._last_used[site] >= idle_seconds)):
+                del self._open[site]
+                evicted.append(site)
+        return evicted
+
+    @staticmethod
+    def _log_closed(sites, reason):
+        for site in sites:
+            logger.info(f"Closed site {site} {reason}")
+
+    def close_idle(self):
+        """Close sites without requests for site_idle_seconds, and any beyond max_open_sites"""
+        with self._lock:
+            evicted = self._evict(max_open=CONFIG['max_open_sites'], idle_seconds=CONFIG['site_idle_seconds'])
+        self._log_closed(evicted, 'after being idle')
+
+    def reconfigure(self):
+        """Close sites that were removed or moved to other files; requests reopen moved ones"""
+        with self._lock:
+            stale = [site for site, database in self._open.items()
+                     if site not in CONFIG['sites'] or database.db_path != site_settings(site)['database']
+                     or database.photos.root != os.path.abspath(site_settings(site)['upload_folder'])]
+            evicted = self._evict(sites=stale)
+        self._log_closed(evicted, 'after a configuration change')
+
+    def open_databases(self):
+        """(site, database) of the default site and every open site"""
+        with self._lock:
+            return [(DEFAULT_SITE, self.default)] + list(self._open.items())
+
+    def status(self):
+        """Per configured site: whether it is open, requests using it and seconds since its last use"""
+        now = time.monotonic()
+        with self._lock:
+            return {site: {'open': site in self._open,
+                           'in_use': self._in_use.get(site, 0),
+                           'idle_seconds': round(now - self._last_used[site]) if site in self._last_used else None}
+                    for site in CONFIG['sites']}
+
+
+class SiteDatabaseProxy:
+    """Stands in for the database of the site the current request is for (the default site otherwise)"""
+
+    def __getattr__(self, name):
+        database = g.get('site_db') if has_request_context() else None
+        return getattr(database or sites.default, name)
+
+
+# Initialize databases: the default site now, other sites when they are first requested
+sites = SiteRegistry(HumidityDatabase(CONFIG['database']))
+db = SiteDatabaseProxy()
+
+
+class SitePrefixMiddleware:
+    """Serve /sites/<site>/<path> with the route for <path>, noting the site in the WSGI environ"""
+
+    PATTERN = re.compile(r'^/sites/([^/]+)(/.*)?$')
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        match = self.PATTERN.match(environ.get('PATH_INFO', ''))
+        if match:
+            environ['garden.site'] = match.group(1)
+            environ['PATH_INFO'] = match.group(2) or '/'
+        return self.wsgi_app(environ, start_response)
+
+
+app.wsgi_app = SitePrefixMiddleware(app.wsgi_app)
+
+
+@app.before_request
+def select_site():
+    """Bind the request to the database of the site in its URL"""
+    site = request.environ.get('garden.site')
+    if site is None:
+        return None
+    if site not in CONFIG['sites']:
+        return jsonify({'error': f'Unknown site: {site}'}), 404
+    try:
+        g.site_db = sites.acquire(site)
+        g.site = site
+    except Exception as e:
+        logger.error(f"Error opening site {site}: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+    return None
+
+
+@app.teardown_request
+def release_site(error):
+    if g.get('site') is not None:
+        sites.release(g.site)
+
+
+@app.context_processor
+def site_context():
+    """Pages of a site link and fetch below its /sites/<site> prefix"""
+    site = g.get('site')
+    return {'site': site, 'site_base': f'/sites/{site}' if site else ''}
+
+
+def _int_field(name, value, optional=False, minimum=None):
+    """An integer reading field; integral floats and numeric strings are converted"""
+    if value is None and optional:
+        return None
+    if isinstance(value, str):
+        try:
+            value = int(value.strip())
+        except ValueError:
+            raise ValueError(f'{name} must be an integer')
+    elif isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, bool) or not isinstance(value, int) or not -2**63 <= value < 2**63:
+        raise ValueError(f'{name} must be an integer')
+    if minimum is not None and value < minimum:
+        raise ValueError(f'{name} must be at least {minimum}')
+    return value
+
+
+def _float_field(name, value):
+    """A finite number; numeric strings are converted"""
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(f'{name} must be a number')
+    try:
+        value = float(value)
+    except ValueError:
+        raise ValueError(f'{name} must be a number')
+    if not math.isfinite(value):
+        raise ValueError(f'{name} must be a finite number')
+    return value
+
+
+def coerce_reading(device_id, item, ts):
+    """Reading dict from an ingest JSON object, every field converted and checked
+
+    Raises ValueError naming the bad field, so an upload is rejected before anything is stored.
+    """
+    if not isinstance(device_id, str) or not device_id:
+        raise ValueError('device_id must be a non-empty string')
+    sensor_id = item.get('sensor_id')
+    if sensor_id is not None and not isinstance(sensor_id, str):
+        raise ValueError('sensor_id must be a string')
+    return {
+        'device_id': device_id,
+        'sensor_id': sensor_id,
+        'sensor_pin': _int_field('sensor_pin', item.get('sensor_pin'), optional=True),
+        'raw_value': _int_field('raw_value', item.get('raw_value')),
+        'humidity_percent': _float_field('humidity_percent', item.get('humidity_percent')),
+        'esp32_timestamp': _int_field('timestamp', item.get('timestamp'), optional=True),
+        'ts': ts,
+    }
 
 
 @app.route('/humidity', methods=['POST'])
@@ -770,7 +3604,7 @@ def receive_humidity_data():
     try:
         data = request.get_json()
 
-        if not data:
+        if not data or not isinstance(data, dict):
             return jsonify({'error': 'No JSON data provided'}), 400
 
         # Validate required fields
@@ -779,24 +3613,37 @@ def receive_humidity_data():
             if field not in data:
                 return jsonify({'error': f'Missing required field: {field}'}), 400
 
-        # Extract sensor information (optional for backward compatibility)
-        sensor_id = data.get('sensor_id')
-        sensor_pin = data.get('sensor_pin')
-
-        # Insert into database
-        db.insert_reading(
-            device_id=data['device_id'],
-            raw_value=data['raw_value'],
-            humidity_percent=data['humidity_percent'],
-            esp32_timestamp=data.get('timestamp'),
-            sensor_id=sensor_id,
-            sensor_pin=sensor_pin
-        )
+        # Sensor information is optional for backward compatibility
+        try:
+            reading = coerce_reading(data['device_id'], data, get_epoch_ms())
+            seq = None if data.get('seq') is None else _int_field('seq', data['seq'], minimum=0)
+        except ValueError as e:
+            logger.warning(f"Invalid reading from {data['device_id']}: {e}")
+            return jsonify({'error': f'Invalid reading: {e}'}), 400
+        sensor_id = reading['sensor_id']
+        sensor_pin = reading['sensor_pin']
+
+        if seq is not None:
+            # Sequenced readings are idempotent: a retried POST is acknowledged but not stored twice
+            inserted, duplicates, high_water = db.insert_sequenced_readings(reading['device_id'],
+                                                                           [{**reading, 'seq': seq}])
+            if duplicates:
+                return jsonify({'status': 'duplicate', 'message': 'Already received', 'high_water': high_water}), 200
+        else:
+            # Insert into database
+            db.insert_reading(
+                device_id=reading['device_id'],
+                raw_value=reading['raw_value'],
+                humidity_percent=reading['humidity_percent'],
+                esp32_timestamp=reading['esp32_timestamp'],
+                sensor_id=sensor_id,
+                sensor_pin=sensor_pin
+            )
 
         # Enhanced logging with sensor information
         sensor_info = f" ({sensor_id} on pin {sensor_pin})" if sensor_id else ""
-        logger.info(f"Received data from {data['device_id']}{sensor_info}: "
-                    f"Raw={data['raw_value']}, Humidity={data['humidity_percent']}%")
+        logger.info(f"Received data from {reading['device_id']}{sensor_info}: "
+                    f"Raw={reading['raw_value']}, Humidity={reading['humidity_percent']}%")
 
         return jsonify({'status': 'success', 'message': 'Data received'}), 200
 
@@ -805,19 +3652,79 @@ def receive_humidity_data():
         return jsonify({'error': 'Internal server error'}), 500
 
 
+@app.route('/humidity/batch', methods=['POST'])
+def receive_humidity_batch():
+    """Catch-up upload: a device flushes its buffered, sequence-numbered readings in one request
+
+    Each reading carries `seq` and `age_ms` (how long ago it was measured, by the
+    device clock). Readings at or below the device's high-water mark are skipped.
+    """
+    try:
+        data = request.get_json(silent=True)
+        if not data or not isinstance(data, dict):
+            return jsonify({'error': 'No JSON data provided'}), 400
+        device_id = data.get('device_id')
+        items = data.get('readings')
+        if not device_id or not isinstance(device_id, str) or not isinstance(items, list):
+            return jsonify({'error': 'device_id and a readings list are required'}), 400
+
+        now_ts = get_epoch_ms()
+        readings = []
+        for item in items:
+            if not isinstance(item, dict):
+                return jsonify({'error': 'Each reading must be a JSON object'}), 400
+            for field in ('seq', 'raw_value', 'humidity_percent'):
+                if field not in item:
+                    return jsonify({'error': f'Missing required field in reading: {field}'}), 400
+            age_ms = _int_field('age_ms', item.get('age_ms', 0), minimum=0)
+            readings.append({
+                **coerce_reading(device_id, item, now_ts - age_ms),
+                'seq': _int_field('seq', item['seq'], minimum=0),
+            })
+
+        inserted, duplicates, high_water = db.insert_sequenced_readings(device_id, readings)
+        logger.info(f"Received batch from {device_id}: {len(inserted)} stored, {duplicates} duplicates, "
+                    f"high water {high_water}")
+        return jsonify({
+            'status': 'success',
+            'accepted': len(inserted),
+            'duplicates': duplicates,
+            'high_water': high_water
+        })
+
+    except (TypeError, ValueError) as e:
+        logger.error(f"Invalid humidity batch: {e}")
+        return jsonify({'error': f'Invalid reading values: {e}'}), 400
+    except Exception as e:
+        logger.error(f"Error processing humidity batch: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+@app.route('/humidity/sequence/<device_id>', methods=['GET'])
+def get_device_sequence(device_id):
+    """Get the device's ingest high-water mark so a rebooted device can resume above it"""
+    return jsonify({
+        'status': 'success',
+        'device_id': device_id,
+        'high_water': db.get_high_water(device_id)
+    })
+
+
 @app.route('/humidity/latest', methods=['GET'])
 def get_latest_humidity():
     """Get latest humidity readings"""
     device_id = request.args.get('device_id')
     sensor_id = request.args.get('sensor_id')
     limit = int(request.args.get('limit', 100))
+    since_ts = request.args.get('since_ts', type=int)
 
     try:
-        readings = db.get_latest_readings(device_id=device_id, sensor_id=sensor_id, limit=limit)
+        readings = db.get_latest_readings(device_id=device_id, sensor_id=sensor_id, limit=limit, since_ts=since_ts)
         return jsonify({
             'status': 'success',
             'count': len(readings),
-            'readings': readings
+            'readings': readings,
+            'cursor': readings_cursor(readings, since_ts)
         })
     except Exception as e:
         logger.error(f"Error retrieving latest readings: {e}")
@@ -826,14 +3733,26 @@ def get_latest_humidity():
 
 @app.route('/humidity/history', methods=['GET'])
 def get_humidity_history():
-    """Get humidity readings from the last N hours with optional sampling"""
+    """Get humidity readings from the last N hours with optional sampling
+
+    With since_ts (the cursor of a previous response) only newer readings are returned.
+    """
     device_id = request.args.get('device_id')
     sensor_id = request.args.get('sensor_id')
     hours = int(request.args.get('hours', 24))
     sample_size = request.args.get('sample_size')
+    since_ts = request.args.get('since_ts', type=int)
 
     try:
-        if sample_size:
+        cursor = None
+        if since_ts is not None:
+            if sample_size:
+                readings, cursor = db.get_sampled_readings_after(since_ts, hours=hours, device_id=device_id,
+                                                                 sensor_id=sensor_id, sample_size=int(sample_size))
+            else:
+                readings = db.get_readings_since(hours=hours, device_id=device_id, sensor_id=sensor_id,
+                                                 after_ts=since_ts)
+        elif sample_size:
             # Use sampled data for better performance
             readings = db.get_sampled_readings_since(
                 hours=hours, 
@@ -850,70 +3769,544 @@ def get_humidity_history():
             'hours': hours,
             'count': len(readings),
             'readings': readings,
-            'sampled': bool(sample_size)
+            'sampled': bool(sample_size),
+            'cursor': readings_cursor(readings, since_ts) if cursor is None else cursor
+        })
+    except Exception as e:
+        logger.error(f"Error retrieving history: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+def summarize_readings(readings, hours, sensor_id=None):
+    """Min/max/avg/current humidity and raw values of newest-first readings (None without readings)"""
+    if not readings:
+        return None
+
+    humidity_values = [r['humidity_percent'] for r in readings]
+    raw_values = [r['raw_value'] for r in readings]
+
+    # Determine current humidity: aggregate across sensors when no specific sensor is requested
+    if sensor_id:
+        # Single sensor: most recent reading
+        current_humidity = humidity_values[0]
+    else:
+        # Aggregate latest reading per sensor
+        latest_per_sensor = {}
+        for r in readings:
+            key = r['sensor_id'] or (f"pin_{r['sensor_pin']}" if r.get('sensor_pin') is not None else 'unknown')
+            if key not in latest_per_sensor:
+                latest_per_sensor[key] = r['humidity_percent']
+        current_humidity = sum(latest_per_sensor.values()) / len(latest_per_sensor)
+
+    return {
+        'period_hours': hours,
+        'total_readings': len(readings),
+        'humidity': {
+            'min': min(humidity_values),
+            'max': max(humidity_values),
+            'avg': sum(humidity_values) / len(humidity_values),
+            'current': current_humidity
+        },
+        'raw_values': {
+            'min': min(raw_values),
+            'max': max(raw_values),
+            'avg': sum(raw_values) / len(raw_values),
+            'current': raw_values[0]
+        }
+    }
+
+
+@app.route('/humidity/stats', methods=['GET'])
+def get_humidity_stats():
+    """Get basic statistics about humidity readings"""
+    device_id = request.args.get('device_id')
+    sensor_id = request.args.get('sensor_id')
+    hours = int(request.args.get('hours', 24))
+
+    try:
+        stats = summarize_readings(db.get_readings_since(hours=hours, device_id=device_id, sensor_id=sensor_id),
+                                   hours, sensor_id)
+
+        if stats is None:
+            return jsonify({
+                'status': 'success',
+                'message': 'No data available for the specified period'
+            })
+
+        return jsonify({'status': 'success', **stats})
+
+    except Exception as e:
+        logger.error(f"Error calculating stats: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+HEATMAP_METRICS = ('avg', 'min', 'max')
+ALIGN_AGGREGATIONS = ('mean', 'min', 'max', 'last')
+ALIGN_FILLS = ('none', 'previous', 'linear')
+
+
+def resample_onto_grid(chunks, sensor_count, start_ts, step_ms, bins, agg='mean', boundaries=None):
+    """Accumulate streamed (sensor, ts, value, weight) chunks into a (sensors, bins) grid
+
+    Chunks may come from raw readings (weight 1) or hourly rollups (value = humidity
+    sum, weight = reading count for 'mean'). Chunks must arrive in ascending time
+    order for agg='last'. Cells are `step_ms` wide from `start_ts`, or run between
+    consecutive `boundaries` (bins + 1 epoch-ms edges) when given. Returns the grid
+    with NaN for empty cells.
+    """
+    size = sensor_count * bins
+    totals = np.zeros(size)
+    counts = np.zeros(size)
+    values = np.full(size, np.nan)
+    if agg == 'min':
+        values[:] = np.inf
+    elif agg == 'max':
+        values[:] = -np.inf
+
+    for sensor, ts, value, weight in chunks:
+        if boundaries is not None:
+            column = np.searchsorted(boundaries, ts, side='right') - 1
+        else:
+            column = (ts - start_ts) // step_ms
+        inside = (sensor >= 0) & (column >= 0) & (column < bins)
+        cell = sensor[inside] * bins + column[inside]
+        value = value[inside]
+        counts += np.bincount(cell, weights=weight[inside] if weight is not None else None, minlength=size)
+        if agg == 'mean':
+            totals += np.bincount(cell, weights=value, minlength=size)
+        elif agg == 'min':
+            np.minimum.at(values, cell, value)
+        elif agg == 'max':
+            np.maximum.at(values, cell, value)
+        elif len(cell):
+            # Last occurrence of each cell in this (time-ordered) chunk
+            unique, first_from_end = np.unique(cell[::-1], return_index=True)
+            values[unique] = value[len(cell) - 1 - first_from_end]
+
+    if agg == 'mean':
+        np.divide(totals, counts, out=values, where=counts > 0)
+    values[counts == 0] = np.nan
+    return values.reshape(sensor_count, bins)
+
+
+def fill_grid(grid, fill):
+    """Fill NaN gaps along each row: 'previous' carries values forward, 'linear' interpolates interior gaps"""
+    if fill == 'none' or not grid.size:
+        return grid
+    bins = grid.shape[1]
+    columns = np.arange(bins)
+    valid = ~np.isnan(grid)
+    rows = np.arange(grid.shape[0])[:, None]
+    previous = np.maximum.accumulate(np.where(valid, columns, -1), axis=1)
+    if fill == 'previous':
+        return np.where(previous >= 0, grid[rows, np.maximum(previous, 0)], np.nan)
+
+    following = np.minimum.accumulate(np.where(valid, columns, bins)[:, ::-1], axis=1)[:, ::-1]
+    interior = ~valid & (previous >= 0) & (following < bins)
+    left = grid[rows, np.maximum(previous, 0)]
+    right = grid[rows, np.minimum(following, bins - 1)]
+    span = np.where(interior, following - previous, 1)
+    interpolated = left + (right - left) * (columns - previous) / span
+    return np.where(interior, interpolated, grid)
+
+
+@app.route('/humidity/aligned', methods=['GET'])
+def get_aligned_humidity():
+    """Get every selected sensor resampled onto one shared time grid"""
+    device_id = request.args.get('device_id')
+    sensor_id = request.args.get('sensor_id')
+    agg = request.args.get('agg', 'mean')
+    fill = request.args.get('fill', 'none')
+    try:
+        hours = float(request.args.get('hours', 24))
+        step_seconds = int(request.args.get('step', 300))
+    except ValueError:
+        return jsonify({'error': 'hours and step must be numbers'}), 400
+    if hours <= 0 or step_seconds <= 0:
+        return jsonify({'error': 'hours and step must be positive'}), 400
+    if agg not in ALIGN_AGGREGATIONS:
+        return jsonify({'error': f"agg must be one of {', '.join(ALIGN_AGGREGATIONS)}"}), 400
+    if fill not in ALIGN_FILLS:
+        return jsonify({'error': f"fill must be one of {', '.join(ALIGN_FILLS)}"}), 400
+
+    step_ms = step_seconds * 1000
+    now_ts = get_epoch_ms()
+    boundaries = None
+    if step_ms % (24 * HOUR_MS) == 0:
+        # Whole-day steps run from local midnight to local midnight, so cells spanning a
+        # DST switch are an hour shorter or longer; the first day is a multiple of the step
+        # so repeated requests line up
+        step_days = step_ms // (24 * HOUR_MS)
+        first_day = datetime.fromtimestamp((now_ts - int(hours * HOUR_MS)) / 1000, ISRAEL_TZ).date()
+        first_day -= timedelta(days=first_day.toordinal() % step_days)
+        today = datetime.fromtimestamp(now_ts / 1000, ISRAEL_TZ).date()
+        bins = (today - first_day).days // step_days + 1
+        if bins > 10000:
+            return jsonify({'error': 'Too many grid points; use a larger step'}), 400
+        boundaries = np.asarray(local_day_starts(first_day, bins * step_days)[::step_days], dtype=np.int64)
+        start_ts = int(boundaries[0])
+    else:
+        # Grid cells are aligned to multiples of the step so repeated requests line up
+        start_ts = (now_ts - int(hours * HOUR_MS)) // step_ms * step_ms
+        bins = -(-(now_ts - start_ts) // step_ms)
+        if bins > 10000:
+            return jsonify({'error': 'Too many grid points; use a larger step'}), 400
+
+    try:
+        if step_ms % HOUR_MS == 0 and agg != 'last':
+            # Hour-multiple steps are answered from the hourly rollups
+            field = {'mean': 'sum', 'min': 'min', 'max': 'max'}[agg]
+            fields = ('count', 'sum') if agg == 'mean' else (field,)
+            sensors, columns = db.get_hourly_rollups(start_ts, fields, device_id=device_id, sensor_id=sensor_id)
+            chunks = [(columns['sensor'], columns['hour_ts'], columns[field],
+                       columns['count'] if agg == 'mean' else None)]
+            source = 'hourly'
+        else:
+            sensors, batches = db.iter_humidity_columns(start_ts - 1, device_id=device_id, sensor_id=sensor_id)
+            chunks = ((sensor, ts, humidity, None) for sensor, ts, humidity in batches)
+            source = 'raw'
+
+        grid = resample_onto_grid(chunks, len(sensors), start_ts, step_ms, bins, agg, boundaries)
+        has_data = ~np.isnan(grid).all(axis=1)
+        grid = fill_grid(grid[has_data], fill)
+        sensors = [sensor for sensor, keep in zip(sensors, has_data) if keep]
+        names = {(config['device_id'], config['sensor_id']): config['display_name']
+                 for config in db.get_all_sensor_configs()}
+
+        values = np.round(grid, 2).astype(object)
+        values[np.isnan(grid)] = None
+        return jsonify({
+            'status': 'success',
+            'source': source,
+            'step': step_seconds,
+            'agg': agg,
+            'fill': fill,
+            'timestamps': (boundaries[:-1] if boundaries is not None else start_ts + np.arange(bins) * step_ms).tolist(),
+            'sensors': [{
+                'device_id': sensor['device_id'],
+                'sensor_id': sensor['sensor_id'],
+                'display_name': names.get((sensor['device_id'], sensor['sensor_id'])) or sensor['sensor_id'],
+                'values': row,
+            } for sensor, row in zip(sensors, values.tolist())]
+        })
+    except Exception as e:
+        logger.error(f"Error building aligned series: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+def build_heatmap(columns, sensor_count, day_starts, metric='avg', resolution='daily'):
+    """Aggregate hourly rollup columns into a dense per-sensor matrix
+
+    Returns an array of shape (sensors, days) for resolution='daily' or
+    (sensors, days, 24) for 'hourly', with NaN where there is no data.
+    Hours are placed by local day and local hour of day: on a DST fall-back day
+    both 01:00 hours share one cell, and on a spring-forward day 02:00 is empty.
+    """
+    days = len(day_starts) - 1
+    day_starts = np.asarray(day_starts, dtype=np.int64)
+    hour_ts = columns['hour_ts']
+    day = np.searchsorted(day_starts, hour_ts, side='right') - 1
+    inside = (day >= 0) & (day < days)
+    day = day[inside]
+    hour = local_hour_of_day(hour_ts[inside])
+    sensor = columns['sensor'][inside]
+
+    cells_per_sensor = days * 24 if resolution == 'hourly' else days
+    cell = sensor * cells_per_sensor + (day * 24 + hour if resolution == 'hourly' else day)
+    size = sensor_count * cells_per_sensor
+    if metric == 'avg':
+        total = np.bincount(cell, weights=columns['sum'][inside], minlength=size)
+        count = np.bincount(cell, weights=columns['count'][inside], minlength=size)
+        values = np.full(size, np.nan)
+        np.divide(total, count, out=values, where=count > 0)
+    else:
+        reduce = np.minimum if metric == 'min' else np.maximum
+        values = np.full(size, np.inf if metric == 'min' else -np.inf)
+        reduce.at(values, cell, columns[metric][inside])
+        values[np.isinf(values)] = np.nan
+
+    shape = (sensor_count, days, 24) if resolution == 'hourly' else (sensor_count, days)
+    return values.reshape(shape)
+
+
+@app.route('/humidity/heatmap', methods=['GET'])
+def get_humidity_heatmap():
+    """Get per-sensor daily or hour-of-day humidity matrices for long periods from hourly rollups"""
+    device_id = request.args.get('device_id')
+    sensor_id = request.args.get('sensor_id')
+    resolution = request.args.get('resolution', 'daily')
+    metric = request.args.get('metric', 'avg')
+    try:
+        days = int(request.args.get('days', 180))
+    except ValueError:
+        return jsonify({'error': 'days must be an integer'}), 400
+    if not 1 <= days <= CONFIG['rollup_retention_days']:
+        return jsonify({'error': f"days must be between 1 and {CONFIG['rollup_retention_days']}"}), 400
+    if resolution not in ('daily', 'hourly'):
+        return jsonify({'error': 'resolution must be daily or hourly'}), 400
+    if metric not in HEATMAP_METRICS:
+        return jsonify({'error': f"metric must be one of {', '.join(HEATMAP_METRICS)}"}), 400
+
+    try:
+        first_day = get_israel_time().date() - timedelta(days=days - 1)
+        day_starts = local_day_starts(first_day, days)
+        fields = ('count', 'sum') if metric == 'avg' else (metric,)
+        # Daily cells only need the hours merged between the UTC hours where local days start
+        split_hours = None
+        if resolution == 'daily':
+            split_hours = {-(-(start % 86400000) // HOUR_MS) % 24 for start in day_starts}
+        sensors, columns = db.get_hourly_rollups(day_starts[0], fields, device_id=device_id, sensor_id=sensor_id,
+                                                 split_hours=split_hours)
+        matrix = build_heatmap(columns, len(sensors), day_starts, metric=metric, resolution=resolution)
+        names = {(config['device_id'], config['sensor_id']): config['display_name']
+                 for config in db.get_all_sensor_configs()}
+
+        # NaN -> None and one decimal keep the JSON payload compact
+        values = np.round(matrix, 1).astype(object)
+        values[np.isnan(matrix)] = None
+        return jsonify({
+            'status': 'success',
+            'resolution': resolution,
+            'metric': metric,
+            'days': [(first_day + timedelta(days=offset)).isoformat() for offset in range(days)],
+            'sensors': [{
+                'device_id': sensor['device_id'],
+                'sensor_id': sensor['sensor_id'],
+                'display_name': names.get((sensor['device_id'], sensor['sensor_id'])) or sensor['sensor_id'],
+            } for sensor in sensors],
+            'values': values.tolist()
         })
     except Exception as e:
-        logger.error(f"Error retrieving history: {e}")
+        logger.error(f"Error building heatmap: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
 
-@app.route('/humidity/stats', methods=['GET'])
-def get_humidity_stats():
-    """Get basic statistics about humidity readings"""
+EXPORT_CSV_HEADER = ['device_id', 'sensor_id', 'sensor_pin', 'ts', 'server_timestamp',
+                     'raw_value', 'humidity_percent', 'esp32_timestamp']
+COLUMNAR_MAGIC = b'GHMC'
+COLUMNAR_VERSION = 1
+
+
+def export_csv(batches):
+    """Encode reading batches as CSV text chunks"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_CSV_HEADER)
+    for rows in batches:
+        for sensor_key, device_id, sensor_id, sensor_pin, ts, raw_value, humidity, esp32_ts in rows:
+            writer.writerow([device_id, sensor_id, sensor_pin, ts, format_epoch_ms(ts),
+                             raw_value, humidity, esp32_ts])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_ndjson(batches):
+    """Encode reading batches as newline-delimited JSON chunks"""
+    for rows in batches:
+        yield ''.join(
+            json.dumps(dict(zip(EXPORT_CSV_HEADER, (device_id, sensor_id, sensor_pin, ts, format_epoch_ms(ts),
+                                                    raw_value, humidity, esp32_ts)))) + '\n'
+            for sensor_key, device_id, sensor_id, sensor_pin, ts, raw_value, humidity, esp32_ts in rows
+        )
+
+
+def export_columnar(batches):
+    """Encode reading batches in a compact little-endian binary columnar format
+
+    Layout:
+        b'GHMC', uint8 version
+        repeated chunks: uint32 row count N (0 terminates), then N-element columns
+            int32 sensor_key, int64 ts (epoch ms UTC), int32 raw_value,
+            float32 humidity_percent, int64 esp32_timestamp (-1 when missing)
+        uint32 footer length, footer JSON {"sensors": {sensor_key: [device_id, sensor_id, sensor_pin]}}
+
+    Each column can be loaded offline with e.g. numpy.frombuffer.
+    """
+    sensors = {}
+    yield COLUMNAR_MAGIC + struct.pack('<B', COLUMNAR_VERSION)
+    for rows in batches:
+        columns = (array('i'), array('q'), array('i'), array('f'), array('q'))
+        for sensor_key, device_id, sensor_id, sensor_pin, ts, raw_value, humidity, esp32_ts in rows:
+            sensors.setdefault(sensor_key, [device_id, sensor_id, sensor_pin])
+            columns[0].append(sensor_key)
+            columns[1].append(ts)
+            columns[2].append(int(raw_value))
+            columns[3].append(humidity)
+            columns[4].append(-1 if esp32_ts is None else int(esp32_ts))
+        if sys.byteorder != 'little':
+            for column in columns:
+                column.byteswap()
+        yield struct.pack('<I', len(rows)) + b''.join(column.tobytes() for column in columns)
+    footer = json.dumps({'sensors': sensors}).encode('utf-8')
+    yield struct.pack('<I', 0) + struct.pack('<I', len(footer)) + footer
+
+
+EXPORT_FORMATS = {
+    'csv': (export_csv, 'text/csv', 'csv'),
+    'ndjson': (export_ndjson, 'application/x-ndjson', 'ndjson'),
+    'columnar': (export_columnar, 'application/octet-stream', 'ghmc'),
+}
+
+
+@app.route('/humidity/export', methods=['GET'])
+def export_humidity():
+    """Stream raw readings as CSV, NDJSON or compact binary columns"""
+    export_format = request.args.get('format', 'csv').lower()
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f"Unsupported format. Use one of: {', '.join(EXPORT_FORMATS)}"}), 400
+
     device_id = request.args.get('device_id')
     sensor_id = request.args.get('sensor_id')
-    hours = int(request.args.get('hours', 24))
+    since_ts = request.args.get('since_ts', type=int)
+    until_ts = request.args.get('until_ts', type=int)
+    hours = request.args.get('hours', type=float)
+    if hours is not None and since_ts is None:
+        since_ts = get_epoch_ms() - int(hours * 3600 * 1000)
 
-    try:
-        readings = db.get_readings_since(hours=hours, device_id=device_id, sensor_id=sensor_id)
+    encoder, mimetype, extension = EXPORT_FORMATS[export_format]
+    batches = db.iter_readings(since_ts=since_ts, until_ts=until_ts, device_id=device_id, sensor_id=sensor_id)
+    filename = f"humidity_export_{datetime.now(ISRAEL_TZ).strftime('%Y%m%d_%H%M%S')}.{extension}"
+    logger.info(f"Streaming {export_format} export (device={device_id}, sensor={sensor_id}, "
+                f"since_ts={since_ts}, until_ts={until_ts})")
+    return Response(encoder(batches), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
 
-        if not readings:
-            return jsonify({
-                'status': 'success',
-                'message': 'No data available for the specified period'
-            })
 
-        humidity_values = [r['humidity_percent'] for r in readings]
-        raw_values = [r['raw_value'] for r in readings]
+def parse_timestamp_ms(value):
+    """Parse epoch milliseconds or an ISO-8601 string into epoch ms
 
-        # Determine current humidity: aggregate across sensors when no specific sensor is requested
-        current_humidity = None
-        if humidity_values:
-            if sensor_id:
-                # Single sensor: most recent reading
-                current_humidity = humidity_values[0]
-            else:
-                # Aggregate latest reading per sensor
-                latest_per_sensor = {}
-                for r in readings:
-                    key = r['sensor_id'] or (f"pin_{r['sensor_pin']}" if r.get('sensor_pin') is not None else 'unknown')
-                    if key not in latest_per_sensor:
-                        latest_per_sensor[key] = r['humidity_percent']
-                if latest_per_sensor:
-                    current_humidity = sum(latest_per_sensor.values()) / len(latest_per_sensor)
-
-        stats = {
-            'status': 'success',
-            'period_hours': hours,
-            'total_readings': len(readings),
-            'humidity': {
-                'min': min(humidity_values),
-                'max': max(humidity_values),
-                'avg': sum(humidity_values) / len(humidity_values),
-                'current': current_humidity
-            },
-            'raw_values': {
-                'min': min(raw_values),
-                'max': max(raw_values),
-                'avg': sum(raw_values) / len(raw_values),
-                'current': raw_values[0] if raw_values else None
-            }
-        }
+    ISO strings without a UTC offset are taken to be in the server timezone.
+    """
+    if not isinstance(value, str) or value.strip().lstrip('-').isdigit():
+        return _int_field('timestamp', value)
+    parsed = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=ISRAEL_TZ)
+    return int(parsed.timestamp() * 1000)
+
+
+def parse_import_record(record):
+    """Normalize one CSV/NDJSON import record into a reading dict
+
+    Accepts the columns written by /humidity/export; NDJSON records arrive as the
+    undecoded line. The timestamp comes from `ts` (epoch ms), falling back to
+    `server_timestamp`, `created_at` or `timestamp`. Fields are checked as on
+    ingest; raises ValueError for records that cannot be imported.
+    """
+    if isinstance(record, str):
+        # Decoded here so a malformed line only rejects itself
+        record = json.loads(record)
+        if not isinstance(record, dict):
+            raise ValueError('record must be a JSON object')
+
+    def optional(key):
+        value = record.get(key)
+        return None if value == '' else value
+
+    device_id, sensor_id = record.get('device_id'), optional('sensor_id')
+    if not device_id:
+        raise ValueError('missing device_id')
+    if not isinstance(device_id, str):
+        raise ValueError('device_id must be a string')
+    if sensor_id is not None and not isinstance(sensor_id, str):
+        raise ValueError('sensor_id must be a string')
+    for key in ('raw_value', 'humidity_percent'):
+        if record.get(key) in (None, ''):
+            raise ValueError(f'missing {key}')
+    timestamp = next((record[key] for key in ('ts', 'server_timestamp', 'created_at', 'timestamp')
+                      if record.get(key) not in (None, '')), None)
+    if timestamp is None:
+        raise ValueError('missing timestamp')
+
+    return {
+        'device_id': device_id,
+        'sensor_id': sensor_id,
+        'sensor_pin': _int_field('sensor_pin', optional('sensor_pin'), optional=True),
+        'raw_value': _int_field('raw_value', record['raw_value']),
+        'humidity_percent': _float_field('humidity_percent', record['humidity_percent']),
+        'esp32_timestamp': _int_field('esp32_timestamp', optional('esp32_timestamp'), optional=True),
+        'ts': parse_timestamp_ms(timestamp),
+    }
+
+
+def iter_import_records(text_stream, import_format):
+    """Yield raw records from a CSV or NDJSON text stream; NDJSON lines are yielded undecoded"""
+    if import_format == 'csv':
+        yield from csv.DictReader(text_stream)
+    else:
+        for line in text_stream:
+            if line.strip():
+                yield line
+
+
+def import_readings(database, records, batch_size=5000):
+    """Load historical readings through batched transactions with dedup
+
+    Returns a summary with inserted/duplicate/rejected counts and throughput.
+    """
+    start_time = time.time()
+    summary = {'rows': 0, 'inserted': 0, 'duplicates': 0, 'rejected': 0, 'errors': []}
+    batch = []
+
+    def flush():
+        inserted = database.insert_readings(batch)
+        summary['inserted'] += len(inserted)
+        summary['duplicates'] += len(batch) - len(inserted)
+        batch.clear()
+
+    for line_number, record in enumerate(records, start=1):
+        summary['rows'] += 1
+        try:
+            batch.append(parse_import_record(record))
+        except (ValueError, TypeError, AttributeError) as e:
+            summary['rejected'] += 1
+            if len(summary['errors']) < 20:
+                summary['errors'].append(f'record {line_number}: {e}')
+            continue
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    elapsed = time.time() - start_time
+    summary['seconds'] = round(elapsed, 3)
+    summary['rows_per_sec'] = round(summary['rows'] / elapsed, 1) if elapsed > 0 else None
+    logger.info(f"Imported {summary['inserted']} readings ({summary['duplicates']} duplicates, "
+                f"{summary['rejected']} rejected) in {elapsed:.2f}s ({summary['rows_per_sec']} rows/sec)")
+    return summary
+
+
+@app.route('/humidity/import', methods=['POST'])
+def import_humidity():
+    """Bulk import historical readings from a CSV or NDJSON body or uploaded file"""
+    try:
+        request.max_content_length = CONFIG['max_readings_import_size']
+        if 'file' in request.files:
+            upload = request.files['file']
+            import_format = request.args.get('format') or \
+                ('ndjson' if upload.filename.lower().endswith(('.ndjson', '.jsonl')) else 'csv')
+            text_stream = io.TextIOWrapper(upload.stream, encoding='utf-8', newline='')
+        else:
+            content_type = request.content_type or ''
+            import_format = request.args.get('format') or ('ndjson' if 'json' in content_type else 'csv')
+            text_stream = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+
+        if import_format not in ('csv', 'ndjson'):
+            return jsonify({'error': 'Unsupported format. Use csv or ndjson'}), 400
 
-        return jsonify(stats)
+        summary = import_readings(db, iter_import_records(text_stream, import_format))
+        return jsonify({'status': 'success', **summary})
 
+    except RequestEntityTooLarge:
+        return jsonify({'error': f"Import too large (max {CONFIG['max_readings_import_size'] // (1024 * 1024)}MB)"}), 413
+    except (ValueError, UnicodeDecodeError) as e:
+        logger.error(f"Error parsing import data: {e}")
+        return jsonify({'error': f'Invalid import data: {e}'}), 400
     except Exception as e:
-        logger.error(f"Error calculating stats: {e}")
+        logger.error(f"Error importing readings: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
 
@@ -926,7 +4319,8 @@ def health_check():
             'status': 'healthy',
             'timestamp': get_israel_timestamp(),
             'service': 'humidity_server',
-            'memory_stats': memory_stats
+            'memory_stats': memory_stats,
+            'read_replica': db.replica.status() if db.replica else db.read_replica
         })
     except Exception as e:
         return jsonify({
@@ -957,20 +4351,100 @@ def memories_page():
     return render_template('memories.html')
 
 
+# Static files the service worker precaches; its cache is named after a hash of their
+# contents, so changing any of them makes browsers install a fresh copy
+SERVICE_WORKER_ASSETS = ('css/dashboard.css', 'js/dashboard.js', 'js/history-worker.js', 'js/offline-store.js',
+                         'js/memories.js', 'manifest.json', 'icons/garden-32.png', 'icons/garden-180.png',
+                         'icons/garden-192.png', 'icons/garden-512.png')
+SERVICE_WORKER_PAGES = ('/', '/dashboard', '/memories')
+SERVICE_WORKER_CDN = ('https://cdn.jsdelivr.net/npm/chart.js',
+                      'https://cdn.jsdelivr.net/npm/chartjs-adapter-date-fns/dist/chartjs-adapter-date-fns.bundle.min.js')
+
+
+def static_assets_version():
+    """Short content hash of the service worker's precached static files"""
+    digest = hashlib.sha256()
+    for asset in SERVICE_WORKER_ASSETS:
+        with open(os.path.join(app.static_folder, asset), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+@app.route('/sw.js')
+def service_worker():
+    """Service worker, served from the root so its scope covers every page"""
+    try:
+        script = render_template('sw.js', version=static_assets_version(),
+                                 assets=[url_for('static', filename=asset) for asset in SERVICE_WORKER_ASSETS],
+                                 pages=SERVICE_WORKER_PAGES, cdn=SERVICE_WORKER_CDN)
+        response = Response(script, mimetype='application/javascript')
+        # Browsers must see a new version as soon as the assets change
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    except Exception as e:
+        logger.error(f"Error serving service worker: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+# Reading fields the dashboard chart uses; bootstrap history is sent as one list per field
+BOOTSTRAP_HISTORY_COLUMNS = ('device_id', 'sensor_id', 'humidity_percent', 'ts')
+
+
+@app.route('/api/dashboard/bootstrap')
+def dashboard_bootstrap():
+    """Everything the dashboard shows on load, read through one database connection
+
+    Takes the dashboard's device_id, sensor_id and hours filters, sample_size for the
+    chart (default 720, as the dashboard asks for) and limit for the recent readings
+    table (default 10). Chart history is sent column-wise to keep the payload small.
+    """
+    device_id = request.args.get('device_id') or None
+    sensor_id = request.args.get('sensor_id') or None
+    hours = request.args.get('hours', 24, type=int)
+    sample_size = request.args.get('sample_size', 720, type=int)
+    limit = request.args.get('limit', 10, type=int)
+
+    try:
+        with db.pinned_connection():
+            sensor_configs = db.get_all_sensor_configs()
+            global_threshold = db.get_global_threshold()
+            devices, sensors = db.get_devices_and_sensors(device_id)
+            stats = summarize_readings(db.get_readings_since(hours=hours, device_id=device_id, sensor_id=sensor_id),
+                                       hours, sensor_id)
+            history = db.get_sampled_readings_since(hours=hours, device_id=device_id, sensor_id=sensor_id,
+                                                    sample_size=sample_size)
+            latest = db.get_latest_readings(device_id=device_id, sensor_id=sensor_id, limit=limit)
+            memory = db.get_latest_memory()
+
+        return jsonify({
+            'status': 'success',
+            'global_threshold': global_threshold,
+            'sensor_configs': sensor_configs,
+            'devices': devices,
+            'sensors': sensors,
+            'stats': stats,
+            'history': {
+                'hours': hours,
+                'count': len(history),
+                'sampled': hours * 360 > sample_size,
+                'cursor': readings_cursor(history),
+                'columns': {column: [reading[column] for reading in history]
+                            for column in BOOTSTRAP_HISTORY_COLUMNS}
+            },
+            'latest': latest,
+            'latest_cursor': readings_cursor(latest),
+            'memory': memory
+        })
+    except Exception as e:
+        logger.error(f"Error building dashboard bootstrap: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
 @app.route('/api/devices')
 def get_devices():
     """Get list of unique device IDs"""
     try:
-        with db.get_connection() as conn:
-            cursor = conn.execute('''
-                SELECT DISTINCT device_id, 
-                       COUNT(*) as reading_count,
-                       MAX(created_at) as last_seen
-                FROM humidity_readings 
-                GROUP BY device_id
-                ORDER BY last_seen DESC
-            ''')
-            devices = [dict(row) for row in cursor.fetchall()]
+        devices = db.get_devices()
         
         return jsonify({
             'status': 'success',
@@ -985,18 +4459,7 @@ def get_devices():
 def get_sensors():
     """Get list of sensors with device information"""
     try:
-        with db.get_connection() as conn:
-            cursor = conn.execute('''
-                SELECT DISTINCT device_id, sensor_id, sensor_pin,
-                       COUNT(*) as reading_count,
-                       MAX(created_at) as last_seen,
-                       AVG(humidity_percent) as avg_humidity
-                FROM humidity_readings 
-                WHERE sensor_id IS NOT NULL
-                GROUP BY device_id, sensor_id, sensor_pin
-                ORDER BY device_id, sensor_id
-            ''')
-            sensors = [dict(row) for row in cursor.fetchall()]
+        sensors = db.get_sensors()
         
         return jsonify({
             'status': 'success',
@@ -1011,18 +4474,9 @@ def get_sensors():
 def get_device_sensors(device_id):
     """Get sensors for a specific device"""
     try:
-        with db.get_connection() as conn:
-            cursor = conn.execute('''
-                SELECT DISTINCT sensor_id, sensor_pin,
-                       COUNT(*) as reading_count,
-                       MAX(created_at) as last_seen,
-                       AVG(humidity_percent) as avg_humidity
-                FROM humidity_readings 
-                WHERE device_id = ? AND sensor_id IS NOT NULL
-                GROUP BY sensor_id, sensor_pin
-                ORDER BY sensor_id
-            ''', (device_id,))
-            sensors = [dict(row) for row in cursor.fetchall()]
+        sensors = db.get_sensors(device_id=device_id)
+        for sensor in sensors:
+            del sensor['device_id']
         
         return jsonify({
             'status': 'success',
@@ -1034,6 +4488,145 @@ def get_device_sensors(device_id):
         return jsonify({'error': 'Internal server error'}), 500
 
 
+def window_slopes(t, y, starts, ends):
+    """Least-squares slope of y over t for each [start, end) index window, via prefix sums
+
+    Windows with fewer than 3 points or no time spread give NaN.
+    """
+    def prefix(values):
+        return np.concatenate(([0.0], np.cumsum(values)))
+
+    # Center t so the prefix sums of t*t keep their precision over long windows
+    t = t - t.mean()
+    s_t, s_y, s_tt, s_ty = prefix(t), prefix(y), prefix(t * t), prefix(t * y)
+    n = (ends - starts).astype(np.float64)
+    sum_t = s_t[ends] - s_t[starts]
+    sum_y = s_y[ends] - s_y[starts]
+    denom = n * (s_tt[ends] - s_tt[starts]) - sum_t ** 2
+    numer = n * (s_ty[ends] - s_ty[starts]) - sum_t * sum_y
+    valid = (n >= 3) & (denom > 1e-9)
+    slopes = np.full(len(n), np.nan)
+    np.divide(numer, denom, out=slopes, where=valid)
+    return slopes
+
+
+def analyze_humidity_series(ts, humidity, threshold, current, slope_window_hours=6.0,
+                            watering_rise=8.0, watering_window_minutes=30.0, max_trend_points=200):
+    """Drying trend, watering events and threshold forecast for one sensor's series
+
+    `ts` is sorted epoch ms, `current` is (ts, humidity) of the newest reading. Returns
+    a dict ready for JSON; slopes are in humidity percentage points per hour.
+    """
+    n = len(ts)
+    t = (ts - ts[0]) / HOUR_MS
+    index = np.arange(n)
+
+    # Rolling slope over the trailing (t - window, t] of every point
+    slopes = window_slopes(t, humidity, np.searchsorted(t, t - slope_window_hours, side='right'), index + 1)
+
+    # Watering shows up as a rise of at least `watering_rise` within the lag window; the lag
+    # is widened to span more than one sample so hourly rollups still compare neighbours
+    spacing = float(np.median(np.diff(t))) if n > 1 else 0.0
+    lag = max(watering_window_minutes / 60.0, 1.5 * spacing)
+    baseline = np.searchsorted(t, t - lag, side='left')
+    rising = (humidity - humidity[baseline]) >= watering_rise
+    edges = np.flatnonzero(rising & ~np.concatenate(([False], rising[:-1])))
+    # One watering can cross the rise threshold repeatedly; merge edges closer than 2 lags
+    if len(edges):
+        edges = edges[np.concatenate(([True], np.diff(t[edges]) > 2 * lag))]
+    ends = np.searchsorted(t, t[edges] + lag, side='right')
+    # reduceat over interleaved (edge, end) indices gives the peak within each event's lag window
+    peaks = (np.maximum.reduceat(np.append(humidity, humidity[-1]), np.column_stack((edges, ends)).ravel())[::2]
+             if len(edges) else np.empty(0))
+    rises = peaks - humidity[baseline[edges]]
+    events = [{'ts': int(ts[i]), 'timestamp': format_epoch_ms(int(ts[i])), 'rise': round(float(rise), 2)}
+              for i, rise in zip(edges, rises)]
+
+    # Drying rate: fit only the points after the last watering settled, within the slope window
+    fit_start_t = t[-1] - slope_window_hours
+    if len(edges):
+        fit_start_t = max(fit_start_t, t[ends[-1] - 1])
+    fit_start = int(np.searchsorted(t, fit_start_t, side='left'))
+    slope = window_slopes(t, humidity, np.array([fit_start]), np.array([n]))[0]
+    if np.isnan(slope):
+        slope = slopes[-1]
+
+    current_ts, current_humidity = current
+    hours_until = None
+    if threshold is not None:
+        if current_humidity <= threshold:
+            hours_until = 0.0
+        elif not np.isnan(slope) and slope < 0:
+            hours_until = (current_humidity - threshold) / -slope
+
+    step = max(1, -(-n // max_trend_points))
+    trend_index = index[::step]
+    trend = [None if np.isnan(value) else round(float(value), 3) for value in slopes[trend_index]]
+
+    return {
+        'points': n,
+        'current_humidity': current_humidity,
+        'current_timestamp': format_epoch_ms(current_ts),
+        'threshold': threshold,
+        'slope_per_hour': None if np.isnan(slope) else round(float(slope), 4),
+        'drying_rate_per_day': None if np.isnan(slope) else round(float(-slope * 24), 2),
+        'hours_until_threshold': None if hours_until is None else round(float(hours_until), 1),
+        'predicted_crossing': (None if hours_until is None else
+                               format_epoch_ms(current_ts + int(hours_until * HOUR_MS))),
+        'last_watered': events[-1]['timestamp'] if events else None,
+        'watering_events': events,
+        'trend': {'ts': ts[trend_index].tolist(), 'slope_per_hour': trend},
+    }
+
+
+@app.route('/api/analytics')
+def get_analytics():
+    """Get per-sensor drying rate, watering events and time until the humidity threshold"""
+    device_id = request.args.get('device_id')
+    sensor_id = request.args.get('sensor_id')
+
+    try:
+        hours = float(request.args.get('hours', 72))
+        window_hours = float(request.args.get('window_hours', 6))
+        watering_rise = float(request.args.get('watering_rise', 8))
+    except ValueError:
+        return jsonify({'error': 'hours, window_hours and watering_rise must be numbers'}), 400
+    if hours <= 0 or window_hours <= 0 or watering_rise <= 0:
+        return jsonify({'error': 'hours, window_hours and watering_rise must be positive'}), 400
+
+    try:
+        source, series = db.get_analytics_series(hours=hours, device_id=device_id, sensor_id=sensor_id)
+        configs = {(config['device_id'], config['sensor_id']): config for config in db.get_all_sensor_configs()}
+        global_threshold = db.get_global_threshold()
+
+        sensors = []
+        for item in series:
+            config = configs.get((item['device_id'], item['sensor_id']), {})
+            threshold = config.get('humidity_threshold')
+            analysis = analyze_humidity_series(
+                item['ts'], item['humidity'],
+                threshold if threshold is not None else global_threshold,
+                (item['last_ts'], item['last_humidity']),
+                slope_window_hours=window_hours, watering_rise=watering_rise)
+            sensors.append({
+                'device_id': item['device_id'],
+                'sensor_id': item['sensor_id'],
+                'display_name': config.get('display_name') or item['sensor_id'],
+                **analysis,
+            })
+
+        return jsonify({
+            'status': 'success',
+            'hours': hours,
+            'source': source,
+            'window_hours': window_hours,
+            'sensors': sensors
+        })
+    except Exception as e:
+        logger.error(f"Error computing analytics: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
 @app.route('/api/sensor-config', methods=['GET'])
 def get_sensor_configs():
     """Get all sensor configurations with thresholds and alert states"""
@@ -1124,6 +4717,159 @@ def toggle_sensor_alerts(device_id, sensor_id):
         return jsonify({'error': 'Internal server error'}), 500
 
 
+@app.route('/api/health/sensors', methods=['GET'])
+def get_sensor_health():
+    """Get per-sensor health: offline, stuck or pinned raw values, and gaps in readings"""
+    try:
+        sensors = db.health.snapshot()
+        return jsonify({
+            'status': 'success',
+            'unhealthy': sum(1 for sensor in sensors if sensor['status'] != 'ok'),
+            'sensors': sensors
+        })
+    except Exception as e:
+        logger.error(f"Error getting sensor health: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+@app.route('/api/alerts', methods=['GET'])
+def get_alert_states():
+    """Get the streaming alert state (smoothed humidity, trend, arming) of every sensor"""
+    try:
+        return jsonify({
+            'status': 'success',
+            'sensors': db.alerts.snapshot()
+        })
+    except Exception as e:
+        logger.error(f"Error getting alert states: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+@app.route('/api/admin/queries', methods=['GET'])
+def get_query_profile():
+    """Get the top-N profiled SQL statements by total, worst or average time"""
+    sort = request.args.get('sort', 'total_ms')
+    try:
+        limit = int(request.args.get('limit', 20))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    if sort not in QueryProfiler.SORT_KEYS:
+        return jsonify({'error': f"sort must be one of {', '.join(QueryProfiler.SORT_KEYS)}"}), 400
+
+    try:
+        return jsonify({
+            'status': 'success',
+            'enabled': db.profiler.enabled,
+            'threshold_ms': db.profiler.threshold_ms,
+            'since': format_epoch_ms(db.profiler.since),
+            'queries': db.profiler.top(limit, sort)
+        })
+    except Exception as e:
+        logger.error(f"Error getting query profile: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+@app.route('/api/admin/queries', methods=['POST'])
+def configure_query_profile():
+    """Turn query profiling on or off, change the slow-query threshold, or reset the statistics"""
+    data = request.get_json(silent=True) or {}
+    try:
+        threshold_ms = float(data.get('threshold_ms', db.profiler.threshold_ms))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'threshold_ms must be a number'}), 400
+
+    db.profiler.threshold_ms = threshold_ms
+    if 'enabled' in data:
+        db.profiler.enabled = bool(data['enabled'])
+    if data.get('reset'):
+        db.profiler.reset()
+    logger.info(f"Query profiling {'enabled' if db.profiler.enabled else 'disabled'}, "
+                f"slow query threshold {threshold_ms} ms")
+    return jsonify({
+        'status': 'success',
+        'enabled': db.profiler.enabled,
+        'threshold_ms': db.profiler.threshold_ms
+    })
+
+
+def config_for_json(config):
+    """Settings in JSON-friendly form: sets as sorted lists, log level by name"""
+    values = dict(config)
+    values['allowed_extensions'] = sorted(config['allowed_extensions'])
+    values['log_level'] = logging.getLevelName(config['log_level'])
+    return values
+
+
+@app.route('/api/admin/config', methods=['GET'])
+def get_config():
+    """Get the effective settings and the outcome of the last reload"""
+    try:
+        return jsonify({
+            'status': 'success',
+            'config_file': config_path or os.environ.get(CONFIG_FILE_ENV) or
+                           (DEFAULT_CONFIG_FILE if os.path.exists(DEFAULT_CONFIG_FILE) else None),
+            'config': config_for_json(CONFIG),
+            'restart_required': list(RESTART_REQUIRED_SETTINGS),
+            'last_reload': last_config_reload
+        })
+    except Exception as e:
+        logger.error(f"Error getting config: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+@app.route('/api/admin/config/reload', methods=['POST'])
+def reload_config_endpoint():
+    """Reload the configuration now, as SIGHUP does"""
+    ok, result = reload_config()
+    if not ok:
+        return jsonify({'error': result}), 400
+    return jsonify({'status': 'success', 'changed': result})
+
+
+@app.route('/api/admin/sites', methods=['GET'])
+def get_sites():
+    """Get the configured sites with their storage, retention and whether they are open"""
+    try:
+        status = sites.status()
+        return jsonify({
+            'status': 'success',
+            'max_open_sites': CONFIG['max_open_sites'],
+            'site_idle_seconds': CONFIG['site_idle_seconds'],
+            'sites': [{'site': site, 'path': f'/sites/{site}/', **site_settings(site), **status[site]}
+                      for site in CONFIG['sites']]
+        })
+    except Exception as e:
+        logger.error(f"Error getting sites: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+@app.route('/api/admin/jobs', methods=['GET'])
+def get_scheduled_jobs():
+    """Get every maintenance job with its schedule, next run and last outcome"""
+    try:
+        return jsonify({
+            'status': 'success',
+            'scheduler_running': scheduler.running,
+            'jobs': scheduler.snapshot()
+        })
+    except Exception as e:
+        logger.error(f"Error getting scheduled jobs: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+@app.route('/api/admin/jobs/<name>/run', methods=['POST'])
+def run_scheduled_job(name):
+    """Run a maintenance job now, in the scheduler thread"""
+    if name not in scheduler.jobs:
+        return jsonify({'error': f'Unknown job: {name}'}), 404
+    if not scheduler.running:
+        return jsonify({'error': 'Scheduler is not running'}), 503
+    if not scheduler.trigger(name):
+        return jsonify({'error': f'Job {name} is already running'}), 409
+    logger.info(f"Job {name} triggered manually")
+    return jsonify({'status': 'accepted', 'job': name}), 202
+
+
 @app.route('/api/memories', methods=['GET'])
 def get_memories():
     """Get memories - latest one or all"""
@@ -1246,42 +4992,23 @@ def add_memory():
                 resize_time = time.time() - resize_start_time
                 logger.info(f"Image resized successfully - New size: {len(resized_photo)} bytes, Time: {resize_time:.3f}s")
                 
-                # Generate unique filename
-                photo_filename = generate_photo_filename(photo_file.filename)
-                photo_path = os.path.join(CONFIG['upload_folder'], photo_filename)
-                logger.info(f"Generated photo filename: {photo_filename}, Path: {photo_path}")
-                
-                # Ensure upload directory exists
-                os.makedirs(CONFIG['upload_folder'], exist_ok=True)
-                logger.info(f"Upload directory verified: {CONFIG['upload_folder']}")
-                
-                # Save resized photo
-                save_start_time = time.time()
-                logger.info("Starting file write process")
-                with open(photo_path, 'wb') as f:
-                    f.write(resized_photo)
-                save_time = time.time() - save_start_time
-                logger.info(f"Photo file written successfully: {photo_filename}, Time: {save_time:.3f}s")
-                
-                # Verify file was saved
-                if os.path.exists(photo_path):
-                    file_size = os.path.getsize(photo_path)
-                    logger.info(f"Photo file verified on disk - Size: {file_size} bytes")
-                else:
-                    logger.error(f"Photo file not found after saving: {photo_path}")
-                    return jsonify({'error': 'Failed to save photo file'}), 500
-                
+                photo_ext = photo_extension(photo_file.filename, photo_data, resized_photo)
+
                 photo_total_time = time.time() - photo_start_time
-                logger.info(f"Total photo processing time: {photo_total_time:.3f}s (Read: {read_time:.3f}s, Resize: {resize_time:.3f}s, Save: {save_time:.3f}s)")
+                logger.info(f"Total photo processing time: {photo_total_time:.3f}s (Read: {read_time:.3f}s, Resize: {resize_time:.3f}s)")
                 
             except Exception as e:
                 logger.error(f"Error processing photo: {e}", exc_info=True)
                 return jsonify({'error': 'Failed to process photo'}), 500
         
-        # Add memory to database
+        # Store the photo and add the memory under the photo lock, so the shared file
+        # cannot be swept or released in between
         db_start_time = time.time()
-        logger.info("Starting database insertion")
-        memory_id = db.add_memory(user_name, memory_text, photo_filename)
+        with db.photos.lock:
+            if photo_file:
+                photo_filename, created = db.photos.store(resized_photo, photo_ext)
+                logger.info(f"Photo {'stored' if created else 'already stored'}: {photo_filename}")
+            memory_id = db.add_memory(user_name, memory_text, photo_filename)
         db_time = time.time() - db_start_time
         logger.info(f"Memory inserted into database successfully - ID: {memory_id}, Time: {db_time:.3f}s")
         
@@ -1302,12 +5029,10 @@ def add_memory():
         total_time = time.time() - start_time
         logger.error(f"Error adding memory after {total_time:.3f}s: {e}", exc_info=True)
         
-        # If there was a photo file that was partially processed, try to clean it up
+        # If the photo was stored but no memory refers to it, clean it up
         if 'photo_filename' in locals() and photo_filename:
             try:
-                photo_path = os.path.join(CONFIG['upload_folder'], photo_filename)
-                if os.path.exists(photo_path):
-                    os.remove(photo_path)
+                if db.release_photo(photo_filename):
                     logger.info(f"Cleaned up partially processed photo: {photo_filename}")
             except Exception as cleanup_error:
                 logger.error(f"Failed to cleanup photo file {photo_filename}: {cleanup_error}")
@@ -1315,6 +5040,44 @@ def add_memory():
         return jsonify({'error': 'Internal server error'}), 500
 
 
+@app.route('/api/memories/import', methods=['POST'])
+def import_memories_upload():
+    """Add one memory per photo of a multipart batch or zip archive, streaming NDJSON progress"""
+    try:
+        request.max_content_length = CONFIG['max_import_size']
+        uploads = [detach_upload(upload) for upload in request.files.getlist('photos') + request.files.getlist('archive')
+                   if upload.filename]
+        user_name = request.form.get('user_name', '').strip()
+        memory_text = request.form.get('memory_text', '').strip()
+        rotation = request.form.get('rotation', type=int)
+        if rotation not in (None, 0, 90, 180, 270):
+            logger.warning(f"Invalid rotation value: {rotation}, ignoring")
+            rotation = None
+
+        error = None
+        if not user_name:
+            error = 'user_name is required'
+        elif not uploads:
+            error = 'No photos provided (use photos or archive fields)'
+        elif len(memory_text) > 1000:
+            error = 'Memory text too long (max 1000 characters)'
+        if error:
+            for _, stream in uploads:
+                stream.close()
+            return jsonify({'error': error}), 400
+
+        logger.info(f"Memories import from {user_name}: {len(uploads)} uploads")
+        records = import_memories(db, iter_import_photos(uploads), user_name, memory_text, rotation)
+        return Response(stream_with_context(json.dumps(record) + '\n' for record in records),
+                        mimetype='application/x-ndjson')
+
+    except RequestEntityTooLarge:
+        return jsonify({'error': f"Import too large (max {CONFIG['max_import_size'] // (1024 * 1024)}MB)"}), 413
+    except Exception as e:
+        logger.error(f"Error importing memories: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
 @app.route('/api/memories/<int:memory_id>', methods=['DELETE'])
 def delete_memory(memory_id):
     """Delete a memory by ID"""
@@ -1347,11 +5110,16 @@ def serve_photo(filename):
         if secure_name != filename:
             return jsonify({'error': 'Invalid filename'}), 400
         
-        photo_path = os.path.join(CONFIG['upload_folder'], secure_name)
+        photo_path = db.photos.path(secure_name)
         
         if not os.path.exists(photo_path):
             return jsonify({'error': 'Photo not found'}), 404
         
+        # Content-addressed photos never change, so browsers may cache them for good
+        if PhotoStore.NAME_PATTERN.match(secure_name):
+            response = send_file(photo_path, max_age=31536000)
+            response.cache_control.immutable = True
+            return response
         return send_file(photo_path)
         
     except Exception as e:
@@ -1359,25 +5127,270 @@ def serve_photo(filename):
         return jsonify({'error': 'Internal server error'}), 500
 
 
-def cleanup_task():
-    """Background task to cleanup old data"""
+def each_site():
+    """Yield (site, database) for the default site and every configured one, opening closed sites
+
+    A site is kept open while the job works on it; each site keeps its own retention.
+    """
+    yield DEFAULT_SITE, sites.default
+    for site in list(CONFIG['sites']):
+        with sites.using(site) as database:
+            yield site, database
+
+
+def site_label(site, name):
+    return name if site == DEFAULT_SITE else f"{site}:{name}"
+
+
+def cleanup_job():
+    """Drop expired reading partitions one per slice (memories are preserved forever)"""
+    dropped = []
+    for site, database in each_site():
+        for partition in database.expired_partitions(site_settings(site)['cleanup_days']):
+            database.drop_partitions([partition])
+            dropped.append(site_label(site, partition))
+            yield
+    return f"Dropped {len(dropped)} expired reading partitions {dropped}"
+
+
+def trim_rollups_job():
+    """Delete hourly rollups past their retention, one sensor per slice"""
+    deleted = 0
+    for site, database in each_site():
+        cutoff_ts = get_epoch_ms() - site_settings(site)['rollup_retention_days'] * 86400 * 1000
+        for sensor_key in database.get_sensor_keys():
+            deleted += database.trim_rollups(cutoff_ts, sensor_key)
+            yield
+    return f"Deleted {deleted} expired hourly rollups"
+
+
+def optimize_job():
+    """Refresh query planner statistics one table per slice, then run PRAGMA optimize"""
+    analyzed = 0
+    for site, database in each_site():
+        for table in database.maintenance_tables():
+            database.analyze_table(table)
+            analyzed += 1
+            yield
+        database.optimize()
+    return f"Analyzed {analyzed} tables"
+
+
+def wal_checkpoint_job():
+    """Copy committed WAL pages back into the database without waiting for readers or writers
+
+    Only open sites are checkpointed: SQLite checkpoints a closed site's WAL when its
+    last connection closes.
+    """
+    results = [result for site, database in sites.open_databases()
+               if (result := database.checkpoint_wal()) is not None]
+    if not results:
+        return 'Not in WAL mode'
+    busy = any(result[0] for result in results)
+    wal_pages = sum(result[1] for result in results)
+    checkpointed = sum(result[2] for result in results)
+    return f"Checkpointed {checkpointed} of {wal_pages} WAL pages" + (' (busy)' if busy else '')
+
+
+def photo_sweep_job():
+    """Reconcile each site's photo store with its memories table, a batch of files per slice
+
+    Files no memory refers to (and leftover temporary files) are deleted once older
+    than the grace period; memories whose photo file is missing are reported.
+    """
+    removed = 0
+    missing_total = 0
+    for site, database in each_site():
+        referenced = database.get_photo_filenames()
+        cutoff = time.time() - CONFIG['photo_sweep_grace_minutes'] * 60
+        on_disk = set()
+        for index, (name, path, mtime) in enumerate(database.photos.iter_files(), 1):
+            on_disk.add(name)
+            if name not in referenced and mtime < cutoff:
+                # Re-checked under the lock: the file may have been reused by a new memory meanwhile
+                if name.endswith('.tmp'):
+                    os.remove(path)
+                    removed += 1
+                elif database.release_photo(name):
+                    removed += 1
+                    logger.info(f"Removed orphaned photo {site_label(site, name)}")
+            if index % 200 == 0:
+                yield
+        missing = referenced - on_disk
+        if missing:
+            logger.warning(f"{len(missing)} memories of site {site} refer to missing photos: {sorted(missing)[:10]}")
+        missing_total += len(missing)
+    return f"Removed {removed} orphaned photos; {missing_total} referenced photos missing"
+
+
+SCHEDULED_JOBS = {
+    'cleanup': cleanup_job,
+    'trim_rollups': trim_rollups_job,
+    'optimize': optimize_job,
+    'wal_checkpoint': wal_checkpoint_job,
+    'photo_sweep': photo_sweep_job,
+}
+
+# Job runs are recorded in the default site's database
+scheduler = JobScheduler(sites.default, CONFIG['job_duty_cycle'])
+for job_name, (job_cron, job_jitter) in CONFIG['schedules'].items():
+    scheduler.add(job_name, SCHEDULED_JOBS[job_name], job_cron, job_jitter)
+
+
+def health_monitor_task():
+    """Background task that re-evaluates sensor health of the open sites and closes idle ones"""
     while True:
         try:
-            time.sleep(86400)  # Run every 24 hours
-            deleted = db.cleanup_old_data(CONFIG['cleanup_days'])
-            logger.info(f"Cleaned up {deleted} old sensor readings (memories preserved forever)")
+            time.sleep(CONFIG['health_check_seconds'])
+            for site, database in sites.open_databases():
+                database.health.check()
+            sites.close_idle()
         except Exception as e:
-            logger.error(f"Error during cleanup: {e}")
+            logger.error(f"Error during sensor health check: {e}")
+
+
+config_lock = threading.Lock()
+last_config_reload = {'at': None, 'status': None, 'changed': [], 'error': None}
+
+
+def set_log_level(level):
+    logger.setLevel(level)
+    rotating_handler.setLevel(level)
+    stream_handler.setLevel(level)
+
+
+def apply_config_changes(changed):
+    """Push changed settings into the components that copied them at startup
+
+    Everything else (retention, alert tuning, photo settings, health checks, the webhook)
+    reads CONFIG when it is used and picks up the new values by itself.
+    """
+    if 'log_level' in changed:
+        set_log_level(CONFIG['log_level'])
+    if 'max_file_size' in changed:
+        app.config['MAX_CONTENT_LENGTH'] = CONFIG['max_file_size']
+    if 'sites' in changed or 'sites_folder' in changed:
+        sites.reconfigure()
+    for site, database in sites.open_databases():
+        if 'recent_buffer_points' in changed:
+            grew = CONFIG['recent_buffer_points'] > database.recent.capacity
+            database.recent.resize(CONFIG['recent_buffer_points'])
+            if grew:
+                # Refill the larger rings from the database; readings ingested meanwhile are kept
+                threading.Thread(target=database.warm_recent_cache, name='recent-cache-warm', daemon=True).start()
+        if 'query_profiling' in changed:
+            database.profiler.enabled = CONFIG['query_profiling']
+        if 'slow_query_ms' in changed:
+            database.profiler.threshold_ms = CONFIG['slow_query_ms']
+        if database.replica:
+            database.replica.refresh_seconds = CONFIG['replica_refresh_seconds']
+            database.replica.max_staleness_seconds = CONFIG['replica_max_staleness_seconds']
+    if 'job_duty_cycle' in changed:
+        scheduler.duty_cycle = CONFIG['job_duty_cycle']
+    if 'telegram_chat_id' in changed or 'telegram_sender' in changed:
+        alert_dispatcher.chat_id = CONFIG['telegram_chat_id']
+        alert_dispatcher.sender = CONFIG['telegram_sender']
+
+
+def reload_config():
+    """Re-read the config file and environment (keeping --set overrides) and apply what changed
+
+    Invalid configuration is rejected as a whole and the running settings are kept.
+    Ingest is never paused: settings are swapped one by one while requests continue.
+    Returns (ok, changed settings or error message).
+    """
+    with config_lock:
+        try:
+            new_config = load_config(config_path, config_overrides)
+            # Parse cron expressions before anything is applied
+            schedules = {name: CronSchedule(cron) for name, (cron, jitter) in new_config['schedules'].items()}
+        except ValueError as e:
+            logger.error(f"Config reload failed, keeping the current settings: {e}")
+            last_config_reload.update(at=get_israel_timestamp(), status='error', changed=[], error=str(e))
+            return False, str(e)
+
+        changed = sorted(key for key in new_config if new_config[key] != CONFIG[key])
+        for key in changed:
+            if key in RESTART_REQUIRED_SETTINGS:
+                logger.warning(f"Setting {key} changed to {new_config[key]!r}; it takes effect after a restart")
+                new_config[key] = CONFIG[key]
+        changed = [key for key in changed if key not in RESTART_REQUIRED_SETTINGS]
+
+        CONFIG.update(new_config)
+        apply_config_changes(changed)
+        if 'schedules' in changed:
+            for name, (cron, jitter) in CONFIG['schedules'].items():
+                if name in scheduler.jobs:
+                    scheduler.reschedule(name, schedules[name], jitter)
+
+        logger.info(f"Config reloaded: {', '.join(changed) if changed else 'no changes'}")
+        last_config_reload.update(at=get_israel_timestamp(), status='ok', changed=changed, error=None)
+        return True, changed
+
+
+def handle_sighup(signum, frame):
+    """Reload the configuration in a thread; the handler itself may interrupt code holding the logging lock"""
+    threading.Thread(target=reload_config, name='config-reload', daemon=True).start()
+
+
+def run_import_command(args):
+    """Import historical readings from a file into the database of a site"""
+    if args.site != DEFAULT_SITE and args.site not in CONFIG['sites']:
+        sys.exit(f"Unknown site {args.site!r}; configured sites: {', '.join(CONFIG['sites']) or 'none'}")
+    import_format = args.format or ('ndjson' if args.file.lower().endswith(('.ndjson', '.jsonl')) else 'csv')
+    with open(args.file, newline='', encoding='utf-8') as f, sites.using(args.site) as database:
+        summary = import_readings(database, iter_import_records(f, import_format), batch_size=args.batch_size)
+    print(f"Read {summary['rows']} rows: {summary['inserted']} inserted, {summary['duplicates']} duplicates, "
+          f"{summary['rejected']} rejected in {summary['seconds']}s ({summary['rows_per_sec']} rows/sec)")
+    for error in summary['errors']:
+        print(f"  {error}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Garden humidity monitoring server')
+    add_config_arguments(parser)
+    parser.add_argument('--profile-queries', action='store_true',
+                        help='Time every SQL statement and log slow ones (see /api/admin/queries)')
+    subparsers = parser.add_subparsers(dest='command')
+    import_parser = subparsers.add_parser('import', help='Bulk import historical readings from CSV/NDJSON')
+    import_parser.add_argument('file', help='CSV or NDJSON file (same columns as /humidity/export)')
+    import_parser.add_argument('--format', choices=['csv', 'ndjson'], help='Input format (default: by extension)')
+    import_parser.add_argument('--batch-size', type=int, default=5000, help='Rows per transaction')
+    import_parser.add_argument('--site', default=DEFAULT_SITE, help='Site to import into (default: the default site)')
+    return parser.parse_args()
 
 
 if __name__ == '__main__':
+    args = parse_args()
+    if args.command == 'import':
+        run_import_command(args)
+        sys.exit(0)
+    if args.profile_queries:
+        # Also for sites opened later, and kept across config reloads
+        config_overrides['query_profiling'] = CONFIG['query_profiling'] = True
+        sites.default.profiler.enabled = True
+
     logger.info(f"Starting humidity server on {CONFIG['host']}:{CONFIG['port']}")
     logger.info(f"Database: {CONFIG['database']}")
+    if CONFIG['sites']:
+        logger.info(f"Sites: {', '.join(CONFIG['sites'])} (under /sites/<site>/)")
     logger.info(f"Log file: {CONFIG['log_file']}")
+    if config_path or os.environ.get(CONFIG_FILE_ENV) or os.path.exists(DEFAULT_CONFIG_FILE):
+        logger.info(f"Config file: {config_path or os.environ.get(CONFIG_FILE_ENV) or DEFAULT_CONFIG_FILE}")
+
+    # Re-read the configuration on SIGHUP (kill -HUP <pid>)
+    if hasattr(signal, 'SIGHUP'):
+        signal.signal(signal.SIGHUP, handle_sighup)
+
+    # Fork the photo import workers while the server is still single-threaded
+    start_import_pool()
+
+    # Start the maintenance job scheduler (cleanup, rollup trimming, optimize, WAL checkpoints, photo sweep)
+    scheduler.start()
 
-    # Start cleanup thread
-    cleanup_thread = threading.Thread(target=cleanup_task, daemon=True)
-    cleanup_thread.start()
+    # Start sensor health monitor thread
+    health_thread = threading.Thread(target=health_monitor_task, daemon=True)
+    health_thread.start()
 
     # Run Flask app
     app.run(
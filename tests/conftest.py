@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope='session')
+def server(tmp_path_factory):
+    """server.py, imported from a scratch directory
+
+    It creates its log file, upload folder and default database in the cwd on import.
+    """
+    os.chdir(tmp_path_factory.mktemp('server'))
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    import server
+    return server
+
+
+@pytest.fixture
+def client(server):
+    return server.app.test_client()
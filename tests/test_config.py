@@ -0,0 +1,34 @@
+import logging
+import os
+import subprocess
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_unknown_environment_variable_is_ignored(server, caplog):
+    with caplog.at_level(logging.WARNING):
+        config = server.load_config(environ={'GARDEN_PORTT': '6000', 'GARDEN_PORT': '6001'})
+    assert config['port'] == 6001
+    assert 'portt' not in config
+    assert 'GARDEN_PORTT' in caplog.text
+
+
+def test_invalid_value_of_a_known_setting_is_still_an_error(server):
+    with pytest.raises(server.ConfigError, match='port'):
+        server.load_config(environ={'GARDEN_PORT': 'eighty'})
+
+
+def test_unknown_setting_in_file_or_overrides_is_still_an_error(server):
+    with pytest.raises(server.ConfigError, match='portt'):
+        server.load_config(overrides={'portt': 6000}, environ={})
+
+
+def test_server_imports_with_a_stray_environment_variable(tmp_path):
+    env = {'PATH': '', 'GARDEN_UNRELATED_TOKEN': 'x'}
+    result = subprocess.run([sys.executable, '-c', f'import sys; sys.path.insert(0, {REPO_ROOT!r}); import server'],
+                            cwd=tmp_path, env=env, capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    assert 'GARDEN_UNRELATED_TOKEN' in result.stderr
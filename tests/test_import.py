@@ -0,0 +1,65 @@
+import io
+import json
+
+HEADER = 'device_id,sensor_id,sensor_pin,ts,server_timestamp,raw_value,humidity_percent,esp32_timestamp\n'
+START_TS = 1_700_000_000_000
+
+
+def readings_csv(device_id, min_bytes):
+    """CSV in the export format, one reading every 10 seconds, at least min_bytes long"""
+    lines = [HEADER]
+    size = len(HEADER)
+    ts = START_TS
+    while size < min_bytes:
+        line = f'{device_id},bed_1,32,{ts},,2000,50.5,\n'
+        lines.append(line)
+        size += len(line)
+        ts += 10_000
+    return ''.join(lines).encode(), len(lines) - 1
+
+
+def test_import_body_larger_than_max_file_size(server, client):
+    body, rows = readings_csv('import-body-' + 'x' * 40, server.CONFIG['max_file_size'] + 1024 * 1024)
+    response = client.post('/humidity/import', data=body, content_type='text/csv')
+    assert response.status_code == 200
+    assert response.get_json()['inserted'] == rows
+
+
+def test_import_file_larger_than_max_file_size(server, client):
+    body, rows = readings_csv('import-file-' + 'x' * 40, server.CONFIG['max_file_size'] + 1024 * 1024)
+    response = client.post('/humidity/import', data={'file': (io.BytesIO(body), 'readings.csv')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 200
+    assert response.get_json()['inserted'] == rows
+
+
+def test_import_over_limit_is_rejected(server, client, monkeypatch):
+    monkeypatch.setitem(server.CONFIG, 'max_readings_import_size', 1024 * 1024)
+    body, _ = readings_csv('import-too-large', 2 * 1024 * 1024)
+    response = client.post('/humidity/import', data=body, content_type='text/csv')
+    assert response.status_code == 413
+
+
+def test_malformed_ndjson_line_is_rejected_alone(server, client):
+    lines = [json.dumps({'device_id': 'import-ndjson-garbage', 'sensor_id': 'bed_1', 'ts': START_TS + i * 10_000,
+                         'raw_value': 2000, 'humidity_percent': 50.5}) for i in range(20_000)]
+    lines[10_000:10_000] = ['garbage', '[1, 2]']
+    lines.append('{"device_id": "import-ndjson-garbage", "truncated')
+    response = client.post('/humidity/import', data='\n'.join(lines), content_type='application/x-ndjson')
+    assert response.status_code == 200
+    summary = response.get_json()
+    assert (summary['rows'], summary['inserted'], summary['rejected']) == (20_003, 20_000, 3)
+    assert summary['errors'][0].startswith('record 10001:')
+
+
+def test_invalid_field_values_are_rejected(server, client):
+    reading = {'device_id': 'import-invalid', 'sensor_id': 'bed_1', 'ts': START_TS,
+               'raw_value': 2000, 'humidity_percent': 50.5}
+    bad = [{'humidity_percent': float('nan')}, {'humidity_percent': 'wet'}, {'raw_value': True},
+           {'raw_value': 20.5}, {'sensor_pin': 'x'}, {'ts': True}, {'ts': [1]}, {'device_id': 7},
+           {'sensor_id': 7}]
+    body = '\n'.join(json.dumps({**reading, **fields}) for fields in bad)
+    response = client.post('/humidity/import', data=body, content_type='application/x-ndjson')
+    assert response.status_code == 200
+    summary = response.get_json()
+    assert (summary['inserted'], summary['rejected']) == (0, len(bad))
@@ -0,0 +1,97 @@
+import threading
+
+
+def latest(client, device_id):
+    return client.get(f'/humidity/latest?device_id={device_id}').get_json()['readings']
+
+
+def test_numeric_strings_are_coerced(client):
+    response = client.post('/humidity', json={'device_id': 'ingest-strings', 'sensor_id': 'bed_1', 'sensor_pin': '32',
+                                              'raw_value': '2000', 'humidity_percent': '50.5', 'timestamp': '1234'})
+    assert response.status_code == 200
+    [reading] = latest(client, 'ingest-strings')
+    assert (reading['raw_value'], reading['humidity_percent'], reading['sensor_pin'], reading['esp32_timestamp']) == \
+        (2000, 50.5, 32, 1234)
+
+
+def test_invalid_values_are_rejected_before_storing(client):
+    for field, value in [('raw_value', 'dry'), ('humidity_percent', 'NaN'), ('humidity_percent', [50]),
+                         ('raw_value', 20.5), ('sensor_pin', 'x'), ('timestamp', True), ('sensor_id', 7)]:
+        reading = {'device_id': 'ingest-invalid', 'sensor_id': 'bed_1', 'raw_value': 2000, 'humidity_percent': 50.5}
+        response = client.post('/humidity', json={**reading, field: value})
+        assert response.status_code == 400, (field, value)
+        assert field in response.get_json()['error']
+    assert latest(client, 'ingest-invalid') == []
+
+
+def test_invalid_batch_reading_rejects_the_batch(client):
+    response = client.post('/humidity/batch', json={'device_id': 'ingest-batch-invalid', 'readings': [
+        {'seq': 1, 'sensor_id': 'bed_1', 'raw_value': 2000, 'humidity_percent': 50.5},
+        {'seq': 2, 'sensor_id': 'bed_1', 'raw_value': 2000, 'humidity_percent': 'wet'},
+    ]})
+    assert response.status_code == 400
+    assert latest(client, 'ingest-batch-invalid') == []
+
+
+def test_non_integer_seq_is_rejected(client):
+    reading = {'device_id': 'ingest-bad-seq', 'sensor_id': 'bed_1', 'raw_value': 2000, 'humidity_percent': 50.5}
+    assert client.post('/humidity', json={**reading, 'seq': 'abc'}).status_code == 400
+    assert client.post('/humidity', json={**reading, 'seq': -1}).status_code == 400
+    response = client.post('/humidity/batch', json={'device_id': 'ingest-bad-seq', 'readings': [
+        {**reading, 'seq': 1.5}]})
+    assert response.status_code == 400
+    response = client.post('/humidity/batch', json={'device_id': 'ingest-bad-seq', 'readings': [
+        {**reading, 'seq': 1, 'age_ms': 'old'}]})
+    assert response.status_code == 400
+    assert latest(client, 'ingest-bad-seq') == []
+
+
+def test_batch_readings_with_the_same_age_are_all_stored(client):
+    readings = [{'seq': seq, 'sensor_id': 'bed_1', 'raw_value': 2000 + seq, 'humidity_percent': 50.0 + seq,
+                 'age_ms': 60_000} for seq in (1, 2, 3)]
+    response = client.post('/humidity/batch', json={'device_id': 'ingest-same-age', 'readings': readings})
+    body = response.get_json()
+    assert (body['accepted'], body['duplicates'], body['high_water']) == (3, 0, 3)
+    stored = latest(client, 'ingest-same-age')
+    assert sorted(reading['raw_value'] for reading in stored) == [2001, 2002, 2003]
+    assert len({reading['ts'] for reading in stored}) == 3
+    # A resend is acknowledged without storing anything twice
+    response = client.post('/humidity/batch', json={'device_id': 'ingest-same-age', 'readings': readings})
+    assert response.get_json()['duplicates'] == 3
+    assert len(latest(client, 'ingest-same-age')) == 3
+
+
+def test_batch_body_must_be_an_object(client):
+    for body in ([1, 2], 'readings', 7):
+        assert client.post('/humidity/batch', json=body).status_code == 400
+    assert client.post('/humidity/batch', json={'device_id': ['x'], 'readings': []}).status_code == 400
+
+
+def test_sequenced_uploads_only_wait_for_the_same_device(server, monkeypatch):
+    database = server.sites.default
+    insert_readings = database.insert_readings
+    blocked, release = threading.Event(), threading.Event()
+
+    def slow_insert(readings, high_water=None):
+        if high_water[0] == 'ingest-lock-slow':
+            blocked.set()
+            release.wait(10)
+        return insert_readings(readings, high_water)
+    monkeypatch.setattr(database, 'insert_readings', slow_insert)
+
+    def upload(device_id, seq):
+        return database.insert_sequenced_readings(device_id, [{
+            'device_id': device_id, 'sensor_id': 'bed_1', 'sensor_pin': None, 'raw_value': 2000,
+            'humidity_percent': 50.5, 'esp32_timestamp': None, 'ts': server.get_epoch_ms(), 'seq': seq}])
+
+    slow = threading.Thread(target=upload, args=('ingest-lock-slow', 1))
+    slow.start()
+    try:
+        assert blocked.wait(10)
+        # Another device's upload goes through while the first one is still inserting
+        inserted, duplicates, high_water = upload('ingest-lock-fast', 1)
+        assert (len(inserted), high_water) == (1, 1)
+    finally:
+        release.set()
+        slow.join()
+    assert database.get_high_water('ingest-lock-slow') == 1
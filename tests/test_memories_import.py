@@ -0,0 +1,60 @@
+import io
+import json
+
+from PIL import Image
+
+
+def photo(color):
+    output = io.BytesIO()
+    Image.new('RGB', (64, 48), color).save(output, format='JPEG')
+    return output.getvalue()
+
+
+def run_import(client, photos, user_name):
+    response = client.post('/api/memories/import', data={
+        'user_name': user_name,
+        'photos': [(io.BytesIO(data), f'photo_{i}.jpg') for i, data in enumerate(photos)],
+    }, content_type='multipart/form-data')
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_import_adds_one_memory_per_photo(server, client):
+    records = run_import(client, [photo((10, 20, 30)), photo((40, 50, 60))], 'import-ok')
+    summary = records[-1]
+    assert (summary['status'], summary['imported'], summary['failed']) == ('success', 2, 0)
+    database = server.sites.default
+    for memory_id in summary['memory_ids']:
+        memory = database.get_memory_by_id(memory_id)
+        assert memory['user_name'] == 'import-ok'
+        assert database.photos.path(memory['photo_filename'])
+    assert not database.photos.pending
+
+
+def test_failed_import_removes_its_photos(server, client, monkeypatch):
+    database = server.sites.default
+
+    def fail(memories):
+        raise RuntimeError('insert failed')
+    monkeypatch.setattr(database, 'add_memories', fail)
+    records = run_import(client, [photo((70, 80, 90))], 'import-failed')
+    assert records[-1]['status'] == 'error'
+    assert not database.photos.pending
+    assert not [name for name, path, mtime in database.photos.iter_files() if name == records[0]['photo_filename']]
+
+
+def test_pending_photo_is_not_released(server, tmp_path):
+    database = server.HumidityDatabase(str(tmp_path / 'pending.db'), str(tmp_path / 'photos'))
+    filename, created = database.photos.store(photo((1, 2, 3)), pending=True)
+    assert created
+    # Nothing refers to it yet, but its memory is still to be committed
+    assert not database.release_photo(filename)
+    database.photos.settle(filename)
+    assert database.release_photo(filename)
+
+
+def test_workers_are_shared_between_imports(server, client):
+    run_import(client, [photo((5, 5, 5))], 'import-shared')
+    pool = server.import_pool
+    run_import(client, [photo((6, 6, 6))], 'import-shared')
+    assert server.import_pool is pool
@@ -0,0 +1,83 @@
+import threading
+
+import pytest
+
+MONTH_MS = 31 * 86400 * 1000
+
+
+def reading(device_id, ts):
+    return {'device_id': device_id, 'sensor_id': 'bed_1', 'sensor_pin': 32, 'raw_value': 2000,
+            'humidity_percent': 50.5, 'esp32_timestamp': None, 'ts': ts}
+
+
+def stored_count(database, device_id):
+    with database.get_connection() as conn:
+        return conn.execute('''
+            SELECT COUNT(*) FROM readings r JOIN sensors s ON s.sensor_key = r.sensor_key WHERE s.device_id = ?
+        ''', (device_id,)).fetchone()[0]
+
+
+def test_batch_crossing_into_new_month_is_one_transaction(server, monkeypatch):
+    database = server.HumidityDatabase('partitions.db')
+    now = server.get_epoch_ms()
+    database.insert_readings([reading('partition-seed', now)])
+    # Readings of the current month, then one that needs a partition that does not exist yet
+    batch = [reading('partition-batch', now - 1000), reading('partition-batch', now + 2 * MONTH_MS)]
+
+    def fail(conn, rows):
+        raise RuntimeError('rollup failure')
+    monkeypatch.setattr(database, '_update_rollups', fail)
+    with pytest.raises(RuntimeError):
+        database.insert_readings(batch)
+    assert stored_count(database, 'partition-batch') == 0
+
+    monkeypatch.undo()
+    assert len(database.insert_readings(batch)) == 2
+    assert stored_count(database, 'partition-batch') == 2
+
+
+def test_readings_sharing_a_millisecond_are_both_kept(server):
+    database = server.HumidityDatabase('collisions.db')
+    now = server.get_epoch_ms()
+    first, second = reading('collision', now), {**reading('collision', now), 'humidity_percent': 49.0}
+    assert len(database.insert_readings([first])) == 1
+    # Same sensor and millisecond, different value: a new reading, moved to a free millisecond
+    [moved] = database.insert_readings([second])
+    assert moved['ts'] == now + 1
+    assert stored_count(database, 'collision') == 2
+
+    # Sending either again is a duplicate, wherever it ended up
+    assert database.insert_readings([reading('collision', now), {**second, 'ts': now}]) == []
+    assert stored_count(database, 'collision') == 2
+
+
+def test_drop_waits_for_a_batch_inserting_into_the_partition(server, monkeypatch):
+    database = server.HumidityDatabase('drop_race.db')
+    old_ts = server.get_epoch_ms() - 400 * 86400 * 1000
+    partition = server.partition_for_ts(old_ts)
+    ensured, resume = threading.Event(), threading.Event()
+    ensure_partitions = database._ensure_partitions
+
+    def ensure_then_pause(timestamps):
+        ensure_partitions(timestamps)
+        ensured.set()
+        resume.wait(5)
+    monkeypatch.setattr(database, '_ensure_partitions', ensure_then_pause)
+
+    results = []
+    insert = threading.Thread(target=lambda: results.append(database.insert_readings([reading('drop-race', old_ts)])))
+    insert.start()
+    assert ensured.wait(5)
+    drop = threading.Thread(target=database.drop_partitions, args=([partition],))
+    drop.start()
+    try:
+        # The drop must not remove the table between the batch's partition check and its inserts
+        drop.join(0.5)
+        assert drop.is_alive()
+    finally:
+        resume.set()
+        insert.join(5)
+        drop.join(5)
+    assert len(results) == 1 and len(results[0]) == 1
+    assert partition not in database._partitions
+    assert stored_count(database, 'drop-race') == 0
@@ -0,0 +1,30 @@
+import io
+
+from PIL import ExifTags, Image
+
+
+def jpeg(size=(640, 480), exif=None):
+    output = io.BytesIO()
+    Image.new('RGB', size, (90, 140, 60)).save(output, format='JPEG', quality=90, exif=exif or b'')
+    return output.getvalue()
+
+
+def test_small_jpeg_without_metadata_is_kept(server):
+    data = jpeg()
+    assert server.resize_image(data, output_format='JPEG') is data
+
+
+def test_small_jpeg_with_gps_is_reencoded_without_metadata(server):
+    exif = Image.Exif()
+    exif[ExifTags.Base.Make] = 'Garden camera'
+    exif.get_ifd(ExifTags.IFD.GPSInfo).update({ExifTags.GPS.GPSLatitudeRef: 'N',
+                                               ExifTags.GPS.GPSLatitude: (32.0, 4.0, 0.0)})
+    data = jpeg(exif=exif.tobytes())
+    assert Image.open(io.BytesIO(data)).getexif().get_ifd(ExifTags.IFD.GPSInfo)
+
+    processed = server.resize_image(data, output_format='JPEG')
+    assert processed is not data
+    image = Image.open(io.BytesIO(processed))
+    assert image.size == (640, 480)
+    assert not image.getexif()
+    assert 'exif' not in image.info
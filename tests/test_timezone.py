@@ -0,0 +1,153 @@
+import sqlite3
+from datetime import date, datetime, timedelta
+
+import pytest
+
+HOUR_MS = 3600 * 1000
+
+# Israel springs forward on Friday 2026-03-27 at 02:00 and falls back on Sunday 2026-10-25 at 02:00
+SPRING = date(2026, 3, 27)
+FALL = date(2026, 10, 25)
+
+
+@pytest.fixture
+def local_ms(server):
+    def local_ms(*args, fold=0):
+        return int(datetime(*args, tzinfo=server.ISRAEL_TZ, fold=fold).timestamp() * 1000)
+    return local_ms
+
+
+@pytest.fixture
+def at(server, monkeypatch):
+    """Pin the server clock to an epoch-ms instant"""
+    def at(now_ts):
+        monkeypatch.setattr(server, 'get_epoch_ms', lambda: now_ts)
+        monkeypatch.setattr(server, 'get_israel_time',
+                            lambda: datetime.fromtimestamp(now_ts / 1000, server.ISRAEL_TZ))
+    return at
+
+
+def store(server, device_id, readings):
+    server.sites.default.insert_readings([
+        {'device_id': device_id, 'sensor_id': 'bed_1', 'sensor_pin': 32, 'raw_value': 2000,
+         'humidity_percent': humidity, 'esp32_timestamp': None, 'ts': ts}
+        for ts, humidity in readings])
+
+
+def test_offsets_and_iso_strings_around_the_switches(server, local_ms):
+    switch = local_ms(2026, 3, 27, 3, 0)
+    assert server.utc_offset_ms(switch - 1) == 2 * HOUR_MS
+    assert server.utc_offset_ms(switch) == 3 * HOUR_MS
+    assert server.format_epoch_ms(switch - 1) == '2026-03-27T01:59:59.999000+02:00'
+    assert server.format_epoch_ms(switch) == '2026-03-27T03:00:00+03:00'
+
+    switch = local_ms(2026, 10, 25, 1, 0, fold=1)
+    assert server.utc_offset_ms(switch - 1) == 3 * HOUR_MS
+    assert server.utc_offset_ms(switch) == 2 * HOUR_MS
+    assert server.format_epoch_ms(switch - 1) == '2026-10-25T01:59:59.999000+03:00'
+    assert server.format_epoch_ms(switch) == '2026-10-25T01:00:00+02:00'
+
+    for ts in range(local_ms(2026, 10, 24, 22, 0), local_ms(2026, 10, 25, 4, 0), 7 * 60 * 1000 + 1):
+        assert server.format_epoch_ms(ts) == datetime.fromtimestamp(ts / 1000, server.ISRAEL_TZ).isoformat()
+
+
+def test_switch_days_are_23_and_25_hours_long(server, local_ms):
+    starts = server.local_day_starts(SPRING - timedelta(days=1), 3)
+    assert starts[0] == local_ms(2026, 3, 26, 0, 0)
+    assert [(end - start) // HOUR_MS for start, end in zip(starts, starts[1:])] == [24, 23, 24]
+
+    starts = server.local_day_starts(FALL - timedelta(days=1), 3)
+    assert starts[0] == local_ms(2026, 10, 24, 0, 0)
+    assert [(end - start) // HOUR_MS for start, end in zip(starts, starts[1:])] == [24, 25, 24]
+
+
+def test_hour_of_day_follows_local_clock(server, local_ms):
+    spring = server.local_hour_of_day([local_ms(2026, 3, 27, 1, 30), local_ms(2026, 3, 27, 3, 30),
+                                       local_ms(2026, 3, 27, 23, 30)])
+    assert spring.tolist() == [1, 3, 23]
+    fall = server.local_hour_of_day([local_ms(2026, 10, 25, 1, 30), local_ms(2026, 10, 25, 1, 30, fold=1),
+                                     local_ms(2026, 10, 25, 2, 30), local_ms(2026, 10, 25, 23, 30)])
+    assert fall.tolist() == [1, 1, 2, 23]
+
+
+def test_cron_at_skipped_local_time_runs_once_after_the_switch(server, local_ms):
+    schedule = server.CronSchedule('30 2 * * *')
+    run = schedule.next_after(local_ms(2026, 3, 27, 0, 0))
+    # 02:30 does not exist that night; the run happens an hour later on the same day
+    assert server.format_epoch_ms(run) == '2026-03-27T03:30:00+03:00'
+    assert server.format_epoch_ms(schedule.next_after(run)) == '2026-03-28T02:30:00+03:00'
+
+
+def test_cron_at_repeated_local_time_runs_once(server, local_ms):
+    schedule = server.CronSchedule('30 1 * * *')
+    run = schedule.next_after(local_ms(2026, 10, 25, 0, 0))
+    assert server.format_epoch_ms(run) == '2026-10-25T01:30:00+03:00'
+    assert server.format_epoch_ms(schedule.next_after(run)) == '2026-10-26T01:30:00+02:00'
+    # From inside the repeated hour the second 01:30 is not another run
+    assert schedule.next_after(local_ms(2026, 10, 25, 1, 10, fold=1)) == local_ms(2026, 10, 26, 1, 30)
+
+
+def test_heatmap_days_line_up_across_spring_switch(server, client, local_ms, at):
+    store(server, 'tz-heatmap-spring', [(local_ms(2026, 3, 27, 0, 30), 10), (local_ms(2026, 3, 27, 3, 30), 20),
+                                        (local_ms(2026, 3, 27, 23, 30), 30), (local_ms(2026, 3, 28, 0, 30), 40)])
+    at(local_ms(2026, 3, 28, 12, 0))
+    daily = client.get('/humidity/heatmap?days=3&device_id=tz-heatmap-spring').get_json()
+    assert daily['days'] == ['2026-03-26', '2026-03-27', '2026-03-28']
+    assert daily['values'] == [[None, 20.0, 40.0]]
+
+    hourly = client.get('/humidity/heatmap?days=3&resolution=hourly&device_id=tz-heatmap-spring').get_json()
+    switch_day = hourly['values'][0][1]
+    assert [hour for hour, value in enumerate(switch_day) if value is not None] == [0, 3, 23]
+    assert switch_day[2] is None
+    assert hourly['values'][0][2][0] == 40.0
+
+
+def test_heatmap_days_line_up_across_fall_switch(server, client, local_ms, at):
+    store(server, 'tz-heatmap-fall', [(local_ms(2026, 10, 25, 1, 30), 10), (local_ms(2026, 10, 25, 1, 30, fold=1), 20),
+                                      (local_ms(2026, 10, 25, 23, 30), 60), (local_ms(2026, 10, 26, 0, 30), 40)])
+    at(local_ms(2026, 10, 26, 12, 0))
+    daily = client.get('/humidity/heatmap?days=3&device_id=tz-heatmap-fall').get_json()
+    assert daily['days'] == ['2026-10-24', '2026-10-25', '2026-10-26']
+    assert daily['values'] == [[None, 30.0, 40.0]]
+
+    hourly = client.get('/humidity/heatmap?days=3&resolution=hourly&device_id=tz-heatmap-fall').get_json()
+    switch_day = hourly['values'][0][1]
+    # Both 01:00 hours share one cell
+    assert switch_day[1] == 15.0
+    assert switch_day[23] == 60.0
+    assert hourly['values'][0][2][0] == 40.0
+
+
+@pytest.mark.parametrize('day', [SPRING, FALL])
+def test_aligned_day_cells_run_between_local_midnights(server, client, local_ms, at, day):
+    device_id = f'tz-aligned-{day.month}'
+    store(server, device_id, [(local_ms(day.year, day.month, day.day, 0, 30), 10),
+                              (local_ms(day.year, day.month, day.day, 23, 30), 30),
+                              (local_ms(day.year, day.month, day.day + 1, 0, 30), 50)])
+    at(local_ms(day.year, day.month, day.day + 1, 12, 0))
+    for agg, source in [('mean', 'hourly'), ('last', 'raw')]:
+        response = client.get(f'/humidity/aligned?hours=48&step=86400&agg={agg}&device_id={device_id}').get_json()
+        assert response['source'] == source
+        assert response['timestamps'] == server.local_day_starts(day - timedelta(days=1), 3)[:3]
+        expected = [None, 20.0, 50.0] if agg == 'mean' else [None, 30.0, 50.0]
+        assert response['sensors'][0]['values'] == expected
+
+
+def test_memories_are_stamped_on_the_epoch_ms_clock(server, tmp_path, at, local_ms):
+    path = str(tmp_path / 'memories.db')
+    with sqlite3.connect(path) as conn:
+        # A memories table from before created_ts, stamped with SQLite's UTC CURRENT_TIMESTAMP
+        conn.execute('''CREATE TABLE memories (id INTEGER PRIMARY KEY AUTOINCREMENT, user_name TEXT NOT NULL,
+                        memory_text TEXT NOT NULL, photo_filename TEXT,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+        conn.execute("INSERT INTO memories (user_name, memory_text, created_at) "
+                     "VALUES ('Tomer', 'old', '2026-10-24 22:30:00')")
+    database = server.HumidityDatabase(path, str(tmp_path / 'photos'))
+    at(local_ms(2026, 10, 25, 1, 30, fold=1))
+    database.add_memory('Tomer', 'new')
+
+    new, old = database.get_all_memories()
+    assert old['created_at'] == '2026-10-25T01:30:00+03:00'
+    assert new['created_at'] == '2026-10-25T01:30:00+02:00'
+    stats = database.get_memory_stats()
+    assert (stats['oldest_memory'], stats['newest_memory']) == (old['created_at'], new['created_at'])
@@ -1,3 +1,7 @@
+// Pages of a site other than the default one live under /sites/<site>; the page
+// tells us which, and every API request goes below the same prefix
+const SITE_BASE = document.body.dataset.siteBase || '';
+
 class HumidityDashboard {
     constructor() {
         this.chart = null;
@@ -7,6 +11,24 @@ class HumidityDashboard {
         this.selectedFile = null;
         this.cameraStream = null;
         this.currentRotation = 0; // Track current rotation in degrees
+        this.connectionLost = false; // Set when a refresh fails; the next one reloads everything
+        // Cursors (newest reading ts) of what the chart and table show, for incremental refreshes
+        this.dataView = null;
+        this.historyCursor = null;
+        this.latestCursor = null;
+        this.latestReadings = [];
+        // Per-sensor {x: epoch ms, y} points the chart datasets are drawn from
+        this.chartSeries = null;
+        this.historyWorker = null;
+        this.workerRequests = new Map();
+        this.workerRequestId = 0;
+        // Last-known state, kept in IndexedDB for instant and offline loads
+        this.offlineStore = 'indexedDB' in window ? new OfflineStore() : null;
+        this.snapshot = null;
+        this.devices = [];
+        this.sensors = [];
+        this.stats = null;
+        this.chartSampled = false;
         this.setupMemoryUpdateListener();
         this.init();
     }
@@ -17,24 +39,141 @@ class HumidityDashboard {
         // Load cached memory immediately for instant display
         this.loadCachedMemory();
         
-        // Load configuration and device/sensor data
-        await this.loadSensorConfigs();
-        await this.loadDevices();
-        await this.loadSensors();
+        // Paint the last-known readings while the server is asked for fresh ones
+        await this.restoreSnapshot();
         
-        // Load fresh data in parallel
-        await Promise.all([
-            this.loadData(),
-            this.loadLatestMemory()
-        ]);
+        // Everything for the first paint comes in one request; fall back to the
+        // individual endpoints if that fails
+        if (!await this.loadBootstrap()) {
+            await this.loadSensorConfigs();
+            await this.loadDevices();
+            await this.loadSensors();
+            
+            await Promise.all([
+                this.loadData(),
+                this.loadLatestMemory()
+            ]);
+        }
         
         // Set initial time range labels based on default selection (24h)
         const initialHours = document.getElementById('timeRange').value;
         this.updateTimeRangeLabels(initialHours);
         
+        // Reload everything once the connection comes back
+        window.addEventListener('online', () => this.loadBootstrap());
+        
         this.startAutoRefresh();
     }
 
+    async loadBootstrap() {
+        const deviceId = document.getElementById('deviceSelect').value;
+        const sensorId = document.getElementById('sensorSelect').value;
+        const hours = document.getElementById('timeRange').value;
+        
+        const params = new URLSearchParams();
+        if (deviceId) params.append('device_id', deviceId);
+        if (sensorId) params.append('sensor_id', sensorId);
+        params.append('hours', hours);
+        params.append('sample_size', 720);
+        params.append('limit', 10);
+        
+        try {
+            const data = await this.fetchHistory(`${SITE_BASE}/api/dashboard/bootstrap?${params}`);
+            
+            if (data.status !== 'success') {
+                return false;
+            }
+            
+            const view = `${deviceId}|${sensorId}|${hours}`;
+            const snapshot = this.snapshot;
+            if (data.served_from_cache && snapshot && snapshot.view === view &&
+                    (snapshot.history.cursor ?? 0) >= (data.history.cursor ?? 0)) {
+                // The service worker's copy is older than the restored snapshot; keep showing that
+                this.showLatestMemory(data.memory);
+            } else {
+                this.renderDashboard(data, view);
+                this.showLatestMemory(data.memory);
+                this.saveSnapshot();
+            }
+            
+            if (data.served_from_cache) {
+                // Catch up on readings newer than the cached copy
+                await this.loadData(true);
+                return true;
+            }
+            
+            document.getElementById('status').className = 'status-indicator online';
+            this.connectionLost = false;
+            return true;
+        } catch (error) {
+            console.error('Error loading dashboard:', error);
+            return false;
+        }
+    }
+
+    // Render a bootstrap response or a snapshot of one for the given device|sensor|hours view
+    renderDashboard(data, view) {
+        const [deviceId, sensorId, hours] = view.split('|');
+        
+        this.applySensorConfigs(data);
+        this.renderDevices(data.devices);
+        document.getElementById('deviceSelect').value = deviceId;
+        this.renderSensors(data.sensors, deviceId);
+        document.getElementById('sensorSelect').value = sensorId;
+        document.getElementById('timeRange').value = hours;
+        this.updateTimeRangeLabels(hours);
+        this.renderStats(data.stats);
+        
+        this.updateChart(data.history.series, data.history.sampled);
+        this.updateTable(data.latest);
+        
+        this.dataView = view;
+        this.historyCursor = data.history.cursor;
+        this.latestReadings = data.latest;
+        this.latestCursor = data.latest_cursor;
+    }
+
+    async restoreSnapshot() {
+        if (!this.offlineStore) {
+            return;
+        }
+        try {
+            const snapshot = await this.offlineStore.get(`dashboard${SITE_BASE}`);
+            if (snapshot) {
+                this.snapshot = snapshot;
+                this.renderDashboard(snapshot, snapshot.view);
+            }
+        } catch (error) {
+            console.error('Error restoring dashboard snapshot:', error);
+        }
+    }
+
+    // Store what the dashboard currently shows, in the shape of a bootstrap response
+    saveSnapshot() {
+        if (!this.offlineStore || !this.chartSeries) {
+            return;
+        }
+        this.snapshot = {
+            view: this.dataView,
+            global_threshold: this.globalThreshold,
+            sensor_configs: Object.values(this.sensorConfigs),
+            devices: this.devices,
+            sensors: this.sensors,
+            stats: this.stats,
+            history: {
+                series: [...this.chartSeries.values()],
+                sampled: this.chartSampled,
+                cursor: this.historyCursor
+            },
+            latest: this.latestReadings,
+            latest_cursor: this.latestCursor,
+            saved_at: Date.now()
+        };
+        this.offlineStore.put(`dashboard${SITE_BASE}`, this.snapshot).catch(error => {
+            console.error('Error saving dashboard snapshot:', error);
+        });
+    }
+
     setupEventListeners() {
         document.getElementById('refreshBtn').addEventListener('click', () => {
             this.loadSensorConfigs(); // Refresh sensor configs when manually refreshing
@@ -65,7 +204,7 @@ class HumidityDashboard {
         // Memory modal event listeners
         document.getElementById('writeMemoryBtn').addEventListener('click', () => this.openMemoryModal());
         document.getElementById('viewAllMemoriesBtn').addEventListener('click', () => {
-            window.location.href = '/memories';
+            window.location.href = `${SITE_BASE}/memories`;
         });
         document.getElementById('saveMemoryBtn').addEventListener('click', () => this.saveMemory());
         document.getElementById('cancelMemoryBtn').addEventListener('click', () => this.closeMemoryModal());
@@ -117,28 +256,32 @@ class HumidityDashboard {
 
     async loadSensorConfigs() {
         try {
-            const response = await fetch('/api/sensor-config');
+            const response = await fetch(`${SITE_BASE}/api/sensor-config`);
             const data = await response.json();
             
             if (data.status === 'success') {
-                this.globalThreshold = data.global_threshold;
-                this.sensorConfigs = {};
-                
-                console.log('Raw sensor configs from server:', data.sensor_configs); // Debug log
-                
-                // Convert array to key-value pairs for easier lookup
-                data.sensor_configs.forEach(config => {
-                    const key = `${config.device_id}:${config.sensor_id}`;
-                    this.sensorConfigs[key] = config;
-                });
-                
-                console.log('Processed sensor configs:', this.sensorConfigs); // Debug log
+                this.applySensorConfigs(data);
             }
         } catch (error) {
             console.error('Error loading sensor configs:', error);
         }
     }
 
+    applySensorConfigs(data) {
+        this.globalThreshold = data.global_threshold;
+        this.sensorConfigs = {};
+        
+        console.log('Raw sensor configs from server:', data.sensor_configs); // Debug log
+        
+        // Convert array to key-value pairs for easier lookup
+        data.sensor_configs.forEach(config => {
+            const key = `${config.device_id}:${config.sensor_id}`;
+            this.sensorConfigs[key] = config;
+        });
+        
+        console.log('Processed sensor configs:', this.sensorConfigs); // Debug log
+    }
+
     async openSensorNamesModal() {
         // Reload sensor configs to get latest data
         await this.loadSensorConfigs();
@@ -153,7 +296,7 @@ class HumidityDashboard {
 
     async loadAllSensorsForModal() {
         try {
-            const response = await fetch('/api/sensors');
+            const response = await fetch(`${SITE_BASE}/api/sensors`);
             const data = await response.json();
             
             if (data.status === 'success') {
@@ -321,7 +464,7 @@ class HumidityDashboard {
         }
         
         try {
-            const response = await fetch('/api/sensor-config', {
+            const response = await fetch(`${SITE_BASE}/api/sensor-config`, {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
@@ -353,7 +496,7 @@ class HumidityDashboard {
 
     async toggleSensorAlerts(deviceId, sensorId, enabled) {
         try {
-            const response = await fetch(`/api/sensor-alerts/${deviceId}/${sensorId}`, {
+            const response = await fetch(`${SITE_BASE}/api/sensor-alerts/${deviceId}/${sensorId}`, {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
@@ -408,7 +551,7 @@ class HumidityDashboard {
                 sensor_configs: resetConfigs
             };
             
-            fetch('/api/sensor-config', {
+            fetch(`${SITE_BASE}/api/sensor-config`, {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
@@ -441,20 +584,10 @@ class HumidityDashboard {
         this.loadCachedMemory();
         
         try {
-            const response = await fetch('/api/memories');
+            const response = await fetch(`${SITE_BASE}/api/memories`);
             const data = await response.json();
             
-            if (data.status === 'success' && data.memories.length > 0) {
-                const latestMemory = data.memories[0];
-                this.displayLatestMemory(latestMemory);
-                // Cache the latest memory for future loads
-                this.cacheLatestMemory(latestMemory);
-            } else {
-                // Only show "no memory" if we don't have cached data
-                if (!this.hasCachedMemory()) {
-                    this.displayNoMemory();
-                }
-            }
+            this.showLatestMemory(data.status === 'success' ? data.memories[0] : null);
         } catch (error) {
             console.error('Error loading latest memory:', error);
             // Only show "no memory" if we don't have cached data
@@ -464,6 +597,17 @@ class HumidityDashboard {
         }
     }
 
+    showLatestMemory(latestMemory) {
+        if (latestMemory) {
+            this.displayLatestMemory(latestMemory);
+            // Cache the latest memory for future loads
+            this.cacheLatestMemory(latestMemory);
+        } else if (!this.hasCachedMemory()) {
+            // Only show "no memory" if we don't have cached data
+            this.displayNoMemory();
+        }
+    }
+
     loadCachedMemory() {
         const cachedMemory = localStorage.getItem('gardenLatestMemory');
         if (cachedMemory) {
@@ -492,8 +636,8 @@ class HumidityDashboard {
     displayLatestMemory(memory, isCached = false) {
         const container = document.getElementById('latestMemory');
         
-        // Parse timestamp as UTC and convert to local time
-        const date = new Date(memory.created_at + (memory.created_at.includes('Z') ? '' : 'Z'));
+        // created_at carries its UTC offset; memories cached before it did are UTC without one
+        const date = new Date(memory.created_at + (/Z|[+-]\d\d:\d\d$/.test(memory.created_at) ? '' : 'Z'));
         
         // Format date in user's local timezone
         const formattedDate = date.toLocaleString(undefined, {
@@ -514,7 +658,7 @@ class HumidityDashboard {
         // Photo HTML
         const photoHtml = memory.photo_filename && !memory.photo_filename.startsWith('temp_') ? 
             `<div class="memory-photo">
-                <img src="/api/memories/photos/${memory.photo_filename}" 
+                <img src="${SITE_BASE}/api/memories/photos/${memory.photo_filename}" 
                      alt="Memory photo" 
                      onclick="dashboard.showPhotoModal('${memory.photo_filename}')">
             </div>` : (memory.photo_filename && memory.photo_filename.startsWith('temp_') ? 
@@ -656,7 +800,7 @@ class HumidityDashboard {
             
             console.log('Sending request to /api/memories...');
             
-            const response = await fetch('/api/memories', {
+            const response = await fetch(`${SITE_BASE}/api/memories`, {
                 method: 'POST',
                 body: formData  // Don't set Content-Type, browser will set it with boundary
             });
@@ -1156,7 +1300,7 @@ class HumidityDashboard {
             modal.innerHTML = `
                 <span class="photo-modal-close">&times;</span>
                 <div class="photo-modal-content">
-                    <img src="/api/memories/photos/${filename}" alt="Memory photo">
+                    <img src="${SITE_BASE}/api/memories/photos/${filename}" alt="Memory photo">
                 </div>
             `;
             document.body.appendChild(modal);
@@ -1173,7 +1317,7 @@ class HumidityDashboard {
             };
         } else {
             // Update image source
-            modal.querySelector('img').src = `/api/memories/photos/${filename}`;
+            modal.querySelector('img').src = `${SITE_BASE}/api/memories/photos/${filename}`;
         }
         
         modal.style.display = 'block';
@@ -1207,19 +1351,11 @@ class HumidityDashboard {
 
     async loadDevices() {
         try {
-            const response = await fetch('/api/devices');
+            const response = await fetch(`${SITE_BASE}/api/devices`);
             const data = await response.json();
             
             if (data.status === 'success') {
-                const select = document.getElementById('deviceSelect');
-                select.innerHTML = '<option value="">All Devices</option>';
-                
-                data.devices.forEach(device => {
-                    const option = document.createElement('option');
-                    option.value = device.device_id;
-                    option.textContent = `${device.device_id} (${device.reading_count} readings)`;
-                    select.appendChild(option);
-                });
+                this.renderDevices(data.devices);
             }
         } catch (error) {
             console.error('Error loading devices:', error);
@@ -1227,30 +1363,36 @@ class HumidityDashboard {
         }
     }
 
+    renderDevices(devices) {
+        this.devices = devices;
+        const select = document.getElementById('deviceSelect');
+        const selected = select.value;
+        select.innerHTML = '<option value="">All Devices</option>';
+        
+        devices.forEach(device => {
+            const option = document.createElement('option');
+            option.value = device.device_id;
+            option.textContent = `${device.device_id} (${device.reading_count} readings)`;
+            select.appendChild(option);
+        });
+        // Keep the selection when reloading after a reconnect
+        select.value = selected;
+    }
+
     async loadSensors() {
         const deviceId = document.getElementById('deviceSelect').value;
         
         try {
-            let url = '/api/sensors';
+            let url = `${SITE_BASE}/api/sensors`;
             if (deviceId) {
-                url = `/api/devices/${deviceId}/sensors`;
+                url = `${SITE_BASE}/api/devices/${deviceId}/sensors`;
             }
             
             const response = await fetch(url);
             const data = await response.json();
             
             if (data.status === 'success') {
-                const select = document.getElementById('sensorSelect');
-                select.innerHTML = '<option value="">All Sensors</option>';
-                
-                const sensors = data.sensors || [];
-                sensors.forEach(sensor => {
-                    const option = document.createElement('option');
-                    option.value = sensor.sensor_id;
-                    const displayName = this.getDisplayName(sensor.sensor_id, sensor.device_id || deviceId);
-                    option.textContent = `${displayName} (${sensor.reading_count} readings)`;
-                    select.appendChild(option);
-                });
+                this.renderSensors(data.sensors || [], deviceId);
             }
         } catch (error) {
             console.error('Error loading sensors:', error);
@@ -1258,11 +1400,33 @@ class HumidityDashboard {
         }
     }
 
-    async loadData() {
+    renderSensors(sensors, deviceId) {
+        this.sensors = sensors;
+        const select = document.getElementById('sensorSelect');
+        const selected = select.value;
+        select.innerHTML = '<option value="">All Sensors</option>';
+        
+        sensors.forEach(sensor => {
+            const option = document.createElement('option');
+            option.value = sensor.sensor_id;
+            const displayName = this.getDisplayName(sensor.sensor_id, sensor.device_id || deviceId);
+            option.textContent = `${displayName} (${sensor.reading_count} readings)`;
+            select.appendChild(option);
+        });
+        // Keep the selection when reloading after a reconnect
+        select.value = selected;
+    }
+
+    async loadData(incremental = false) {
         const deviceId = document.getElementById('deviceSelect').value;
         const sensorId = document.getElementById('sensorSelect').value;
         const hours = document.getElementById('timeRange').value;
         
+        // Only fetch readings newer than the cursors while the same view is shown
+        const view = `${deviceId}|${sensorId}|${hours}`;
+        incremental = incremental && view === this.dataView && this.historyCursor !== null;
+        this.dataView = view;
+        
         try {
             // Update status indicator
             document.getElementById('status').className = 'status-indicator online';
@@ -1271,15 +1435,23 @@ class HumidityDashboard {
             await this.loadStats(deviceId, sensorId, hours);
             
             // Load history for chart
-            await this.loadHistory(deviceId, sensorId, hours);
+            await this.loadHistory(deviceId, sensorId, hours, incremental);
             
             // Load recent readings
-            await this.loadRecentReadings(deviceId, sensorId);
+            await this.loadRecentReadings(deviceId, sensorId, incremental);
             
+            this.connectionLost = false;
+            this.saveSnapshot();
         } catch (error) {
             console.error('Error loading data:', error);
             document.getElementById('status').className = 'status-indicator';
-            this.showError('Failed to load data');
+            this.connectionLost = true;
+            if (this.snapshot && this.dataView === this.snapshot.view) {
+                const savedAt = new Date(this.snapshot.saved_at).toLocaleString('en-GB');
+                this.showError(`Server unreachable - showing readings from ${savedAt}`);
+            } else {
+                this.showError('Failed to load data');
+            }
         }
     }
 
@@ -1292,10 +1464,15 @@ class HumidityDashboard {
         // Update the card headers to reflect the selected time range
         this.updateTimeRangeLabels(hours);
 
-        const response = await fetch(`/humidity/stats?${params}`);
+        const response = await fetch(`${SITE_BASE}/humidity/stats?${params}`);
         const data = await response.json();
 
-        if (data.status === 'success' && data.humidity) {
+        this.renderStats(data.status === 'success' && data.humidity ? data : null);
+    }
+
+    renderStats(data) {
+        this.stats = data;
+        if (data) {
             document.getElementById('currentHumidity').textContent = 
                 data.humidity.current !== null && data.humidity.current !== undefined ? data.humidity.current.toFixed(1) : '--';
             document.getElementById('avgHumidity').textContent = 
@@ -1313,7 +1490,44 @@ class HumidityDashboard {
         }
     }
 
-    async loadHistory(deviceId, sensorId, hours) {
+    // Fetch a history or bootstrap payload with its readings reshaped into per-sensor
+    // chart series; parsing runs in a Web Worker when available to keep scrolling and
+    // animations smooth while a long time range loads
+    fetchHistory(url) {
+        if (this.historyWorker === null) {
+            try {
+                this.historyWorker = new Worker('/static/js/history-worker.js');
+                this.historyWorker.onmessage = (event) => {
+                    const { id, data, error } = event.data;
+                    const request = this.workerRequests.get(id);
+                    this.workerRequests.delete(id);
+                    if (request) {
+                        error ? request.reject(new Error(error)) : request.resolve(data);
+                    }
+                };
+                this.historyWorker.onerror = (event) => {
+                    // The worker failed to load; fail pending requests and parse on the main thread from now on
+                    console.error('History worker error:', event.message);
+                    this.historyWorker = false;
+                    this.workerRequests.forEach(request => request.reject(new Error('History worker failed')));
+                    this.workerRequests.clear();
+                };
+            } catch (error) {
+                this.historyWorker = false;
+            }
+        }
+        
+        if (!this.historyWorker) {
+            return fetchHistoryPayload(url);
+        }
+        return new Promise((resolve, reject) => {
+            const id = ++this.workerRequestId;
+            this.workerRequests.set(id, { resolve, reject });
+            this.historyWorker.postMessage({ id, url });
+        });
+    }
+
+    async loadHistory(deviceId, sensorId, hours, incremental = false) {
         const params = new URLSearchParams();
         if (deviceId) params.append('device_id', deviceId);
         if (sensorId) params.append('sensor_id', sensorId);
@@ -1329,37 +1543,96 @@ class HumidityDashboard {
             params.append('sample_size', targetDataPoints);
         }
 
-        const response = await fetch(`/humidity/history?${params}`);
-        const data = await response.json();
+        if (incremental) {
+            // Append only what arrived since the last refresh
+            const response = await fetch(`${SITE_BASE}/humidity/history?${params}&since_ts=${this.historyCursor}`);
+            const data = await response.json();
+
+            if (data.status === 'success' && this.appendToChart(data.readings, hours)) {
+                this.historyCursor = data.cursor;
+                return;
+            }
+        }
+
+        const data = await this.fetchHistory(`${SITE_BASE}/humidity/history?${params}`);
 
         if (data.status === 'success') {
-            this.updateChart(data.readings, data.sampled);
+            this.historyCursor = data.cursor;
+            this.updateChart(data.series, data.sampled);
+            if (data.served_from_cache && !incremental) {
+                // The service worker answered from its cache; fetch what is newer right away
+                await this.loadHistory(deviceId, sensorId, hours, true);
+            }
         }
     }
 
-    async loadRecentReadings(deviceId, sensorId) {
+    async loadRecentReadings(deviceId, sensorId, incremental = false) {
         const params = new URLSearchParams();
         if (deviceId) params.append('device_id', deviceId);
         if (sensorId) params.append('sensor_id', sensorId);
         params.append('limit', '10');
+        if (incremental && this.latestCursor !== null) {
+            params.append('since_ts', this.latestCursor);
+        }
 
-        const response = await fetch(`/humidity/latest?${params}`);
+        const response = await fetch(`${SITE_BASE}/humidity/latest?${params}`);
         const data = await response.json();
 
         if (data.status === 'success') {
-            this.updateTable(data.readings);
+            this.latestReadings = (params.has('since_ts') ? data.readings.concat(this.latestReadings) : data.readings).slice(0, 10);
+            this.latestCursor = data.cursor;
+            this.updateTable(this.latestReadings);
         }
     }
 
-    updateChart(readings, isSampled = false) {
-        const ctx = document.getElementById('humidityChart').getContext('2d');
-        
-        if (this.chart) {
-            this.chart.destroy();
+    // Add newer readings to the existing chart and drop points that left the time
+    // window; returns false when the chart has to be rebuilt instead (e.g. a new sensor)
+    appendToChart(readings, hours) {
+        const chartSeries = this.chartSeries;
+        if (!this.chart || !chartSeries) {
+            return false;
+        }
+        if (readings.length === 0) {
+            return true;
         }
 
-        if (!readings || readings.length === 0) {
+        const added = groupReadingsBySensor(readings);
+        if (added.some(item => !chartSeries.has(item.sensorKey))) {
+            return false;
+        }
+
+        const cutoff = Date.now() - hours * 3600 * 1000;
+        added.forEach(item => {
+            chartSeries.get(item.sensorKey).points.push(...item.points);
+        });
+        chartSeries.forEach(item => {
+            const expired = item.points.findIndex(point => point.x >= cutoff);
+            item.points.splice(0, expired === -1 ? item.points.length : expired);
+        });
+        
+        // Hand the series to the datasets again: the decimation plugin keeps the data it
+        // was given aside and re-samples it on update
+        this.chart.data.datasets.forEach(dataset => {
+            dataset.data = chartSeries.get(dataset.sensorKey).points;
+        });
+        this.chart.update('none');
+        return true;
+    }
+
+    // series: one entry per sensor of {x: epoch ms, y: humidity} points, oldest first,
+    // as built by history-worker.js
+    updateChart(series, isSampled = false) {
+        const canvas = document.getElementById('humidityChart');
+
+        if (!series || series.length === 0) {
+            if (this.chart) {
+                this.chart.destroy();
+                this.chart = null;
+            }
+            this.chartSeries = null;
+            
             // Show empty chart message
+            const ctx = canvas.getContext('2d');
             ctx.font = '16px Arial';
             ctx.fillStyle = '#7f8c8d';
             ctx.textAlign = 'center';
@@ -1367,170 +1640,56 @@ class HumidityDashboard {
             return;
         }
 
-        // Sort readings by timestamp (oldest first for chart)
-        const sortedReadings = readings.sort((a, b) => new Date(a.created_at) - new Date(b.created_at));
-
-        // Group readings by sensor if we have multiple sensors
-        const sensorGroups = {};
-        const selectedSensor = document.getElementById('sensorSelect').value;
-        
-        sortedReadings.forEach(reading => {
-            const sensorKey = reading.sensor_id || 'Unknown Sensor';
-            if (!sensorGroups[sensorKey]) {
-                sensorGroups[sensorKey] = [];
-            }
-            sensorGroups[sensorKey].push(reading);
-        });
-
-        // Sort sensor keys to ensure consistent color assignment
-        // ID-ed sensors (garden_1, garden_2, etc.) come first in sorted order
-        // Non-ID-ed sensors (Unknown Sensor) come last
-        const sensorKeys = Object.keys(sensorGroups).sort((a, b) => {
-            // Put "Unknown Sensor" or sensors without proper IDs at the end
-            if (a === 'Unknown Sensor' && b !== 'Unknown Sensor') return 1;
-            if (b === 'Unknown Sensor' && a !== 'Unknown Sensor') return -1;
-            
-            // For proper sensor IDs, sort alphabetically/numerically
-            // This ensures garden_1, garden_2, garden_3... maintain consistent order
-            return a.localeCompare(b, undefined, { numeric: true, sensitivity: 'base' });
-        });
-        
-        const colors = ['#3498db', '#e74c3c', '#2ecc71', '#f39c12', '#9b59b6', '#34495e'];
-        
-        let datasets = [];
-        
-        // Get current time range for label formatting
+        // Get current time range for axis formatting
         const hours = parseInt(document.getElementById('timeRange').value);
         const isWeekView = hours >= 168 && hours < 720; // 168 hours = 1 week, 720 hours = 1 month
         const isMonthView = hours >= 720; // 720 hours = 1 month
         
-        if (selectedSensor || sensorKeys.length === 1) {
-            // Single sensor view - use all readings
-            let labels, humidityData;
-            
-            if (isWeekView || isMonthView) {
-                // For week and month views, we'll use time-based x-axis
-                // Keep the original timestamps for proper time scale
-                labels = sortedReadings.map(r => new Date(r.created_at));
-                humidityData = sortedReadings.map(r => ({
-                    x: new Date(r.created_at),
-                    y: r.humidity_percent
-                }));
-            } else {
-                // For shorter periods, use formatted time labels
-                labels = sortedReadings.map(r => {
-                    const date = new Date(r.created_at);
-                    return date.toLocaleTimeString('en-GB', { 
-                        hour: '2-digit',
-                        minute: '2-digit'
-                    });
-                });
-                humidityData = sortedReadings.map(r => r.humidity_percent);
-            }
-            
+        const colors = ['#3498db', '#e74c3c', '#2ecc71', '#f39c12', '#9b59b6', '#34495e'];
+        const selectedSensor = document.getElementById('sensorSelect').value;
+        const single = Boolean(selectedSensor) || series.length === 1;
+        
+        const datasets = series.map((item, index) => {
+            const color = colors[index % colors.length];
             // Use custom name if available
-            let sensorName = selectedSensor || sensorKeys[0] || 'Humidity';
-            if (sortedReadings.length > 0) {
-                const deviceId = sortedReadings[0].device_id;
-                sensorName = this.getDisplayName(sensorName, deviceId);
-            }
-            
-            datasets.push({
-                label: sensorName,
-                data: humidityData,
-                borderColor: colors[0],
-                backgroundColor: `${colors[0]}20`,
+            const sensorName = single && selectedSensor ? selectedSensor : item.sensorKey;
+            return {
+                label: this.getDisplayName(sensorName, item.deviceId),
+                sensorKey: item.sensorKey,
+                data: item.points,
+                borderColor: color,
+                backgroundColor: `${color}20`,
                 borderWidth: 2,
-                fill: true,
+                fill: single,
                 tension: 0.4,
                 pointRadius: 0,
                 pointHoverRadius: 6,
-                pointHoverBackgroundColor: colors[0],
+                pointHoverBackgroundColor: color,
                 pointHoverBorderColor: '#fff',
                 pointHoverBorderWidth: 2
-            });
-            
-            this.chart = new Chart(ctx, {
-                type: 'line',
-                data: { labels: isWeekView || isMonthView ? undefined : labels, datasets },
-                options: this.getChartOptions(isSampled, isWeekView, isMonthView)
-            });
+            };
+        });
+        this.chartSeries = new Map(series.map(item => [item.sensorKey, item]));
+        this.chartSampled = isSampled;
+        const options = this.getChartOptions(isSampled, isWeekView, isMonthView);
+        
+        if (this.chart) {
+            // Update the existing chart in place rather than rebuilding canvas, scales and plugins
+            this.chart.data.datasets = datasets;
+            this.chart.options = options;
+            this.chart.update('none');
         } else {
-            // Multiple sensors view - create dataset for each sensor
-            // Find common time points or use all unique times
-            const allTimes = [...new Set(sortedReadings.map(r => r.created_at))].sort();
-            let labels;
-            
-            if (isWeekView || isMonthView) {
-                // For week and month views, use actual timestamps
-                labels = allTimes.map(time => new Date(time));
-            } else {
-                // For shorter periods, use formatted time labels
-                labels = allTimes.map(time => {
-                    const date = new Date(time);
-                    return date.toLocaleTimeString('en-GB', { 
-                        hour: '2-digit',
-                        minute: '2-digit'
-                    });
-                });
-            }
-            
-            sensorKeys.forEach((sensorKey, index) => {
-                const sensorReadings = sensorGroups[sensorKey];
-                const color = colors[index % colors.length];
-                
-                let sensorData;
-                if (isWeekView || isMonthView) {
-                    // For time-based charts, create x,y data points
-                    sensorData = allTimes.map(time => {
-                        const reading = sensorReadings.find(r => r.created_at === time);
-                        return reading ? {
-                            x: new Date(time),
-                            y: reading.humidity_percent
-                        } : null;
-                    }).filter(point => point !== null);
-                } else {
-                    // For regular charts, use simple array
-                    sensorData = allTimes.map(time => {
-                        const reading = sensorReadings.find(r => r.created_at === time);
-                        return reading ? reading.humidity_percent : null;
-                    });
-                }
-                
-                // Use custom name if available
-                let displayName = sensorKey;
-                if (sensorReadings.length > 0) {
-                    const deviceId = sensorReadings[0].device_id;
-                    displayName = this.getDisplayName(sensorKey, deviceId);
-                }
-                
-                datasets.push({
-                    label: displayName,
-                    data: sensorData,
-                    borderColor: color,
-                    backgroundColor: `${color}20`,
-                    borderWidth: 2,
-                    fill: false,
-                    tension: 0.4,
-                    pointRadius: 0,
-                    pointHoverRadius: 6,
-                    pointHoverBackgroundColor: color,
-                    pointHoverBorderColor: '#fff',
-                    pointHoverBorderWidth: 2,
-                    spanGaps: true
-                });
-            });
-            
-            this.chart = new Chart(ctx, {
+            this.chart = new Chart(canvas.getContext('2d'), {
                 type: 'line',
-                data: { labels: isWeekView || isMonthView ? undefined : labels, datasets },
-                options: this.getChartOptions(isSampled, isWeekView, isMonthView)
+                data: { datasets },
+                options
             });
         }
     }
 
     getChartOptions(isSampled = false, isWeekView = false, isMonthView = false) {
         let xAxisConfig = {
+            type: 'time',
             title: {
                 display: true,
                 text: 'Time'
@@ -1538,6 +1697,13 @@ class HumidityDashboard {
             grid: {
                 color: 'rgba(0,0,0,0.1)'
             },
+            time: {
+                tooltipFormat: 'HH:mm',
+                displayFormats: {
+                    minute: 'HH:mm',
+                    hour: 'HH:mm'
+                }
+            },
             ticks: {
                 maxTicksLimit: 12,
                 autoSkip: true,
@@ -1604,6 +1770,11 @@ class HumidityDashboard {
         const baseOptions = {
             responsive: true,
             maintainAspectRatio: false,
+            // Datasets hold sorted {x: epoch ms, y} points, so Chart.js can skip parsing and
+            // decimate long ranges down to what the canvas can show
+            parsing: false,
+            normalized: true,
+            animation: false,
             scales: {
                 y: {
                     beginAtZero: true,
@@ -1624,8 +1795,14 @@ class HumidityDashboard {
                     position: 'top'
                 },
                 tooltip: {
-                    mode: 'index',
+                    // Sensors are sampled at different times, so match points by time rather than index
+                    mode: 'nearest',
+                    axis: 'x',
                     intersect: false,
+                },
+                decimation: {
+                    enabled: true,
+                    algorithm: 'lttb'
                 }
             }
         };
@@ -1635,19 +1812,22 @@ class HumidityDashboard {
 
     updateTable(readings) {
         const tbody = document.querySelector('#readingsTable tbody');
-        tbody.innerHTML = '';
 
         if (!readings || readings.length === 0) {
-            const row = document.createElement('tr');
-            row.innerHTML = '<td colspan="6" style="text-align: center; color: #7f8c8d;">No recent readings available</td>';
-            tbody.appendChild(row);
+            tbody.innerHTML = '<tr><td colspan="6" style="text-align: center; color: #7f8c8d;">No recent readings available</td></tr>';
             return;
         }
 
-        readings.forEach(reading => {
-            const row = document.createElement('tr');
-            // server_timestamp is already in Israel time with timezone info
-            const date = new Date(reading.created_at);
+        // Rows already shown are kept as they are; only readings that are new (or whose
+        // name or alert settings changed) get a row built
+        const existingRows = new Map();
+        Array.from(tbody.rows).forEach(row => {
+            if (row.dataset.key) {
+                existingRows.set(row.dataset.key, row);
+            }
+        });
+        
+        const rows = readings.map(reading => {
             let sensorInfo = reading.sensor_id ? reading.sensor_id : (reading.sensor_pin ? `Pin ${reading.sensor_pin}` : 'Unknown');
             
             // Use custom name if available
@@ -1663,6 +1843,16 @@ class HumidityDashboard {
             const threshold = sensorConfig.humidity_threshold || this.globalThreshold;
             const isBelowThreshold = reading.humidity_percent < threshold;
             
+            const key = [reading.device_id, reading.sensor_id, reading.ts, sensorInfo, alertsEnabled, threshold].join('|');
+            if (existingRows.has(key)) {
+                return existingRows.get(key);
+            }
+            
+            const row = document.createElement('tr');
+            row.dataset.key = key;
+            // server_timestamp is already in Israel time with timezone info
+            const date = new Date(reading.created_at);
+            
             // Alert status column
             let alertStatusHtml = '';
             if (reading.sensor_id) {
@@ -1697,8 +1887,9 @@ class HumidityDashboard {
                 <td><span class="device-badge">${reading.device_id}</span></td>
                 <td>${alertStatusHtml}</td>
             `;
-            tbody.appendChild(row);
+            return row;
         });
+        tbody.replaceChildren(...rows);
     }
 
     updateTimeRangeLabels(hours) {
@@ -1754,8 +1945,13 @@ class HumidityDashboard {
     startAutoRefresh() {
         // Refresh every 30 seconds
         this.refreshInterval = setInterval(() => {
+            if (this.connectionLost) {
+                // The last refresh failed: reload everything in one request
+                this.loadBootstrap();
+                return;
+            }
             this.loadSensorConfigs(); // Keep sensor configs in sync
-            this.loadData();
+            this.loadData(true); // Only fetch readings newer than what is shown
             this.loadLatestMemory(); // Keep memories in sync
         }, 30000);
     }
@@ -1774,6 +1970,15 @@ document.addEventListener('DOMContentLoaded', () => {
     dashboard = new HumidityDashboard();
 });
 
+// Offline support: precached assets and cached API reads (see /sw.js)
+if ('serviceWorker' in navigator) {
+    window.addEventListener('load', () => {
+        navigator.serviceWorker.register('/sw.js').catch(error => {
+            console.error('Service worker registration failed:', error);
+        });
+    });
+}
+
 // Add some additional CSS for device and sensor badges
 const style = document.createElement('style');
 style.textContent = `
@@ -0,0 +1,81 @@
+// Chart history parsing and reshaping. dashboard.js runs this file as a Web Worker so
+// large history payloads are parsed off the main thread; the page also loads it as a
+// plain script, which provides the same functions for small payloads and as a fallback.
+
+// Sort sensors for consistent color assignment: named sensors (garden_1, garden_2, ...)
+// in numeric order first, "Unknown Sensor" last
+function compareSensorKeys(a, b) {
+    if (a === 'Unknown Sensor' && b !== 'Unknown Sensor') return 1;
+    if (b === 'Unknown Sensor' && a !== 'Unknown Sensor') return -1;
+    return a.localeCompare(b, undefined, { numeric: true, sensitivity: 'base' });
+}
+
+function addPoint(groups, sensorId, deviceId, ts, humidity) {
+    const sensorKey = sensorId || 'Unknown Sensor';
+    let group = groups.get(sensorKey);
+    if (!group) {
+        group = { sensorKey, deviceId, points: [] };
+        groups.set(sensorKey, group);
+    }
+    group.points.push({ x: ts, y: humidity });
+}
+
+// One series per sensor of {x: epoch ms, y: humidity} points, oldest first: the
+// format Chart.js draws without parsing
+function finishSeries(groups) {
+    const series = [...groups.values()];
+    series.forEach(item => item.points.sort((a, b) => a.x - b.x));
+    return series.sort((a, b) => compareSensorKeys(a.sensorKey, b.sensorKey));
+}
+
+function groupReadingsBySensor(readings) {
+    const groups = new Map();
+    readings.forEach(reading => {
+        addPoint(groups, reading.sensor_id, reading.device_id, reading.ts, reading.humidity_percent);
+    });
+    return finishSeries(groups);
+}
+
+function seriesFromColumns(columns) {
+    const groups = new Map();
+    for (let i = 0; i < columns.ts.length; i++) {
+        addPoint(groups, columns.sensor_id[i], columns.device_id[i], columns.ts[i], columns.humidity_percent[i]);
+    }
+    return finishSeries(groups);
+}
+
+// Replace the readings of a /humidity/history or /api/dashboard/bootstrap response
+// with per-sensor series
+function reshapeHistoryPayload(data) {
+    if (data.status !== 'success') {
+        return data;
+    }
+    if (data.history) {
+        data.history.series = seriesFromColumns(data.history.columns);
+        delete data.history.columns;
+    } else if (data.readings) {
+        data.series = groupReadingsBySensor(data.readings);
+        delete data.readings;
+    }
+    return data;
+}
+
+// served_from_cache is set when the service worker answered from its cache, so the
+// dashboard knows to catch up on newer readings
+async function fetchHistoryPayload(url) {
+    const response = await fetch(url);
+    const data = await response.json();
+    data.served_from_cache = response.headers.get('X-Served-From') === 'cache';
+    return reshapeHistoryPayload(data);
+}
+
+if (typeof WorkerGlobalScope !== 'undefined' && self instanceof WorkerGlobalScope) {
+    self.onmessage = async (event) => {
+        const { id, url } = event.data;
+        try {
+            self.postMessage({ id, data: await fetchHistoryPayload(url) });
+        } catch (error) {
+            self.postMessage({ id, error: error.message });
+        }
+    };
+}
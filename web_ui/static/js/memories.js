@@ -1,3 +1,7 @@
+// Pages of a site other than the default one live under /sites/<site>; the page
+// tells us which, and every API request goes below the same prefix
+const SITE_BASE = document.body.dataset.siteBase || '';
+
 class MemoriesPage {
     constructor() {
         this.init();
@@ -14,7 +18,7 @@ class MemoriesPage {
 
     async loadMemories() {
         try {
-            const response = await fetch('/api/memories?all=true');
+            const response = await fetch(`${SITE_BASE}/api/memories?all=true`);
             const data = await response.json();
             
             if (data.status === 'success') {
@@ -37,7 +41,7 @@ class MemoriesPage {
                     <h3>📝 No memories yet</h3>
                     <p>Be the first to share a garden observation or discovery!</p>
                     <p style="margin-top: 15px;">
-                        <a href="/" style="color: #3498db; text-decoration: none; font-weight: 500;">
+                        <a href="${SITE_BASE}/" style="color: #3498db; text-decoration: none; font-weight: 500;">
                             🏠 Go to Dashboard to write your first memory
                         </a>
                     </p>
@@ -59,8 +63,8 @@ class MemoriesPage {
         const memoryElement = document.createElement('div');
         memoryElement.className = 'memory-item';
         
-        // Parse timestamp as UTC and convert to local time
-        const date = new Date(memory.created_at + (memory.created_at.includes('Z') ? '' : 'Z'));
+        // created_at carries its UTC offset; memories cached before it did are UTC without one
+        const date = new Date(memory.created_at + (/Z|[+-]\d\d:\d\d$/.test(memory.created_at) ? '' : 'Z'));
         
         // Format date in user's local timezone with full details
         const formattedDate = date.toLocaleString(undefined, {
@@ -79,7 +83,7 @@ class MemoriesPage {
         // Photo HTML
         const photoHtml = memory.photo_filename ? 
             `<div class="memory-photo">
-                <img src="/api/memories/photos/${memory.photo_filename}" 
+                <img src="${SITE_BASE}/api/memories/photos/${memory.photo_filename}" 
                      alt="Memory photo" 
                      onclick="memoriesPage.showPhotoModal('${memory.photo_filename}')">
             </div>` : '';
@@ -111,7 +115,7 @@ class MemoriesPage {
         }
 
         try {
-            const response = await fetch(`/api/memories/${memoryId}`, {
+            const response = await fetch(`${SITE_BASE}/api/memories/${memoryId}`, {
                 method: 'DELETE'
             });
 
@@ -182,7 +186,7 @@ class MemoriesPage {
             modal.innerHTML = `
                 <span class="photo-modal-close">&times;</span>
                 <div class="photo-modal-content">
-                    <img src="/api/memories/photos/${filename}" alt="Memory photo">
+                    <img src="${SITE_BASE}/api/memories/photos/${filename}" alt="Memory photo">
                 </div>
             `;
             document.body.appendChild(modal);
@@ -199,7 +203,7 @@ class MemoriesPage {
             };
         } else {
             // Update image source
-            modal.querySelector('img').src = `/api/memories/photos/${filename}`;
+            modal.querySelector('img').src = `${SITE_BASE}/api/memories/photos/${filename}`;
         }
         
         modal.style.display = 'block';
@@ -212,6 +216,15 @@ document.addEventListener('DOMContentLoaded', () => {
     memoriesPage = new MemoriesPage();
 });
 
+// Offline support: precached assets and cached API reads (see /sw.js)
+if ('serviceWorker' in navigator) {
+    window.addEventListener('load', () => {
+        navigator.serviceWorker.register('/sw.js').catch(error => {
+            console.error('Service worker registration failed:', error);
+        });
+    });
+}
+
 // Add styling for memory display
 const style = document.createElement('style');
 style.textContent = `
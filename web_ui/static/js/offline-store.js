@@ -0,0 +1,38 @@
+// Last-known dashboard state in IndexedDB. The dashboard paints from it before the
+// server answers and keeps showing it while the server is unreachable.
+class OfflineStore {
+    constructor(name = 'garden', storeName = 'snapshots') {
+        this.name = name;
+        this.storeName = storeName;
+        this.dbPromise = null;
+    }
+
+    open() {
+        if (!this.dbPromise) {
+            this.dbPromise = new Promise((resolve, reject) => {
+                const request = indexedDB.open(this.name, 1);
+                request.onupgradeneeded = () => request.result.createObjectStore(this.storeName);
+                request.onsuccess = () => resolve(request.result);
+                request.onerror = () => reject(request.error);
+            });
+        }
+        return this.dbPromise;
+    }
+
+    async transaction(mode, operation) {
+        const db = await this.open();
+        return new Promise((resolve, reject) => {
+            const request = operation(db.transaction(this.storeName, mode).objectStore(this.storeName));
+            request.onsuccess = () => resolve(request.result);
+            request.onerror = () => reject(request.error);
+        });
+    }
+
+    get(key) {
+        return this.transaction('readonly', store => store.get(key));
+    }
+
+    put(key, value) {
+        return this.transaction('readwrite', store => store.put(value, key));
+    }
+}
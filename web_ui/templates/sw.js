@@ -0,0 +1,143 @@
+// Garden service worker, served from /sw.js so it controls every page.
+//
+// - The app shell (static assets, pages and the Chart.js scripts) is precached in a
+//   cache named after a hash of the static files, so any change to them installs a
+//   fresh copy and the old cache is dropped.
+// - Dashboard and memories API reads are served stale-while-revalidate: the cached
+//   response (marked with an X-Served-From: cache header) comes back immediately while
+//   the network refreshes the cache. Requests with a since_ts cursor are never cached.
+// - Memory photos are content-addressed, so they are served cache-first.
+// - Pages and API routes of other sites live under /sites/<site>/; cache entries are
+//   per URL, so each site's reads are cached separately.
+
+const VERSION = {{ version|tojson }};
+const STATIC_CACHE = `garden-static-${VERSION}`;
+const API_CACHE = 'garden-api-v1';
+const PHOTO_CACHE = 'garden-photos-v1';
+const MAX_CACHED_PHOTOS = 100;
+
+const PRECACHE_URLS = {{ assets|tojson }};
+const PAGE_URLS = {{ pages|tojson }};
+const CDN_URLS = {{ cdn|tojson }};
+const SHELL_URLS = new Set([...PRECACHE_URLS, ...CDN_URLS].map(url => new URL(url, self.location).href));
+
+const SITE_PREFIX = /^\/sites\/[^/]+/;
+
+const API_ROUTES = [
+    /^\/api\/dashboard\/bootstrap$/,
+    /^\/api\/devices(\/[^/]+\/sensors)?$/,
+    /^\/api\/sensors$/,
+    /^\/api\/sensor-config$/,
+    /^\/api\/memories$/,
+    /^\/humidity\/(latest|history|stats)$/
+];
+
+self.addEventListener('install', (event) => {
+    event.waitUntil((async () => {
+        const cache = await caches.open(STATIC_CACHE);
+        await cache.addAll([...PRECACHE_URLS, ...PAGE_URLS]);
+        // The CDN may be unreachable; the scripts are then cached on first use instead
+        await Promise.all(CDN_URLS.map(url => cache.add(url).catch(() => {})));
+        await self.skipWaiting();
+    })());
+});
+
+self.addEventListener('activate', (event) => {
+    event.waitUntil((async () => {
+        const names = await caches.keys();
+        await Promise.all(names
+            .filter(name => name.startsWith('garden-static-') && name !== STATIC_CACHE)
+            .map(name => caches.delete(name)));
+        await self.clients.claim();
+    })());
+});
+
+self.addEventListener('fetch', (event) => {
+    const request = event.request;
+    const url = new URL(request.url);
+    const sameOrigin = url.origin === self.location.origin;
+    const path = url.pathname.replace(SITE_PREFIX, '');
+
+    if (request.method !== 'GET') {
+        if (sameOrigin && path.startsWith('/api/')) {
+            event.respondWith(invalidatingFetch(request));
+        }
+        return;
+    }
+    if (request.mode === 'navigate') {
+        event.respondWith(networkFirst(request));
+    } else if (SHELL_URLS.has(url.href)) {
+        event.respondWith(cacheFirst(request, STATIC_CACHE));
+    } else if (sameOrigin && path.startsWith('/api/memories/photos/')) {
+        event.respondWith(cacheFirst(request, PHOTO_CACHE, MAX_CACHED_PHOTOS));
+    } else if (sameOrigin && !url.searchParams.has('since_ts') && API_ROUTES.some(route => route.test(path))) {
+        event.respondWith(staleWhileRevalidate(event));
+    }
+});
+
+function markCached(response) {
+    const headers = new Headers(response.headers);
+    headers.set('X-Served-From', 'cache');
+    return new Response(response.body, { status: response.status, statusText: response.statusText, headers });
+}
+
+async function staleWhileRevalidate(event) {
+    const cache = await caches.open(API_CACHE);
+    const cached = await cache.match(event.request);
+    const network = fetch(event.request).then(async (response) => {
+        if (response.ok) {
+            await cache.put(event.request, response.clone());
+        }
+        return response;
+    });
+    if (cached) {
+        event.waitUntil(network.catch(() => {}));
+        return markCached(cached);
+    }
+    return network;
+}
+
+async function cacheFirst(request, cacheName, maxEntries = null) {
+    const cache = await caches.open(cacheName);
+    const cached = await cache.match(request);
+    if (cached) {
+        return cached;
+    }
+    const response = await fetch(request);
+    if (response.ok) {
+        await cache.put(request, response.clone());
+        if (maxEntries) {
+            // Keys come back in insertion order; drop the oldest entries
+            const keys = await cache.keys();
+            await Promise.all(keys.slice(0, Math.max(0, keys.length - maxEntries)).map(key => cache.delete(key)));
+        }
+    }
+    return response;
+}
+
+async function networkFirst(request) {
+    const cache = await caches.open(STATIC_CACHE);
+    try {
+        const response = await fetch(request);
+        if (response.ok) {
+            await cache.put(request, response.clone());
+        }
+        return response;
+    } catch (error) {
+        const cached = await cache.match(request, { ignoreSearch: true });
+        if (cached) {
+            return cached;
+        }
+        throw error;
+    }
+}
+
+// Writes (saving a memory, renaming a sensor, toggling alerts) make cached API reads
+// stale; drop them so the next read goes to the network
+async function invalidatingFetch(request) {
+    const response = await fetch(request);
+    if (response.ok) {
+        await caches.delete(API_CACHE);
+    }
+    return response;
+}